@@ -0,0 +1,209 @@
+"""
+Admission control and load shedding.
+
+Each worker process admits at most `capacity` requests at once. Endpoints are
+grouped into priorities: once the process is busy past a priority's share of
+capacity, new requests of that priority are turned away with a 503 and
+Retry-After instead of queueing behind a slow database or Stripe. Low priority
+traffic (dashboard polls, menu refreshes, reports) goes first and critical
+traffic (login, checkout) is only refused when the process is completely full.
+
+Endpoints can also have their own concurrency limit. A request over that limit
+waits in a small bounded queue for a slot and is shed if the queue is full or
+the wait runs out. Separately, a token bucket per user (or per client address
+for anonymous requests) answers 429 when one client sends more than its share.
+Behind a reverse proxy the client address is only meaningful once the app is
+wrapped in ProxyFix (PROXY_FIX_HOPS); otherwise every anonymous client shares
+the proxy's bucket.
+"""
+
+import math
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import g, jsonify, request, session
+
+CRITICAL = 'critical'
+NORMAL = 'normal'
+LOW = 'low'
+
+# Share of capacity in use beyond which new requests of a priority are shed
+PRIORITY_THRESHOLDS = {LOW: 0.5, NORMAL: 0.85, CRITICAL: 1.0}
+# How long a request may wait for an endpoint slot, by priority
+PRIORITY_QUEUE_SECONDS = {LOW: 0.0, NORMAL: 0.5, CRITICAL: 2.0}
+MAX_RATE_BUCKETS = 10000
+
+
+def parse_endpoint_limits(spec):
+    """'admin_dashboard=2,get_menu=8' -> {'admin_dashboard': 2, 'get_menu': 8}"""
+    limits = {}
+    for item in (spec or '').split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            limits[name.strip()] = int(value)
+    return limits
+
+
+class Rejected(Exception):
+    def __init__(self, status, message, retry_after, reason):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class EndpointGate:
+    """Counting semaphore with a bounded number of waiters"""
+
+    def __init__(self, limit, max_waiting):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout):
+        with self._cond:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return True
+            if timeout <= 0 or self.waiting >= self.max_waiting:
+                return False
+            self.waiting += 1
+            try:
+                admitted = self._cond.wait_for(lambda: self.in_flight < self.limit, timeout)
+            finally:
+                self.waiting -= 1
+            if admitted:
+                self.in_flight += 1
+            return admitted
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+
+class TokenBuckets:
+    """One token bucket per client key, least recently used keys forgotten first"""
+
+    def __init__(self, rate, burst, max_keys=MAX_RATE_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Returns 0 when a token was taken, otherwise seconds until one is available"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    def __init__(self, capacity=32, priorities=None, endpoint_limits=None, queue_size=16,
+                 rate_per_user=10.0, burst_per_user=30, retry_after=2, exempt=()):
+        self.capacity = capacity
+        self.priorities = priorities or {}
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self.exempt = set(exempt)
+        self.gates = {
+            endpoint: EndpointGate(limit, queue_size)
+            for endpoint, limit in (endpoint_limits or {}).items()
+        }
+        self.rate_limiter = TokenBuckets(rate_per_user, burst_per_user) if rate_per_user > 0 else None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.shed = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    def priority(self, endpoint):
+        return self.priorities.get(endpoint, NORMAL)
+
+    def _before_request(self):
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in self.exempt or request.method == 'OPTIONS':
+            return None
+        try:
+            self.admit(endpoint, session.get('user_id') or request.remote_addr)
+        except Rejected as e:
+            response = jsonify({'success': False, 'error': str(e)})
+            response.status_code = e.status
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+        g.admitted_endpoint = endpoint
+        return None
+
+    def _teardown_request(self, error=None):
+        endpoint = g.pop('admitted_endpoint', None)
+        if endpoint is not None:
+            self.release(endpoint)
+
+    def admit(self, endpoint, client):
+        """Take a slot for `endpoint` or raise Rejected; pair every success with release()"""
+        if self.rate_limiter is not None and client:
+            wait = self.rate_limiter.take(client)
+            if wait:
+                self._count_shed(endpoint, 'rate_limited')
+                raise Rejected(429, 'Too many requests', max(1, math.ceil(wait)), 'rate_limited')
+
+        priority = self.priority(endpoint)
+        with self._lock:
+            if self.in_flight >= self.capacity * PRIORITY_THRESHOLDS[priority]:
+                self.shed[(endpoint, 'overloaded')] += 1
+                raise Rejected(503, 'Server is busy, please retry shortly', self.retry_after, 'overloaded')
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        gate = self.gates.get(endpoint)
+        if gate is not None and not gate.acquire(PRIORITY_QUEUE_SECONDS[priority]):
+            with self._lock:
+                self.in_flight -= 1
+            self._count_shed(endpoint, 'queue_full')
+            raise Rejected(503, 'Server is busy, please retry shortly', self.retry_after, 'queue_full')
+
+    def release(self, endpoint):
+        gate = self.gates.get(endpoint)
+        if gate is not None:
+            gate.release()
+        with self._lock:
+            self.in_flight -= 1
+
+    def _count_shed(self, endpoint, reason):
+        with self._lock:
+            self.shed[(endpoint, reason)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'utilization': round(self.in_flight / self.capacity, 3) if self.capacity else 0.0,
+                'shed': [
+                    {'endpoint': endpoint, 'reason': reason, 'count': count}
+                    for (endpoint, reason), count in sorted(self.shed.items())
+                ],
+            }
+        snapshot['endpoints'] = {
+            endpoint: {'limit': gate.limit, 'in_flight': gate.in_flight, 'waiting': gate.waiting}
+            for endpoint, gate in sorted(self.gates.items())
+        }
+        return snapshot
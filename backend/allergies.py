@@ -0,0 +1,52 @@
+"""
+Matching menu items against customer allergies by keyword.
+"""
+
+ALLERGEN_KEYWORDS = {
+    'dairy': ['dairy', 'milk', 'cheese', 'butter', 'cream', 'yogurt'],
+    'nuts': ['nut', 'nuts', 'peanut', 'peanuts', 'almond', 'walnut', 'cashew', 'pecan', 'hazelnut', 'pistachio'],
+    'gluten': ['gluten', 'wheat', 'barley', 'rye', 'bread', 'bun', 'pasta', 'flour'],
+    'shellfish': ['shellfish', 'shrimp', 'lobster', 'crab', 'clam', 'mussel', 'oyster', 'scallop'],
+    'soy': ['soy', 'soybean', 'tofu', 'edamame'],
+    'egg': ['egg', 'eggs'],
+    'fish': ['fish', 'salmon', 'tuna', 'cod', 'trout', 'anchovy', 'tilapia'],
+    'sesame': ['sesame', 'tahini'],
+}
+
+
+def parse_allergies(raw):
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        values = raw
+    else:
+        values = [part.strip() for part in str(raw).replace(';', ',').split(',')]
+    return [value.lower() for value in values if value]
+
+
+def allergy_search_terms(allergy):
+    allergy = allergy.lower()
+    for base, keywords in ALLERGEN_KEYWORDS.items():
+        if allergy == base or allergy in keywords:
+            return list(set(keywords + [base]))
+    return [allergy]
+
+
+def detect_allergy_conflicts(items, allergies):
+    conflicts = []
+    if not items or not allergies:
+        return conflicts
+
+    for item in items:
+        text = f"{item.get('name', '')} {item.get('description', '')}".lower()
+        item_conflicts = set()
+        for allergy in allergies:
+            for term in allergy_search_terms(allergy):
+                if term and term in text:
+                    item_conflicts.add(allergy)
+        if item_conflicts:
+            conflicts.append({
+                'item': item.get('name', 'Menu item'),
+                'allergies': sorted(item_conflicts)
+            })
+    return conflicts
@@ -4,34 +4,232 @@ ServeDash Management System - Backend API
 Flask REST API with PostgreSQL database
 """
 
-from flask import Flask, jsonify, request, session
+from flask import Flask, Response, g, jsonify, request, session
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 import json
+import logging
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
 from collections import Counter
 from functools import wraps
+import heapq
 from dotenv import load_dotenv
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import stripe
+from query_cache import QueryCache, MemoryCacheBackend, RedisCacheBackend
+from pricing import MenuCatalog, price_cart
+from menu import MENU_CACHE_FILE, load_menu_from_cache
+from allergies import detect_allergy_conflicts, parse_allergies
+from reporting import aggregate_dashboard, parse_datetime, parse_order_items
+from scheduling import (
+    DEFAULT_SHIFT_TYPES, SCHEDULE_INACTIVE_STATUSES, TIME_SLOTS, find_schedule_conflicts, parse_date,
+    parse_time_string, parse_weekday, propose_shift_assignments, shift_interval, shift_window,
+    sweep_interval_conflicts, sweep_slot_occupancy
+)
+from stripe_client import StripeGateway, StripeUnavailable
+from metrics import InstrumentedCursor, RequestMetrics, render_admission, render_deadlines, render_query_cache, render_stripe
+from slow_queries import SlowQueryLog
+from profiling import RequestProfiler, collapsed_stacks
+from admission import CRITICAL, LOW, AdmissionController, parse_endpoint_limits
+from deadlines import RequestDeadlines, current_deadline, mark_exceeded, parse_budgets, remaining, suspended
+from health import DEGRADED, FAIL, OK, HealthChecker
+from request_logging import RequestLogger, add_timing, configure_logging, timed
+from order_partitions import ARCHIVE_TABLE, ensure_future_partitions, is_partitioned, order_created_window, table_exists
 
 load_dotenv(".env.local")
 load_dotenv()
 
 SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+SUPABASE_REPLICA_DB_URL = os.getenv("SUPABASE_REPLICA_DB_URL")
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", "2"))
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
 STRIPE_DEFAULT_CURRENCY = os.getenv("STRIPE_DEFAULT_CURRENCY", "usd")
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")  # e.g. http://localhost:12111 for stripe-mock
+STRIPE_TIMEOUT_SECONDS = float(os.getenv("STRIPE_TIMEOUT_SECONDS", "8"))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+STRIPE_BREAKER_THRESHOLD = int(os.getenv("STRIPE_BREAKER_THRESHOLD", "5"))
+STRIPE_BREAKER_RESET_SECONDS = int(os.getenv("STRIPE_BREAKER_RESET_SECONDS", "30"))
+STRIPE_POOL_SIZE = int(os.getenv("STRIPE_POOL_SIZE", "20"))
+TAX_RATE_BPS = int(os.getenv("TAX_RATE_BPS", "1000"))  # basis points, 1000 = 10%
+# redis, off, or memory (single-process deployments only); defaults to redis when REDIS_URL is set
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "off").lower()
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "30"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+REDIS_URL = os.getenv("REDIS_URL")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # worker processes, as read by gunicorn
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))  # 0 disables the log
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "500"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+SLOW_QUERY_EXPLAIN_WRITES = os.getenv("SLOW_QUERY_EXPLAIN_WRITES", "False").lower() == "true"
+PROFILING_MAX_PER_MINUTE = int(os.getenv("PROFILING_MAX_PER_MINUTE", "6"))  # 0 disables request profiling
+PROFILING_STORE_SIZE = int(os.getenv("PROFILING_STORE_SIZE", "20"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))  # share of successful requests logged
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))  # slower requests are always logged
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "32"))  # concurrent requests per process, 0 disables
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "16"))
+ADMISSION_ENDPOINT_LIMITS = os.getenv("ADMISSION_ENDPOINT_LIMITS", "admin_dashboard=2,schedule_coverage=2,create_payment_intent=16")
+RATE_LIMIT_PER_USER = float(os.getenv("RATE_LIMIT_PER_USER", "10"))  # requests per second, 0 disables
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "30"))
+# Reverse proxies in front of the app whose X-Forwarded-For/-Proto are trusted; anonymous
+# clients are rate limited by address, so without this they all share the proxy's bucket
+PROXY_FIX_HOPS = int(os.getenv("PROXY_FIX_HOPS", "0"))
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "10000"))  # default per-request budget, 0 disables
+REQUEST_DEADLINE_BUDGETS = os.getenv(
+    "REQUEST_DEADLINE_BUDGETS",
+    "readyz=1000,login=3000,get_menu=2000,create_payment_intent=20000,create_order=25000,stripe_webhook=15000,admin_dashboard=15000"
+)
+DB_LOCK_TIMEOUT_MS = int(os.getenv("DB_LOCK_TIMEOUT_MS", "2000"))  # lock waits give up sooner than the budget
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+READINESS_DB_SLOW_MS = float(os.getenv("READINESS_DB_SLOW_MS", "250"))
+READINESS_MAX_UTILIZATION = float(os.getenv("READINESS_MAX_UTILIZATION", "0.9"))  # share of ADMISSION_CAPACITY in use
+MENU_CACHE_MAX_AGE_HOURS = float(os.getenv("MENU_CACHE_MAX_AGE_HOURS", "168"))
+
+log_listener = configure_logging(LOG_LEVEL, queue_size=LOG_QUEUE_SIZE)
+logger = logging.getLogger('servedash')
 
 if STRIPE_SECRET_KEY:
     stripe.api_key = STRIPE_SECRET_KEY
+if STRIPE_API_BASE:
+    stripe.api_base = STRIPE_API_BASE
+
+stripe_gateway = StripeGateway(
+    timeout=STRIPE_TIMEOUT_SECONDS,
+    max_retries=STRIPE_MAX_RETRIES,
+    failure_threshold=STRIPE_BREAKER_THRESHOLD,
+    reset_seconds=STRIPE_BREAKER_RESET_SECONDS,
+    pool_size=STRIPE_POOL_SIZE
+)
+stripe_gateway.observers.append(lambda operation, seconds, error: add_timing('stripe', seconds))
+
+if SLOW_QUERY_THRESHOLD_MS > 0:
+    InstrumentedCursor.slow_query_log = SlowQueryLog(
+        threshold_ms=SLOW_QUERY_THRESHOLD_MS,
+        size=SLOW_QUERY_LOG_SIZE,
+        explain_sample_rate=SLOW_QUERY_EXPLAIN_SAMPLE_RATE,
+        analyze_writes=SLOW_QUERY_EXPLAIN_WRITES,
+        # Plans are captured on their own connection so EXPLAIN never blocks request traffic
+        explain_connect=lambda: psycopg2.connect(SUPABASE_DB_URL, cursor_factory=RealDictCursor, connect_timeout=2)
+    )
+
+if REQUEST_DEADLINE_MS > 0:
+    InstrumentedCursor.deadline_lock_timeout_ms = DB_LOCK_TIMEOUT_MS
 
-conn = psycopg2.connect(SUPABASE_DB_URL, cursor_factory=RealDictCursor)
+conn = psycopg2.connect(SUPABASE_DB_URL, cursor_factory=InstrumentedCursor)
 conn.autocommit = True
 
+# Optional read replica for list/reporting queries; see read_connection()
+replica_state = {'conn': None, 'lag': None, 'checked_at': 0.0, 'last_write': float('-inf')}
+replica_lock = threading.Lock()
+
+
+def measure_replica_lag():
+    """Seconds the replica is behind the primary, or None when it is unreachable"""
+    replica = replica_state['conn']
+    if replica is None or replica.closed:
+        try:
+            replica = psycopg2.connect(SUPABASE_REPLICA_DB_URL, cursor_factory=InstrumentedCursor, connect_timeout=2)
+            replica.autocommit = True
+        except Exception as e:
+            logger.warning("unable to connect to read replica: %s", e)
+            replica_state['conn'] = None
+            return None
+        replica_state['conn'] = replica
+    try:
+        with replica.cursor() as cur:
+            # An idle primary sends no new WAL, so a fully replayed replica counts as current
+            cur.execute(
+                """
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END AS lag
+                """
+            )
+            return float(cur.fetchone()['lag'])
+    except Exception as e:
+        logger.warning("read replica health check failed: %s", e)
+        try:
+            replica.close()
+        except Exception:
+            pass
+        replica_state['conn'] = None
+        return None
+
+
+def read_connection():
+    """
+    Connection for read-only queries that tolerate slight staleness: the replica
+    when one is configured and within REPLICA_MAX_LAG_SECONDS, otherwise the primary.
+    Writes and read-your-writes paths keep using `conn` directly.
+    """
+    if not SUPABASE_REPLICA_DB_URL:
+        return conn
+    # Right after a write the replica may not have it yet; a read that refills the
+    # query cache from there would pin the stale result until the entry expires
+    if time.monotonic() - replica_state['last_write'] < REPLICA_MAX_LAG_SECONDS:
+        return conn
+    with replica_lock:
+        now = time.monotonic()
+        if now - replica_state['checked_at'] >= REPLICA_LAG_CHECK_INTERVAL:
+            replica_state['checked_at'] = now
+            replica_state['lag'] = measure_replica_lag()
+        replica = replica_state['conn']
+        lag = replica_state['lag']
+    if replica is None or lag is None or lag > REPLICA_MAX_LAG_SECONDS:
+        return conn
+    return replica
+
+
+def build_query_cache():
+    """
+    Invalidations must reach every worker or stale entries get served, so only
+    redis may back the cache when more than one process runs. The in-process
+    memory backend is for single-process deployments and has to be asked for;
+    anything that cannot be set up safely disables the cache instead.
+    """
+    backend = None
+    if QUERY_CACHE_BACKEND == 'redis':
+        if REDIS_URL:
+            try:
+                backend = RedisCacheBackend.from_url(REDIS_URL)
+            except Exception as e:
+                logger.warning("unable to use redis query cache, disabling the cache: %s", e)
+        else:
+            logger.warning("QUERY_CACHE_BACKEND=redis but REDIS_URL is not set, disabling the cache")
+    elif QUERY_CACHE_BACKEND == 'memory':
+        if WEB_CONCURRENCY > 1:
+            logger.warning("QUERY_CACHE_BACKEND=memory cannot be shared by %s workers, disabling the cache", WEB_CONCURRENCY)
+        else:
+            backend = MemoryCacheBackend(max_entries=QUERY_CACHE_MAX_ENTRIES)
+    if backend is None:
+        return QueryCache(MemoryCacheBackend(max_entries=0), default_ttl=QUERY_CACHE_TTL, enabled=False)
+    return QueryCache(backend, default_ttl=QUERY_CACHE_TTL)
+
+
+query_cache = build_query_cache()
+
+
+def record_write(*tables):
+    """
+    Called by every write helper: invalidates cached reads and pins reads to the
+    primary briefly. The pin is per process; other workers keep reading the
+    replica, which may be up to REPLICA_MAX_LAG_SECONDS behind the write.
+    """
+    replica_state['last_write'] = time.monotonic()
+    query_cache.invalidate(*tables)
+
 
 def ensure_users_optional_columns():
     columns = {
@@ -52,7 +250,7 @@ def ensure_users_optional_columns():
                 with conn.cursor() as cur:
                     cur.execute(statement)
     except Exception as e:
-        print(f"Warning: unable to ensure users optional columns: {e}")
+        logger.warning("unable to ensure users optional columns: %s", e)
 
 
 ensure_users_optional_columns()
@@ -66,6 +264,7 @@ def ensure_schedules_columns():
         'shift_type': "ALTER TABLE schedules ADD COLUMN shift_type TEXT",
         'staff_notes': "ALTER TABLE schedules ADD COLUMN staff_notes TEXT",
         'priority': "ALTER TABLE schedules ADD COLUMN priority TEXT",
+        'version': "ALTER TABLE schedules ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
     }
     try:
         with conn.cursor() as cur:
@@ -81,17 +280,35 @@ def ensure_schedules_columns():
                 with conn.cursor() as cur:
                     cur.execute(statement)
     except Exception as e:
-        print(f"Warning: unable to ensure schedules columns: {e}")
+        logger.warning("unable to ensure schedules columns: %s", e)
 
 
 ensure_schedules_columns()
 
 
+def ensure_schedules_indexes():
+    statements = [
+        "CREATE INDEX IF NOT EXISTS idx_schedules_staff_email_date ON schedules (LOWER(staff_email), date)",
+        "CREATE INDEX IF NOT EXISTS idx_schedules_date ON schedules (date)",
+        "CREATE INDEX IF NOT EXISTS idx_schedules_appointment_id ON schedules (appointment_id)",
+    ]
+    try:
+        for statement in statements:
+            with conn.cursor() as cur:
+                cur.execute(statement)
+    except Exception as e:
+        logger.warning("unable to ensure schedules indexes: %s", e)
+
+
+ensure_schedules_indexes()
+
+
 def ensure_orders_payment_columns():
     columns = {
         'payment_intent_id': "ALTER TABLE orders ADD COLUMN payment_intent_id TEXT",
         'payment_status': "ALTER TABLE orders ADD COLUMN payment_status TEXT DEFAULT 'pending'",
         'currency': "ALTER TABLE orders ADD COLUMN currency TEXT DEFAULT 'usd'",
+        'version': "ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
     }
     try:
         with conn.cursor() as cur:
@@ -107,12 +324,158 @@ def ensure_orders_payment_columns():
                 with conn.cursor() as cur:
                     cur.execute(statement)
     except Exception as e:
-        print(f"Warning: unable to ensure orders payment columns: {e}")
+        logger.warning("unable to ensure orders payment columns: %s", e)
 
 
 ensure_orders_payment_columns()
 
+
+def ensure_orders_indexes():
+    statements = [
+        "CREATE INDEX IF NOT EXISTS idx_orders_status_created_at ON orders (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_orders_order_id ON orders (order_id)",
+        # Serves reconcile_payments.py, which pages pending orders by (created_at, order_id)
+        "CREATE INDEX IF NOT EXISTS idx_orders_pending_payment ON orders (created_at, order_id) "
+        "WHERE payment_status = 'pending' AND payment_intent_id IS NOT NULL",
+        "CREATE INDEX IF NOT EXISTS idx_orders_payment_intent_id ON orders (payment_intent_id)",
+    ]
+    try:
+        for statement in statements:
+            with conn.cursor() as cur:
+                cur.execute(statement)
+    except Exception as e:
+        logger.warning("unable to ensure orders indexes: %s", e)
+
+
+ensure_orders_indexes()
+
+
+ORDERS_PARTITION_MONTHS_AHEAD = int(os.getenv("ORDERS_PARTITION_MONTHS_AHEAD", "3"))
+
+
+def ensure_order_partitions():
+    """Keep upcoming monthly partitions in place once orders has been partitioned"""
+    try:
+        if is_partitioned(conn):
+            ensure_future_partitions(conn, ORDERS_PARTITION_MONTHS_AHEAD)
+    except Exception as e:
+        logger.warning("unable to ensure order partitions: %s", e)
+
+
+ensure_order_partitions()
+
+
+CHANGE_LOG_RETENTION_DAYS = int(os.getenv("CHANGE_LOG_RETENTION_DAYS", "7"))
+# Entries younger than this are held back so a slower concurrent write with a
+# smaller id can commit before the cursor moves past it
+CHANGE_LOG_SETTLE_SECONDS = 2
+CHANGE_LOG_PAGE_SIZE = 1000
+
+
+def ensure_change_log():
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            id BIGSERIAL PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_change_log_table_id ON change_log (table_name, id)",
+        "CREATE INDEX IF NOT EXISTS idx_change_log_changed_at ON change_log (changed_at)",
+    ]
+    try:
+        for statement in statements:
+            with conn.cursor() as cur:
+                cur.execute(statement)
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM change_log WHERE changed_at < now() - make_interval(days => %s)",
+                (CHANGE_LOG_RETENTION_DAYS,),
+            )
+    except Exception as e:
+        logger.warning("unable to ensure change log: %s", e)
+
+
+ensure_change_log()
+
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# A key stuck in progress longer than this (e.g. the worker died) can be taken over
+IDEMPOTENCY_LOCK_SECONDS = 60
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_EVICT_INTERVAL = 300
+
+
+def ensure_idempotency_keys():
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_email TEXT NOT NULL,
+            scope TEXT NOT NULL,
+            idempotency_key TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'in_progress',
+            response_status INTEGER,
+            response_body TEXT,
+            locked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (user_email, scope, idempotency_key)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys (expires_at)",
+    ]
+    try:
+        for statement in statements:
+            with conn.cursor() as cur:
+                cur.execute(statement)
+    except Exception as e:
+        logger.warning("unable to ensure idempotency keys table: %s", e)
+
+
+ensure_idempotency_keys()
+
 app = Flask(__name__)
+if PROXY_FIX_HOPS > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=PROXY_FIX_HOPS, x_proto=PROXY_FIX_HOPS)
+request_metrics = RequestMetrics()
+request_metrics.init_app(app)
+request_profiler = RequestProfiler(max_profiles=PROFILING_STORE_SIZE, max_per_minute=PROFILING_MAX_PER_MINUTE)
+request_profiler.init_app(app)
+request_logger = RequestLogger(sample_rate=LOG_SAMPLE_RATE, slow_ms=LOG_SLOW_REQUEST_MS)
+request_logger.init_app(app)
+request_deadlines = RequestDeadlines(
+    default_seconds=REQUEST_DEADLINE_MS / 1000,
+    budgets=parse_budgets(REQUEST_DEADLINE_BUDGETS),
+    lock_timeout_ms=DB_LOCK_TIMEOUT_MS
+)
+if REQUEST_DEADLINE_MS > 0:
+    request_deadlines.init_app(app)
+
+# Polling and reporting endpoints are shed first; login and checkout last
+ENDPOINT_PRIORITIES = {
+    'admin_dashboard': LOW,
+    'get_menu': LOW,
+    'schedule_coverage': LOW,
+    'login': CRITICAL,
+    'create_payment_intent': CRITICAL,
+    'create_order': CRITICAL,
+    'stripe_webhook': CRITICAL,
+}
+admission = AdmissionController(
+    capacity=ADMISSION_CAPACITY,
+    priorities=ENDPOINT_PRIORITIES,
+    endpoint_limits=parse_endpoint_limits(ADMISSION_ENDPOINT_LIMITS),
+    queue_size=ADMISSION_QUEUE_SIZE,
+    rate_per_user=RATE_LIMIT_PER_USER,
+    burst_per_user=RATE_LIMIT_BURST,
+    # Probes must still answer while the worker is shedding load
+    exempt=('healthz', 'readyz')
+)
+if ADMISSION_CAPACITY > 0:
+    admission.init_app(app)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key-change-me")
 
 session_cookie_samesite = os.getenv("SESSION_COOKIE_SAMESITE", "Lax")
@@ -139,58 +502,57 @@ if extra_origins:
 CORS(app,
      origins=default_origins,
      supports_credentials=True,
-     allow_headers=['Content-Type', 'Authorization', 'X-Requested-With'],
+     allow_headers=['Content-Type', 'Authorization', 'X-Requested-With', 'If-Match', 'Idempotency-Key', 'X-Profile', 'X-Request-ID'],
      methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-     expose_headers=['Content-Type'])
+     expose_headers=['Content-Type', 'ETag', 'X-Change-Cursor', 'X-Profile-Id', 'X-Profile-Status', 'X-Request-ID'])
 
-DATA_DIR = "data"
-MENU_CACHE_FILE = os.path.join(DATA_DIR, "menu_cache.json")
-
-def load_menu_from_cache():
-    """Load menu items from cached API data"""
-    if os.path.exists(MENU_CACHE_FILE):
-        try:
-            with open(MENU_CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-                return cache_data.get('items', [])
-        except Exception as e:
-            print(f"Error loading menu cache: {e}")
-    
-    # Fallback to default menu if cache doesn't exist
-    return [
-        {"id": "1", "name": "Classic Cheeseburger", "description": "Juicy beef patty with cheese, lettuce, tomato, and special sauce", "price": 8.99, "category": "burgers", "image": ""},
-        {"id": "2", "name": "BBQ Pulled Pork Sandwich", "description": "Slow-cooked pork with tangy BBQ sauce and coleslaw", "price": 9.99, "category": "sandwiches", "image": ""},
-        {"id": "3", "name": "Fish Tacos (3pc)", "description": "Fresh fish with cabbage slaw, lime crema, and cilantro", "price": 11.99, "category": "tacos", "image": ""},
-        {"id": "4", "name": "Loaded Nachos", "description": "Crispy tortilla chips with cheese, jalapeños, sour cream, and guacamole", "price": 7.99, "category": "appetizers", "image": ""},
-        {"id": "5", "name": "Chicken Wings (8pc)", "description": "Crispy wings with your choice of Buffalo, BBQ, or Honey Garlic", "price": 10.99, "category": "appetizers", "image": ""},
-    ]
 
 MENU = load_menu_from_cache()
+menu_state = {'mtime': None, 'catalog': MenuCatalog(MENU)}
+
+
+def get_menu_catalog():
+    """Return the id-indexed menu, rebuilding it only when the cache file changes"""
+    global MENU
+    try:
+        mtime = os.path.getmtime(MENU_CACHE_FILE)
+    except OSError:
+        mtime = None
+    if mtime != menu_state['mtime']:
+        MENU = load_menu_from_cache()
+        menu_state['catalog'] = MenuCatalog(MENU)
+        menu_state['mtime'] = mtime
+    return menu_state['catalog']
+
 
-TIME_SLOTS = ['9:00 AM', '10:00 AM', '11:00 AM', '12:00 PM', '1:00 PM', '2:00 PM', '3:00 PM', '4:00 PM', '5:00 PM']
-
-ALLERGEN_KEYWORDS = {
-    'dairy': ['dairy', 'milk', 'cheese', 'butter', 'cream', 'yogurt'],
-    'nuts': ['nut', 'nuts', 'peanut', 'peanuts', 'almond', 'walnut', 'cashew', 'pecan', 'hazelnut', 'pistachio'],
-    'gluten': ['gluten', 'wheat', 'barley', 'rye', 'bread', 'bun', 'pasta', 'flour'],
-    'shellfish': ['shellfish', 'shrimp', 'lobster', 'crab', 'clam', 'mussel', 'oyster', 'scallop'],
-    'soy': ['soy', 'soybean', 'tofu', 'edamame'],
-    'egg': ['egg', 'eggs'],
-    'fish': ['fish', 'salmon', 'tuna', 'cod', 'trout', 'anchovy', 'tilapia'],
-    'sesame': ['sesame', 'tahini'],
+SCHEDULE_BULK_LIMIT = 2000
+SCHEDULE_BULK_MAX_DAYS = 92
+
+AUTO_ASSIGN_MAX_WEEKS = 4
+
+COVERAGE_SLOT_MINUTES = 60
+COVERAGE_MAX_DAYS = 31
+
+ORDER_STATUSES = ['pending', 'preparing', 'ready', 'completed', 'cancelled']
+
+# Allowed forward moves for bulk status changes
+ORDER_STATUS_TRANSITIONS = {
+    'pending': ['preparing', 'ready', 'completed', 'cancelled'],
+    'preparing': ['ready', 'completed', 'cancelled'],
+    'ready': ['completed', 'cancelled'],
+    'completed': [],
+    'cancelled': [],
 }
+ORDER_BULK_LIMIT = 500
 
-DEFAULT_SHIFT_TYPES = [
-    'Prep Shift',
-    'Lunch Service',
-    'Dinner Service',
-    'Event / Catering',
-    'Inventory & Restock',
-]
+# Orders the kitchen still has to work, oldest first
+KITCHEN_ACTIVE_STATUSES = ['pending', 'preparing']
+KITCHEN_SLA_MINUTES = int(os.getenv("KITCHEN_SLA_MINUTES", "15"))
+KITCHEN_QUEUE_LIMIT = int(os.getenv("KITCHEN_QUEUE_LIMIT", "1000"))
 
 
-def read_users():
-    with conn.cursor() as cur:
+def read_users(db=None):
+    with (db or read_connection()).cursor() as cur:
         cur.execute(
             "SELECT email, password, first_name, last_name, mobile, address, dob, sex, registration_date, role, allergies, availability FROM users"
         )
@@ -198,24 +560,289 @@ def read_users():
     return [dict(row) for row in rows]
 
 
-def read_orders():
+ORDER_COLUMNS = "order_id, email, items, subtotal, tax, tip, total, status, created_at, payment_intent_id, payment_status, currency, version"
+
+
+def read_orders(db=None, include_archived=False):
+    """Orders in the live table; archived partitions are only read when asked for"""
+    db = db or read_connection()
+    query = f"SELECT {ORDER_COLUMNS} FROM orders"
+    if include_archived and table_exists(db, ARCHIVE_TABLE):
+        query += f" UNION ALL SELECT {ORDER_COLUMNS} FROM {ARCHIVE_TABLE}"
+    with db.cursor() as cur:
+        cur.execute(query)
+        rows = cur.fetchall()
+    return [dict(row) for row in rows]
+
+
+def order_window_params(order_ids):
+    """Parameters for the created_at pruning predicate used by order lookups by id"""
+    window = order_created_window(order_ids) or (None, None)
+    return (window[0], window[0], window[1], window[1])
+
+
+# Lets lookups by id touch only the partitions their ORD<ms> ids can live in
+ORDER_WINDOW_SQL = "(%s::text IS NULL OR created_at >= %s) AND (%s::text IS NULL OR created_at < %s)"
+
+
+def get_order_by_id(order_id, email=None):
+    """Load one order; when email is given the row must belong to that customer"""
+    if not order_id:
+        return None
     with conn.cursor() as cur:
         cur.execute(
-            "SELECT order_id, email, items, subtotal, tax, tip, total, status, created_at, payment_intent_id, payment_status, currency FROM orders"
+            f"""
+            SELECT order_id, email, items, subtotal, tax, tip, total, status, created_at,
+                   payment_intent_id, payment_status, currency, version
+            FROM orders
+            WHERE order_id = %s AND (%s IS NULL OR email = %s) AND {ORDER_WINDOW_SQL}
+            """,
+            (order_id, email, email) + order_window_params([order_id]),
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    return dict(row)
+
+
+def read_kitchen_queue(limit=None):
+    """Fetch active orders in FIFO order, served by idx_orders_status_created_at"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT order_id, email, items, subtotal, tax, tip, total, status, created_at,
+                   payment_intent_id, payment_status, currency, version
+            FROM orders
+            WHERE status = ANY(%s)
+            ORDER BY created_at, order_id
+            LIMIT %s
+            """,
+            (KITCHEN_ACTIVE_STATUSES, limit),
         )
         rows = cur.fetchall()
     return [dict(row) for row in rows]
 
 
-def read_schedules():
+def read_schedules(db=None):
+    with (db or read_connection()).cursor() as cur:
+        cur.execute(
+            """
+            SELECT appointment_id, manager_email, staff_email, staff_name, date, time_slot,
+                   status, notes, created_at, start_time, end_time, location, shift_type,
+                   staff_notes, priority, version
+            FROM schedules
+            """
+        )
+        rows = cur.fetchall()
+    return [dict(row) for row in rows]
+
+
+def read_users_by_emails(emails):
+    """Fetch several users in one query, keyed by lowercase email"""
+    lowered = sorted({email.lower() for email in emails if email})
+    if not lowered:
+        return {}
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT email, password, first_name, last_name, mobile, address, dob, sex,
+                   registration_date, role, allergies, availability
+            FROM users
+            WHERE LOWER(email) = ANY(%s)
+            """,
+            (lowered,),
+        )
+        rows = cur.fetchall()
+    return {row['email'].lower(): dict(row) for row in rows}
+
+
+def get_schedule_by_id(appointment_id, staff_email=None):
+    """Load one appointment; when staff_email is given the row must be assigned to them"""
+    if not appointment_id:
+        return None
+    staff_email = staff_email.lower() if staff_email else None
     with conn.cursor() as cur:
         cur.execute(
             """
             SELECT appointment_id, manager_email, staff_email, staff_name, date, time_slot,
                    status, notes, created_at, start_time, end_time, location, shift_type,
-                   staff_notes, priority
+                   staff_notes, priority, version
             FROM schedules
+            WHERE appointment_id = %s AND (%s IS NULL OR LOWER(staff_email) = %s)
+            """,
+            (appointment_id, staff_email, staff_email),
+        )
+        row = cur.fetchone()
+    if not row:
+        return None
+    return dict(row)
+
+
+def read_schedules_for_staff(staff_emails, start_date, end_date):
+    """Fetch the active shifts of several staff members within a date window in one query"""
+    lowered = sorted({email.lower() for email in staff_emails if email})
+    if not lowered:
+        return []
+    with conn.cursor() as cur:
+        cur.execute(
             """
+            SELECT appointment_id, staff_email, staff_name, date, time_slot, status,
+                   start_time, end_time, location, shift_type
+            FROM schedules
+            WHERE LOWER(staff_email) = ANY(%s) AND date BETWEEN %s AND %s
+              AND COALESCE(status, '') <> ALL(%s)
+            """,
+            (lowered, start_date, end_date, SCHEDULE_INACTIVE_STATUSES),
+        )
+        rows = cur.fetchall()
+    return [dict(row) for row in rows]
+
+
+def read_schedules_in_range(start_date, end_date):
+    """Fetch every active shift whose date falls within the window in one query"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT appointment_id, staff_email, staff_name, date, time_slot, status,
+                   start_time, end_time, location, shift_type
+            FROM schedules
+            WHERE date BETWEEN %s AND %s AND COALESCE(status, '') <> ALL(%s)
+            """,
+            (start_date, end_date, SCHEDULE_INACTIVE_STATUSES),
+        )
+        rows = cur.fetchall()
+    return [dict(row) for row in rows]
+
+
+def log_changes_sql(query, table_name, key_column, operation):
+    """
+    Wrap a write that ends in RETURNING so its change_log entries are inserted by
+    the same statement, keeping the log atomic with the write at no extra round trip.
+    """
+    return (
+        f"WITH changed AS ({query}), "
+        "logged AS ("
+        "INSERT INTO change_log (table_name, row_key, operation) "
+        f"SELECT '{table_name}', {key_column}, '{operation}' FROM changed"
+        ") "
+        "SELECT * FROM changed"
+    )
+
+
+def current_change_cursor(table_name, db=None):
+    """Highest settled change id for a table; clients pass it back as ?since="""
+    with (db or conn).cursor() as cur:
+        cur.execute(
+            """
+            SELECT COALESCE(MAX(id), 0) AS cursor FROM change_log
+            WHERE table_name = %s AND changed_at <= now() - make_interval(secs => %s)
+            """,
+            (table_name, CHANGE_LOG_SETTLE_SECONDS),
+        )
+        return cur.fetchone()['cursor']
+
+
+def read_changes(table_name, since):
+    """
+    Return (changes, cursor, reset) for entries after `since`. reset is True when
+    `since` predates the retained log and the client must refetch everything.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT MIN(id) AS oldest FROM change_log WHERE table_name = %s",
+            (table_name,),
+        )
+        oldest = cur.fetchone()['oldest']
+        if oldest is not None and since < oldest - 1:
+            return [], since, True
+        cur.execute(
+            """
+            SELECT id, row_key, operation FROM change_log
+            WHERE table_name = %s AND id > %s
+              AND changed_at <= now() - make_interval(secs => %s)
+            ORDER BY id
+            LIMIT %s
+            """,
+            (table_name, since, CHANGE_LOG_SETTLE_SECONDS, CHANGE_LOG_PAGE_SIZE),
+        )
+        rows = cur.fetchall()
+    cursor = rows[-1]['id'] if rows else since
+    return [dict(row) for row in rows], cursor, False
+
+
+def parse_since():
+    """
+    Read the ?since= change cursor.
+    Returns (since, error); since is None when the parameter is absent.
+    """
+    value = request.args.get('since')
+    if value is None or value == '':
+        return None, None
+    try:
+        since = int(value)
+    except ValueError:
+        return None, 'since must be a change cursor from X-Change-Cursor'
+    if since < 0:
+        return None, 'since must be a change cursor from X-Change-Cursor'
+    return since, None
+
+
+def delta_response(table_name, since, fetch_rows, key_of):
+    """
+    Build the ?since= payload: rows upserted after the cursor plus deleted keys.
+    fetch_rows applies the caller's visibility, so a changed row it no longer
+    returns (deleted, or reassigned away from the caller) is reported as deleted
+    and drops out of the client's synced view.
+    """
+    changes, cursor, reset = read_changes(table_name, since)
+    if reset:
+        return jsonify({'reset': True, 'cursor': current_change_cursor(table_name), 'upserted': [], 'deleted': []})
+    latest = {}
+    for change in changes:
+        latest[change['row_key']] = change['operation']
+    upserted_keys = [key for key, operation in latest.items() if operation != 'delete']
+    deleted = [key for key, operation in latest.items() if operation == 'delete']
+    rows = fetch_rows(upserted_keys) if upserted_keys else []
+    found = {key_of(row) for row in rows}
+    deleted.extend(key for key in upserted_keys if key not in found)
+    return jsonify({
+        'reset': False,
+        'cursor': cursor,
+        'has_more': len(changes) >= CHANGE_LOG_PAGE_SIZE,
+        'upserted': rows,
+        'deleted': deleted
+    })
+
+
+def read_orders_by_ids(order_ids, email=None):
+    """Fetch several orders by id, optionally restricted to one customer"""
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT order_id, email, items, subtotal, tax, tip, total, status, created_at,
+                   payment_intent_id, payment_status, currency, version
+            FROM orders
+            WHERE order_id = ANY(%s) AND (%s IS NULL OR email = %s) AND {ORDER_WINDOW_SQL}
+            """,
+            (list(order_ids), email, email) + order_window_params(order_ids),
+        )
+        rows = cur.fetchall()
+    return [dict(row) for row in rows]
+
+
+def read_schedules_by_ids(appointment_ids, staff_email=None):
+    """Fetch several appointments by id, optionally restricted to one staff member"""
+    staff_email = staff_email.lower() if staff_email else None
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT appointment_id, manager_email, staff_email, staff_name, date, time_slot,
+                   status, notes, created_at, start_time, end_time, location, shift_type,
+                   staff_notes, priority, version
+            FROM schedules
+            WHERE appointment_id = ANY(%s) AND (%s IS NULL OR LOWER(staff_email) = %s)
+            """,
+            (list(appointment_ids), staff_email, staff_email),
         )
         rows = cur.fetchall()
     return [dict(row) for row in rows]
@@ -265,19 +892,6 @@ def get_session_user():
     return get_user_by_email(email)
 
 
-def parse_datetime(value):
-    """Safely parse ISO datetime strings"""
-    if not value:
-        return None
-    try:
-        return datetime.fromisoformat(value)
-    except ValueError:
-        try:
-            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
-        except ValueError:
-            return None
-
-
 def update_user_record(email, updates):
     if not email:
         return False
@@ -289,20 +903,24 @@ def update_user_record(email, updates):
             continue
         if key == 'password':
             set_clauses.append("password = %s")
-            params.append(generate_password_hash(value))
+            with timed('hashing'):
+                params.append(generate_password_hash(value))
         else:
             set_clauses.append(f"{key} = %s")
             params.append(value)
     if not set_clauses:
         return False
     params.append(email)
-    query = f"UPDATE users SET {', '.join(set_clauses)} WHERE LOWER(email) = %s"
+    query = f"UPDATE users SET {', '.join(set_clauses)} WHERE LOWER(email) = %s RETURNING email"
     with conn.cursor() as cur:
-        cur.execute(query, tuple(params))
-        return cur.rowcount > 0
+        cur.execute(log_changes_sql(query, 'users', 'LOWER(email)', 'update'), tuple(params))
+        updated = len(cur.fetchall()) > 0
+    record_write('users')
+    return updated
 
 
-def update_order_record(order_id, updates):
+def update_order_record(order_id, updates, expected_version=None):
+    """Apply updates and bump the version; with expected_version the write only lands if it still matches"""
     if not order_id:
         return None
     update_doc = {k: v for k, v in updates.items() if v is not None}
@@ -313,23 +931,83 @@ def update_order_record(order_id, updates):
     for key, value in update_doc.items():
         set_clauses.append(f"{key} = %s")
         params.append(value)
-    params.append(order_id)
-    query = f"UPDATE orders SET {', '.join(set_clauses)} WHERE order_id = %s RETURNING order_id, email, items, subtotal, tax, tip, total, status, created_at, payment_intent_id, payment_status, currency"
+    set_clauses.append("version = version + 1")
+    params.extend([order_id, expected_version, expected_version])
+    params.extend(order_window_params([order_id]))
+    query = f"UPDATE orders SET {', '.join(set_clauses)} WHERE order_id = %s AND (%s::int IS NULL OR version = %s) AND {ORDER_WINDOW_SQL} RETURNING order_id, email, items, subtotal, tax, tip, total, status, created_at, payment_intent_id, payment_status, currency, version"
     with conn.cursor() as cur:
-        cur.execute(query, tuple(params))
+        cur.execute(log_changes_sql(query, 'orders', 'order_id', 'update'), tuple(params))
         row = cur.fetchone()
+    record_write('orders')
     if not row:
         return None
     return dict(row)
 
 
+def bulk_update_order_status(order_ids, status):
+    """Move many orders to `status` in one statement; returns (updated_rows, failures)"""
+    allowed_from = [
+        source for source, targets in ORDER_STATUS_TRANSITIONS.items()
+        if status in targets
+    ]
+    query = """
+        WITH requested AS (
+            SELECT DISTINCT unnest(%s::text[]) AS order_id
+        ),
+        updated AS (
+            UPDATE orders o
+            SET status = %s, version = o.version + 1
+            FROM requested r
+            WHERE o.order_id = r.order_id AND o.status = ANY(%s)
+            RETURNING o.order_id, o.email, o.items, o.subtotal, o.tax, o.tip, o.total, o.status,
+                      o.created_at, o.payment_intent_id, o.payment_status, o.currency, o.version
+        ),
+        logged AS (
+            INSERT INTO change_log (table_name, row_key, operation)
+            SELECT 'orders', order_id, 'update' FROM updated
+        )
+        SELECT r.order_id AS requested_id, prev.status AS previous_status,
+               u.order_id, u.email, u.items, u.subtotal, u.tax, u.tip, u.total, u.status,
+               u.created_at, u.payment_intent_id, u.payment_status, u.currency, u.version
+        FROM requested r
+        LEFT JOIN updated u ON u.order_id = r.order_id
+        LEFT JOIN orders prev ON prev.order_id = r.order_id
+    """
+    with conn.cursor() as cur:
+        cur.execute(query, (list(order_ids), status, allowed_from))
+        rows = cur.fetchall()
+    record_write('orders')
+
+    updated = []
+    failures = []
+    for row in rows:
+        row = dict(row)
+        requested_id = row.pop('requested_id')
+        previous_status = row.pop('previous_status')
+        if row.get('order_id'):
+            updated.append(row)
+        elif previous_status is None:
+            failures.append({'order_id': requested_id, 'error': 'Order not found'})
+        else:
+            failures.append({
+                'order_id': requested_id,
+                'error': f"Cannot change status from {previous_status} to {status}"
+            })
+    return updated, failures
+
+
 def save_user(email, password, first_name, last_name, mobile, address, dob, sex, role='customer', allergies='', availability=''):
+    with timed('hashing'):
+        password_hash = generate_password_hash(password)
     with conn.cursor() as cur:
         cur.execute(
-            "INSERT INTO users (email, password, first_name, last_name, mobile, address, dob, sex, registration_date, role, allergies, availability) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            log_changes_sql(
+                "INSERT INTO users (email, password, first_name, last_name, mobile, address, dob, sex, registration_date, role, allergies, availability) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING email",
+                'users', 'LOWER(email)', 'insert'
+            ),
             (
                 email.lower(),
-                generate_password_hash(password),
+                password_hash,
                 first_name,
                 last_name,
                 mobile,
@@ -342,13 +1020,17 @@ def save_user(email, password, first_name, last_name, mobile, address, dob, sex,
                 availability,
             ),
         )
+    record_write('users')
 
 
 def save_order(email, items, subtotal, tax, tip, total, payment_intent_id=None, payment_status='pending', currency='usd'):
     order_id = f"ORD{int(datetime.now().timestamp() * 1000)}"
     with conn.cursor() as cur:
         cur.execute(
-            "INSERT INTO orders (order_id, email, items, subtotal, tax, tip, total, status, created_at, payment_intent_id, payment_status, currency) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            log_changes_sql(
+                "INSERT INTO orders (order_id, email, items, subtotal, tax, tip, total, status, created_at, payment_intent_id, payment_status, currency) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING order_id",
+                'orders', 'order_id', 'insert'
+            ),
             (
                 order_id,
                 email,
@@ -364,9 +1046,54 @@ def save_order(email, items, subtotal, tax, tip, total, payment_intent_id=None,
                 currency,
             ),
         )
+    record_write('orders')
     return order_id
 
 
+def save_appointments(shifts, manager_email):
+    """Insert many shifts with a single batched statement; returns their appointment ids"""
+    if not shifts:
+        return []
+    base_id = int(datetime.now().timestamp() * 1000)
+    created_at = datetime.now().isoformat()
+    appointment_ids = []
+    rows = []
+    for index, shift in enumerate(shifts):
+        appointment_id = f"APT{base_id}{index:04d}"
+        appointment_ids.append(appointment_id)
+        rows.append((
+            appointment_id,
+            manager_email,
+            shift['staff_email'],
+            shift['staff_name'],
+            shift['date'],
+            shift['time_slot'],
+            shift.get('status', 'scheduled'),
+            shift.get('notes', ''),
+            created_at,
+            shift['start_time'],
+            shift['end_time'],
+            shift.get('location', ''),
+            shift.get('shift_type', ''),
+            '',
+            shift.get('priority') or 'normal',
+        ))
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            log_changes_sql(
+                "INSERT INTO schedules (appointment_id, manager_email, staff_email, staff_name, date, time_slot, status, notes, created_at, start_time, end_time, location, shift_type, staff_notes, priority) VALUES %s RETURNING appointment_id",
+                'schedules', 'appointment_id', 'insert'
+            ),
+            rows,
+            # One statement for the whole batch (callers cap it at SCHEDULE_BULK_LIMIT), so a
+            # failure on the autocommit connection can never leave part of it committed
+            page_size=len(rows),
+        )
+    record_write('schedules')
+    return appointment_ids
+
+
 def save_appointment(manager_email, staff_email, staff_name, date, time_slot, status='scheduled', notes='', start_time=None, end_time=None, location='', shift_type='', priority='normal'):
     appointment_id = f"APT{int(datetime.now().timestamp() * 1000)}"
     iso_start = start_time or parse_time_string(date, time_slot)
@@ -377,7 +1104,10 @@ def save_appointment(manager_email, staff_email, staff_name, date, time_slot, st
         iso_end = end_time
     with conn.cursor() as cur:
         cur.execute(
-            "INSERT INTO schedules (appointment_id, manager_email, staff_email, staff_name, date, time_slot, status, notes, created_at, start_time, end_time, location, shift_type, staff_notes, priority) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            log_changes_sql(
+                "INSERT INTO schedules (appointment_id, manager_email, staff_email, staff_name, date, time_slot, status, notes, created_at, start_time, end_time, location, shift_type, staff_notes, priority) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING appointment_id",
+                'schedules', 'appointment_id', 'insert'
+            ),
             (
                 appointment_id,
                 manager_email,
@@ -396,128 +1126,252 @@ def save_appointment(manager_email, staff_email, staff_name, date, time_slot, st
                 priority or 'normal'
             ),
         )
+    record_write('schedules')
     return appointment_id
 
 
-def parse_allergies(raw):
-    if not raw:
+def check_schedule_conflicts(staff_email, start_time, end_time, appointment_id=None):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT appointment_id, start_time, end_time, date, time_slot, status
+            FROM schedules
+            WHERE LOWER(staff_email) = %s AND COALESCE(status, '') <> ALL(%s)
+            """,
+            (staff_email.lower(), SCHEDULE_INACTIVE_STATUSES)
+        )
+        rows = cur.fetchall()
+    return find_schedule_conflicts(rows, start_time, end_time, appointment_id)
+
+
+def book_shifts(candidates, manager_email, dry_run=False):
+    """
+    Conflict-check candidate shifts against stored shifts and each other, then insert
+    the accepted ones in one batched write. Each candidate is annotated in place with
+    its outcome; returns the accepted shifts.
+    """
+    dates = [parse_date(shift.get('date')) for shift in candidates]
+    dates = [day for day in dates if day]
+    if not dates:
         return []
-    if isinstance(raw, list):
-        values = raw
-    else:
-        values = [part.strip() for part in str(raw).replace(';', ',').split(',')]
-    return [value.lower() for value in values if value]
-
-
-def allergy_search_terms(allergy):
-    allergy = allergy.lower()
-    for base, keywords in ALLERGEN_KEYWORDS.items():
-        if allergy == base or allergy in keywords:
-            return list(set(keywords + [base]))
-    return [allergy]
-
-
-def detect_allergy_conflicts(items, allergies):
-    conflicts = []
-    if not items or not allergies:
-        return conflicts
-
-    for item in items:
-        text = f"{item.get('name', '')} {item.get('description', '')}".lower()
-        item_conflicts = set()
-        for allergy in allergies:
-            for term in allergy_search_terms(allergy):
-                if term and term in text:
-                    item_conflicts.add(allergy)
-        if item_conflicts:
-            conflicts.append({
-                'item': item.get('name', 'Menu item'),
-                'allergies': sorted(item_conflicts)
-            })
-    return conflicts
 
-
-def parse_time_string(date_str, time_value):
-    """Convert various time inputs into ISO string."""
-    if not date_str:
-        return None
-    if not time_value:
-        return None
+    # Load every affected shift once, then check conflicts per staff member in memory
+    existing_rows = read_schedules_for_staff(
+        [shift['staff_email'] for shift in candidates],
+        (min(dates) - timedelta(days=1)).isoformat(),
+        (max(dates) + timedelta(days=1)).isoformat(),
+    )
+    existing_by_staff = {}
+    for index, row in enumerate(existing_rows):
+        interval = shift_interval(row)
+        if interval:
+            existing_by_staff.setdefault(row['staff_email'].lower(), []).append((interval[0], interval[1], index))
+    candidates_by_staff = {}
+    for index, shift in enumerate(candidates):
+        interval = shift_interval(shift)
+        if not interval:
+            shift['status'] = 'error'
+            shift['error'] = 'End time must be after start time'
+            continue
+        candidates_by_staff.setdefault(shift['staff_email'], []).append((interval[0], interval[1], index))
+
+    accepted = []
+    for staff_email, intervals in candidates_by_staff.items():
+        clashes = sweep_interval_conflicts(existing_by_staff.get(staff_email, []), intervals)
+        booked = []
+        for start, end, index in sorted(intervals):
+            shift = candidates[index]
+            if index in clashes:
+                shift['status'] = 'conflict'
+                shift['conflicts'] = []
+                for existing_index in clashes[index]:
+                    row = existing_rows[existing_index]
+                    existing_start, existing_end = shift_window(row)
+                    shift['conflicts'].append({
+                        'appointment_id': row['appointment_id'],
+                        'date': row.get('date'),
+                        'time_slot': row.get('time_slot'),
+                        'start_time': existing_start,
+                        'end_time': existing_end
+                    })
+                continue
+            # Shifts accepted earlier in this same batch also block overlaps
+            while booked and booked[0] <= start:
+                heapq.heappop(booked)
+            if booked:
+                shift['status'] = 'conflict'
+                shift['error'] = 'Overlaps another shift in this request'
+                continue
+            heapq.heappush(booked, end)
+            shift['status'] = 'scheduled'
+            accepted.append(shift)
+
+    if accepted and not dry_run:
+        appointment_ids = save_appointments(accepted, manager_email)
+        for shift, appointment_id in zip(accepted, appointment_ids):
+            shift['appointment_id'] = appointment_id
+    return accepted
+
+
+def make_etag(version):
+    """Strong ETag for a versioned row"""
+    return f'"{version}"' if version is not None else None
+
+
+def parse_if_match():
+    """
+    Read the expected row version from If-Match.
+    Returns (version, error); version is None when the header is absent or '*'.
+    """
+    header = (request.headers.get('If-Match') or '').strip()
+    if not header or header == '*':
+        return None, None
+    value = header[2:] if header.startswith('W/') else header
     try:
-        # If already ISO-like
-        if 'T' in time_value:
-            return time_value
-        time_value = time_value.strip()
-        if ' ' in time_value:
-            time_part, meridiem = time_value.split()
-            hour_str, minute_str = time_part.split(':')
-            hours = int(hour_str)
-            minutes = int(minute_str)
-            meridiem = meridiem.upper()
-            if meridiem == 'PM' and hours != 12:
-                hours += 12
-            if meridiem == 'AM' and hours == 12:
-                hours = 0
-        else:
-            hour_str, minute_str = time_value.split(':')
-            hours = int(hour_str)
-            minutes = int(minute_str)
-        return f"{date_str}T{str(hours).zfill(2)}:{str(minutes).zfill(2)}:00"
-    except Exception:
-        return None
+        return int(value.strip('"')), None
+    except ValueError:
+        return None, 'Invalid If-Match header'
 
 
-def overlap(a_start, a_end, b_start, b_end):
-    if not a_start or not a_end or not b_start or not b_end:
-        return False
+def versioned_response(payload, version, status=200):
+    """jsonify a payload and attach the row's ETag"""
+    response = jsonify(payload)
+    response.status_code = status
+    etag = make_etag(version)
+    if etag:
+        response.headers['ETag'] = etag
+    return response
+
+
+idempotency_state = {'evicted_at': 0.0}
+
+
+def evict_expired_idempotency_keys():
+    """Drop expired keys, at most once per IDEMPOTENCY_EVICT_INTERVAL per process"""
+    now = time.monotonic()
+    if now - idempotency_state['evicted_at'] < IDEMPOTENCY_EVICT_INTERVAL:
+        return
+    idempotency_state['evicted_at'] = now
     try:
-        a_start_dt = datetime.fromisoformat(a_start)
-        a_end_dt = datetime.fromisoformat(a_end)
-        b_start_dt = datetime.fromisoformat(b_start)
-        b_end_dt = datetime.fromisoformat(b_end)
-        return max(a_start_dt, b_start_dt) < min(a_end_dt, b_end_dt)
-    except Exception:
-        return False
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM idempotency_keys WHERE expires_at < now()")
+    except Exception as e:
+        logger.warning("unable to evict idempotency keys: %s", e)
 
 
-def check_schedule_conflicts(staff_email, start_time, end_time, appointment_id=None):
-    requested_start = start_time
-    requested_end = end_time
-    if not requested_end and requested_start:
-        try:
-            requested_end = (datetime.fromisoformat(requested_start) + timedelta(hours=2)).isoformat()
-        except Exception:
-            requested_end = None
+def claim_idempotency_key(user_email, scope, key, fingerprint):
+    """
+    Try to own a key. Succeeds for a new key, an expired one, or one whose owner
+    stopped making progress. Returns True when this request should run the handler.
+    """
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT appointment_id, start_time, end_time, date, time_slot
-            FROM schedules
-            WHERE LOWER(staff_email) = %s
+            INSERT INTO idempotency_keys (user_email, scope, idempotency_key, fingerprint, expires_at)
+            VALUES (%s, %s, %s, %s, now() + make_interval(hours => %s))
+            ON CONFLICT (user_email, scope, idempotency_key) DO UPDATE
+            SET fingerprint = EXCLUDED.fingerprint, status = 'in_progress',
+                response_status = NULL, response_body = NULL,
+                locked_at = now(), expires_at = EXCLUDED.expires_at
+            WHERE idempotency_keys.expires_at < now()
+               OR (idempotency_keys.status = 'in_progress'
+                   AND idempotency_keys.locked_at < now() - make_interval(secs => %s))
+            RETURNING idempotency_key
             """,
-            (staff_email.lower(),)
+            (user_email, scope, key, fingerprint, IDEMPOTENCY_TTL_HOURS, IDEMPOTENCY_LOCK_SECONDS),
         )
-        rows = cur.fetchall()
-    conflicts = []
-    for row in rows:
-        if appointment_id and row['appointment_id'] == appointment_id:
-            continue
-        existing_start = row.get('start_time') or parse_time_string(row.get('date'), row.get('time_slot'))
-        existing_end = row.get('end_time')
-        if not existing_end and existing_start:
+        return cur.fetchone() is not None
+
+
+def read_idempotency_key(user_email, scope, key):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT fingerprint, status, response_status, response_body
+            FROM idempotency_keys
+            WHERE user_email = %s AND scope = %s AND idempotency_key = %s
+            """,
+            (user_email, scope, key),
+        )
+        row = cur.fetchone()
+    return dict(row) if row else None
+
+
+def complete_idempotency_key(user_email, scope, key, response):
+    """Store the handler's response for replay, or release the key if it should not be cached"""
+    with conn.cursor() as cur:
+        if response.status_code >= 500:
+            # Transient failures are not remembered so the client's retry runs again
+            cur.execute(
+                "DELETE FROM idempotency_keys WHERE user_email = %s AND scope = %s AND idempotency_key = %s",
+                (user_email, scope, key),
+            )
+            return
+        cur.execute(
+            """
+            UPDATE idempotency_keys
+            SET status = 'completed', response_status = %s, response_body = %s
+            WHERE user_email = %s AND scope = %s AND idempotency_key = %s
+            """,
+            (response.status_code, response.get_data(as_text=True), user_email, scope, key),
+        )
+
+
+def idempotent(scope):
+    """
+    Decorator honouring an Idempotency-Key header: the first request with a key runs
+    the handler and its response is stored; replays with the same key and body get
+    the stored response without re-running it, and concurrent duplicates wait for
+    the first to finish instead of racing it.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = (request.headers.get('Idempotency-Key') or '').strip()
+            if not key:
+                return f(*args, **kwargs)
+            if len(key) > 255:
+                return jsonify({'error': 'Idempotency-Key is too long'}), 400
+
+            user_email = session.get('user_id', '')
+            body = json.dumps(request.get_json(silent=True), sort_keys=True, separators=(',', ':'))
+            fingerprint = hashlib.sha256(f"{request.method} {request.path} {body}".encode('utf-8')).hexdigest()
+
+            evict_expired_idempotency_keys()
+            deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+            delay = 0.05
+            while True:
+                if claim_idempotency_key(user_email, scope, key, fingerprint):
+                    break
+                existing = read_idempotency_key(user_email, scope, key)
+                if existing is None:
+                    # Evicted between the two statements; try to claim it again
+                    continue
+                if existing['fingerprint'] != fingerprint:
+                    return jsonify({'error': 'Idempotency-Key was already used with a different request'}), 422
+                if existing['status'] == 'completed':
+                    replay = Response(existing['response_body'], status=existing['response_status'], mimetype='application/json')
+                    replay.headers['Idempotent-Replayed'] = 'true'
+                    return replay
+                if time.monotonic() >= deadline:
+                    return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
             try:
-                existing_end = (datetime.fromisoformat(existing_start) + timedelta(hours=2)).isoformat()
+                response = app.make_response(f(*args, **kwargs))
             except Exception:
-                existing_end = None
-        if overlap(requested_start, requested_end, existing_start, existing_end):
-            conflicts.append({
-                'appointment_id': row['appointment_id'],
-                'date': row.get('date'),
-                'time_slot': row.get('time_slot'),
-                'start_time': existing_start,
-                'end_time': existing_end
-            })
-    return conflicts
+                # Release the key even when the handler ran out of time
+                with suspended():
+                    complete_idempotency_key(user_email, scope, key, Response(status=500))
+                raise
+            with suspended():
+                complete_idempotency_key(user_email, scope, key, response)
+            return response
+
+        return decorated
+
+    return decorator
 
 
 def login_required(f):
@@ -560,7 +1414,9 @@ def login():
         return jsonify({'success': False, 'error': 'Email and password are required'}), 400
 
     user = get_user_by_email(email)
-    if not user or not check_password_hash(user['password'], password):
+    with timed('hashing'):
+        valid = bool(user) and check_password_hash(user['password'], password)
+    if not valid:
         return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
 
     session['user_id'] = user['email']
@@ -657,22 +1513,27 @@ def customer_profile():
 @app.route('/api/menu', methods=['GET'])
 def get_menu():
     """Get menu items"""
-    # Reload menu from cache on each request (in case it was updated)
-    global MENU
-    MENU = load_menu_from_cache()
-    return jsonify(MENU)
+    # Picks up a refreshed menu cache without re-reading the file on every request
+    return jsonify(get_menu_catalog().items)
 
 
 # ==================== PAYMENTS ====================
 
-def dollars_to_cents(amount):
-    """Convert dollar amount to cents (integer)"""
-    try:
-        if isinstance(amount, str):
-            amount = float(amount)
-        return int(round(amount * 100))
-    except (ValueError, TypeError):
-        return None
+def quote_cart(data):
+    """Reprice the request's cart server-side; returns (quote, error_response)"""
+    quote, errors = price_cart(
+        get_menu_catalog(),
+        data.get('items') or [],
+        tip=data.get('tip', 0),
+        tax_rate_bps=TAX_RATE_BPS
+    )
+    if errors:
+        return None, (jsonify({
+            'success': False,
+            'error': 'Your cart is out of date. Please review it and try again.',
+            'items': errors
+        }), 409)
+    return quote, None
 
 
 @app.route('/api/payments/config', methods=['GET'])
@@ -689,52 +1550,77 @@ def get_payment_config():
 
 @app.route('/api/payments/create-intent', methods=['POST'])
 @role_required('customer', 'admin')
+@idempotent('create_payment_intent')
 def create_payment_intent():
     """Create a Stripe PaymentIntent"""
     if not STRIPE_SECRET_KEY:
         return jsonify({'error': 'Card payments are not available right now.'}), 503
 
     data = request.json or {}
-    items = data.get('items', [])
-    tip_value = float(data.get('tip', 0) or 0)
-    tax_value = float(data.get('tax', 0) or 0)
-
-    if not items:
+    if not data.get('items'):
         return jsonify({'error': 'Cart is empty'}), 400
 
-    subtotal = sum(float(item.get('price', 0)) * int(item.get('quantity', 1)) for item in items)
-    total = subtotal + tax_value + tip_value
-    amount_cents = dollars_to_cents(total)
+    quote, error_response = quote_cart(data)
+    if error_response:
+        return error_response
+    amount_cents = quote['total_cents']
     
-    if amount_cents is None or amount_cents <= 0:
+    if amount_cents <= 0:
         return jsonify({'error': 'Invalid total amount'}), 400
 
     user = get_session_user() or {}
     metadata = {
         'customer_email': user.get('email', ''),
-        'subtotal': str(subtotal),
-        'tax': str(tax_value),
-        'tip': str(tip_value)
+        'subtotal': quote['subtotal'],
+        'tax': quote['tax'],
+        'tip': quote['tip']
     }
     
     try:
-        intent = stripe.PaymentIntent.create(
+        # Forwarding the client's key lets Stripe dedupe too, should two workers ever race;
+        # hashed so it is scoped to the user and fits Stripe's 255 character limit
+        idempotency_key = (request.headers.get('Idempotency-Key') or '').strip()
+        stripe_key = None
+        if idempotency_key:
+            digest = hashlib.sha256(f"{user.get('email', '')}:{idempotency_key}".encode('utf-8')).hexdigest()
+            stripe_key = f"servedash-{digest}"
+        intent = stripe_gateway.create_payment_intent(
             amount=amount_cents,
             currency=STRIPE_DEFAULT_CURRENCY,
             automatic_payment_methods={'enabled': True},
-            metadata=metadata
+            metadata=metadata,
+            idempotency_key=stripe_key,
+            deadline=current_deadline()
         )
+    except StripeUnavailable as e:
+        return stripe_unavailable_response(e)
     except stripe.error.StripeError as e:
         return jsonify({'error': str(e)}), 400
 
     return jsonify({
         'clientSecret': intent.client_secret,
         'paymentIntentId': intent.id,
-        'amount': str(total),
+        'amount': quote['total'],
+        'subtotal': quote['subtotal'],
+        'tax': quote['tax'],
+        'tip': quote['tip'],
         'currency': intent.currency
     })
 
 
+def stripe_unavailable_response(error):
+    """503 with Retry-After so clients back off while Stripe is unhealthy"""
+    left = remaining()
+    if left is not None and left <= 0:
+        # Our own budget ran out rather than Stripe failing; answered as a 504 in after_request
+        mark_exceeded()
+    response = jsonify({'success': False, 'error': str(error)})
+    response.status_code = 503
+    if error.retry_after:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
 @app.route('/api/payments/webhook', methods=['POST'])
 def stripe_webhook():
     """Handle Stripe webhook events"""
@@ -760,9 +1646,13 @@ def stripe_webhook():
         # Update order payment status
         with conn.cursor() as cur:
             cur.execute(
-                "UPDATE orders SET payment_status = 'paid' WHERE payment_intent_id = %s",
+                log_changes_sql(
+                    "UPDATE orders SET payment_status = 'paid', version = version + 1 WHERE payment_intent_id = %s RETURNING order_id",
+                    'orders', 'order_id', 'update'
+                ),
                 (payment_intent_id,)
             )
+        record_write('orders')
     
     return jsonify({'success': True})
 
@@ -776,33 +1666,70 @@ def get_orders():
     user = get_session_user() or {}
     email = user.get('email', '')
     role = user.get('role', '')
-    orders = read_orders()
-    
-    if role == 'admin':
-        # Admin sees all orders
-        return jsonify(orders)
-    else:
+
+    since, error = parse_since()
+    if error:
+        return jsonify({'error': error}), 400
+    if since is not None:
+        owner = None if role == 'admin' else email
+        return delta_response(
+            'orders', since,
+            lambda keys: read_orders_by_ids(keys, email=owner),
+            lambda row: row['order_id']
+        )
+
+    # Historical reports opt in to archived partitions explicitly
+    include_archived = role == 'admin' and request.args.get('include_archived') == 'true'
+
+    def load():
+        # Cursor and rows come from the same server so the cursor never runs ahead of the data
+        db = read_connection()
+        cursor = current_change_cursor('orders', db)
+        orders = read_orders(db, include_archived=include_archived)
+        if role == 'admin':
+            # Admin sees all orders
+            return {'cursor': cursor, 'rows': orders}
         # Customer sees only their orders
-        user_orders = [o for o in orders if o['email'] == email]
-        return jsonify(user_orders)
+        return {'cursor': cursor, 'rows': [o for o in orders if o['email'] == email]}
+
+    result = query_cache.get_or_compute(
+        'orders', [role, '*' if role == 'admin' else email, include_archived], ['orders'], load
+    )
+    response = jsonify(result['rows'])
+    response.headers['X-Change-Cursor'] = str(result['cursor'])
+    return response
+
+
+@app.route('/api/orders/<order_id>', methods=['GET'])
+@login_required
+def get_order(order_id):
+    """Get a single order"""
+    user = get_session_user() or {}
+    owner = None if user.get('role') == 'admin' else user.get('email', '')
+    order = get_order_by_id(order_id, email=owner)
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    return versioned_response(order, order.get('version'))
 
 
 @app.route('/api/orders', methods=['POST'])
 @role_required('customer', 'admin')
+@idempotent('create_order')
 def create_order():
     """Create new order"""
     data = request.json or {}
     user = get_session_user() or {}
     email = user.get('email', '')
-    items = data.get('items', [])
-    subtotal = data.get('subtotal', 0)
-    tax = data.get('tax', 0)
-    tip = data.get('tip', 0)
-    total = data.get('total', 0)
     payment_intent_id = data.get('payment_intent_id')
     payment_status = data.get('payment_status', 'pending')
     currency = data.get('currency', 'usd')
 
+    # Client totals are ignored; the stored order is priced from the menu
+    quote, error_response = quote_cart(data)
+    if error_response:
+        return error_response
+    items = quote['lines']
+
     allergies = parse_allergies(user.get('allergies', ''))
     conflicts = detect_allergy_conflicts(items, allergies)
     if conflicts:
@@ -815,25 +1742,63 @@ def create_order():
     # If payment_intent_id is provided, verify it with Stripe
     if payment_intent_id and STRIPE_SECRET_KEY:
         try:
-            intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            intent = stripe_gateway.retrieve_payment_intent(payment_intent_id, deadline=current_deadline())
             if intent.status != 'succeeded':
                 return jsonify({
                     'success': False,
                     'error': 'Payment not completed'
                 }), 400
+            if intent.amount != quote['total_cents']:
+                return jsonify({
+                    'success': False,
+                    'error': 'Payment amount does not match the order total'
+                }), 400
             payment_status = 'paid'
             currency = intent.currency
+        except StripeUnavailable as e:
+            return stripe_unavailable_response(e)
         except stripe.error.StripeError as e:
             return jsonify({
                 'success': False,
                 'error': f'Payment verification failed: {str(e)}'
             }), 400
     
-    order_id = save_order(email, items, subtotal, tax, tip, total, payment_intent_id, payment_status, currency)
+    order_id = save_order(
+        email, items, quote['subtotal'], quote['tax'], quote['tip'], quote['total'],
+        payment_intent_id, payment_status, currency
+    )
     
     return jsonify({
         'success': True,
-        'order_id': order_id
+        'order_id': order_id,
+        'subtotal': quote['subtotal'],
+        'tax': quote['tax'],
+        'tip': quote['tip'],
+        'total': quote['total']
+    })
+
+
+@app.route('/api/orders/bulk', methods=['PUT'])
+@role_required('admin')
+def bulk_update_orders():
+    """Update the status of many orders at once (admin only)"""
+    data = request.json or {}
+    status = (data.get('status') or '').strip().lower()
+    order_ids = [str(order_id).strip() for order_id in (data.get('order_ids') or []) if str(order_id).strip()]
+
+    if status not in ORDER_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+    if not order_ids:
+        return jsonify({'error': 'No orders selected'}), 400
+    if len(order_ids) > ORDER_BULK_LIMIT:
+        return jsonify({'error': f'At most {ORDER_BULK_LIMIT} orders can be updated at once'}), 400
+
+    updated, failures = bulk_update_order_status(order_ids, status)
+    return jsonify({
+        'success': not failures,
+        'status': status,
+        'orders': updated,
+        'failed': failures
     })
 
 
@@ -846,12 +1811,64 @@ def update_order(order_id):
     updates = {k: v for k, v in data.items() if k in allowed_fields and v is not None}
     if not updates:
         return jsonify({'error': 'No valid fields to update'}), 400
+
+    expected_version, error = parse_if_match()
+    if error:
+        return jsonify({'error': error}), 400
     
-    updated_order = update_order_record(order_id, updates)
+    updated_order = update_order_record(order_id, updates, expected_version=expected_version)
     if not updated_order:
+        current = get_order_by_id(order_id) if expected_version is not None else None
+        if current:
+            return versioned_response({
+                'error': 'Order was changed by someone else. Reload and try again.',
+                'order': current
+            }, current.get('version'), 412)
         return jsonify({'error': 'Order not found'}), 404
     
-    return jsonify({'success': True, 'order': updated_order})
+    return versioned_response({'success': True, 'order': updated_order}, updated_order.get('version'))
+
+
+# ==================== KITCHEN ====================
+
+@app.route('/api/kitchen/queue', methods=['GET'])
+@role_required('admin')
+def kitchen_queue():
+    """Active orders in FIFO order with prep totals and SLA timers"""
+    now = datetime.now()
+    sla_seconds = KITCHEN_SLA_MINUTES * 60
+    tickets = []
+    status_counts = Counter()
+    prep_counter = Counter()
+
+    for order in read_kitchen_queue(KITCHEN_QUEUE_LIMIT):
+        items = parse_order_items(order.get('items'))
+        for item in items:
+            name = item.get('name')
+            if not name:
+                continue
+            prep_counter[name] += int(item.get('quantity', 1) or 1)
+
+        created_at = parse_datetime(order.get('created_at'))
+        age_seconds = int((now - created_at).total_seconds()) if created_at else None
+        order['items'] = items
+        order['age_seconds'] = age_seconds
+        order['sla_remaining_seconds'] = sla_seconds - age_seconds if age_seconds is not None else None
+        order['overdue'] = age_seconds is not None and age_seconds > sla_seconds
+        status_counts[order.get('status')] += 1
+        tickets.append(order)
+
+    return jsonify({
+        'orders': tickets,
+        'prep_totals': [
+            {'name': name, 'quantity': quantity}
+            for name, quantity in prep_counter.most_common()
+        ],
+        'status_counts': dict(status_counts),
+        'count': len(tickets),
+        'sla_minutes': KITCHEN_SLA_MINUTES,
+        'generated_at': now.isoformat()
+    })
 
 
 # ==================== SCHEDULES ====================
@@ -863,18 +1880,38 @@ def get_schedules():
     user = get_session_user() or {}
     email = user.get('email', '')
     role = user.get('role', '')
-    schedules = read_schedules()
-    
-    if role == 'admin':
-        # Admin sees all schedules
-        return jsonify(schedules)
-    elif role == 'staff':
+    if role not in ('admin', 'staff'):
+        return jsonify([])
+
+    since, error = parse_since()
+    if error:
+        return jsonify({'error': error}), 400
+    if since is not None:
+        staff_email = None if role == 'admin' else email
+        return delta_response(
+            'schedules', since,
+            lambda keys: read_schedules_by_ids(keys, staff_email=staff_email),
+            lambda row: row['appointment_id']
+        )
+
+    def load():
+        db = read_connection()
+        cursor = current_change_cursor('schedules', db)
+        schedules = read_schedules(db)
+        if role == 'admin':
+            # Admin sees all schedules
+            return {'cursor': cursor, 'rows': schedules}
         # Staff sees their own schedule
         # Match by staff email or name
         user_schedules = [s for s in schedules if s.get('staff_email', '').lower() == email.lower()]
-        return jsonify(user_schedules)
-    else:
-        return jsonify([])
+        return {'cursor': cursor, 'rows': user_schedules}
+
+    result = query_cache.get_or_compute(
+        'schedules', [role, '*' if role == 'admin' else email.lower()], ['schedules'], load
+    )
+    response = jsonify(result['rows'])
+    response.headers['X-Change-Cursor'] = str(result['cursor'])
+    return response
 
 
 @app.route('/api/schedules', methods=['POST'])
@@ -986,6 +2023,281 @@ def request_schedule():
     )
 
     return jsonify({'success': True, 'appointment_id': appointment_id})
+
+
+@app.route('/api/schedules/bulk', methods=['POST'])
+@role_required('admin')
+def create_appointments_bulk():
+    """Create recurring shifts from a weekly pattern for many staff members (admin only)"""
+    data = request.json or {}
+    user = get_session_user() or {}
+    manager_email = user.get('email', '')
+    raw_emails = data.get('staff_emails') or []
+    pattern = data.get('pattern') or []
+    if not isinstance(raw_emails, list) or not all(isinstance(email, str) for email in raw_emails):
+        return jsonify({'success': False, 'error': 'staff_emails must be a list of emails'}), 400
+    if not isinstance(pattern, list) or not all(isinstance(entry, dict) for entry in pattern):
+        return jsonify({'success': False, 'error': 'pattern must be a list of objects'}), 400
+    staff_emails = list(dict.fromkeys(email.strip().lower() for email in raw_emails if email.strip()))
+    start_date = parse_date(data.get('start_date'))
+    end_date = parse_date(data.get('end_date'))
+    dry_run = bool(data.get('dry_run'))
+
+    if not staff_emails or not start_date or not end_date:
+        return jsonify({'success': False, 'error': 'Staff, start date and end date are required'}), 400
+    if end_date < start_date:
+        return jsonify({'success': False, 'error': 'End date must be on or after start date'}), 400
+    if (end_date - start_date).days >= SCHEDULE_BULK_MAX_DAYS:
+        return jsonify({'success': False, 'error': f'Date range cannot exceed {SCHEDULE_BULK_MAX_DAYS} days'}), 400
+
+    pattern_by_weekday = {}
+    for entry in pattern:
+        weekday = parse_weekday(entry.get('weekday'))
+        time_slot = (entry.get('time_slot') or '').strip()
+        if weekday is None or not time_slot or not parse_time_string('2000-01-01', time_slot):
+            return jsonify({'success': False, 'error': 'Each pattern entry needs a weekday and a valid time slot'}), 400
+        pattern_by_weekday.setdefault(weekday, []).append({
+            'time_slot': time_slot,
+            'end_time': (entry.get('end_time') or '').strip(),
+            'location': (entry.get('location') or 'Main Truck').strip(),
+            'shift_type': (entry.get('shift_type') or DEFAULT_SHIFT_TYPES[0]).strip(),
+            'priority': (entry.get('priority') or 'normal').strip(),
+            'notes': (entry.get('notes') or '').strip(),
+        })
+    if not pattern_by_weekday:
+        return jsonify({'success': False, 'error': 'A weekly pattern is required'}), 400
+
+    staff_users = read_users_by_emails(staff_emails)
+    report = []
+    candidates = []
+    for staff_email in staff_emails:
+        staff_user = staff_users.get(staff_email)
+        if not staff_user or staff_user.get('role') != 'staff':
+            report.append({'staff_email': staff_email, 'status': 'error', 'error': 'Staff member not found'})
+            continue
+        staff_name = f"{staff_user.get('first_name', '').strip()} {staff_user.get('last_name', '').strip()}".strip() or staff_user.get('email')
+        day = start_date
+        while day <= end_date and len(candidates) <= SCHEDULE_BULK_LIMIT:
+            date_str = day.isoformat()
+            for entry in pattern_by_weekday.get(day.weekday(), []):
+                shift = dict(entry, staff_email=staff_email, staff_name=staff_name, date=date_str, status='scheduled')
+                shift['start_time'] = parse_time_string(date_str, entry['time_slot'])
+                shift['end_time'] = parse_time_string(date_str, entry['end_time']) if entry['end_time'] else None
+                shift['start_time'], shift['end_time'] = shift_window(shift)
+                candidates.append(shift)
+            day += timedelta(days=1)
+        if len(candidates) > SCHEDULE_BULK_LIMIT:
+            # Stop building candidates as soon as the request is known to be too big
+            break
+
+    if len(candidates) > SCHEDULE_BULK_LIMIT:
+        return jsonify({'success': False, 'error': f'At most {SCHEDULE_BULK_LIMIT} shifts can be created at once'}), 400
+
+    accepted = book_shifts(candidates, manager_email, dry_run=dry_run)
+    report.extend(candidates)
+    return jsonify({
+        'success': True,
+        'dry_run': dry_run,
+        'created': 0 if dry_run else len(accepted),
+        'accepted': len(accepted),
+        'rejected': len(candidates) - len(accepted),
+        'shifts': report
+    })
+
+
+@app.route('/api/schedules/auto-assign', methods=['POST'])
+@role_required('admin')
+def auto_assign_shifts():
+    """Propose shift assignments that cover the requested slots (admin only)"""
+    data = request.json or {}
+    week_start = parse_date(data.get('week_start'))
+    try:
+        weeks = int(data.get('weeks') or 1)
+        max_hours_per_week = float(data.get('max_hours_per_week') or 40)
+        max_shifts_per_day = int(data.get('max_shifts_per_day') or 1)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Invalid fairness limits'}), 400
+
+    if not week_start:
+        return jsonify({'success': False, 'error': 'Week start date is required'}), 400
+    if not 1 <= weeks <= AUTO_ASSIGN_MAX_WEEKS:
+        return jsonify({'success': False, 'error': f'Weeks must be between 1 and {AUTO_ASSIGN_MAX_WEEKS}'}), 400
+
+    raw_coverage = data.get('coverage') or []
+    invalid_coverage = 'Each coverage entry needs a valid time slot and headcount'
+    if not isinstance(raw_coverage, list) or not all(isinstance(entry, dict) for entry in raw_coverage):
+        return jsonify({'success': False, 'error': invalid_coverage}), 400
+    text_fields = ('time_slot', 'end_time', 'shift_type', 'location', 'priority')
+    coverage = []
+    for entry in raw_coverage:
+        if not all(isinstance(entry.get(field) or '', str) for field in text_fields):
+            return jsonify({'success': False, 'error': invalid_coverage}), 400
+        time_slot = (entry.get('time_slot') or '').strip()
+        weekday = parse_weekday(entry.get('weekday')) if entry.get('weekday') is not None else None
+        try:
+            headcount = int(entry.get('headcount') or 1)
+        except (TypeError, ValueError):
+            headcount = 0
+        if time_slot not in TIME_SLOTS or headcount < 1 or (entry.get('weekday') is not None and weekday is None):
+            return jsonify({'success': False, 'error': invalid_coverage}), 400
+        coverage.append({
+            'weekday': weekday,
+            'time_slot': time_slot,
+            'end_time': (entry.get('end_time') or '').strip(),
+            'shift_type': (entry.get('shift_type') or DEFAULT_SHIFT_TYPES[0]).strip(),
+            'location': (entry.get('location') or 'Main Truck').strip(),
+            'priority': (entry.get('priority') or 'normal').strip(),
+            'headcount': headcount,
+        })
+    if not coverage:
+        return jsonify({'success': False, 'error': 'Coverage requirements are required'}), 400
+
+    end_date = week_start + timedelta(days=7 * weeks - 1)
+    demands = []
+    day = week_start
+    while day <= end_date:
+        date_str = day.isoformat()
+        for entry in coverage:
+            if entry['weekday'] is not None and entry['weekday'] != day.weekday():
+                continue
+            window = {
+                'date': date_str,
+                'time_slot': entry['time_slot'],
+                'end_time': parse_time_string(date_str, entry['end_time']) if entry['end_time'] else None,
+            }
+            interval = shift_interval(window)
+            if not interval:
+                return jsonify({'success': False, 'error': 'End time must be after start time'}), 400
+            demands.append(dict(entry, date=date_str, interval=interval))
+        day += timedelta(days=1)
+
+    staff_users = [u for u in read_users() if u.get('role') == 'staff']
+    existing_rows = read_schedules_for_staff(
+        [u['email'] for u in staff_users],
+        (week_start - timedelta(days=7)).isoformat(),
+        (end_date + timedelta(days=7)).isoformat(),
+    )
+    assignments, unfilled = propose_shift_assignments(
+        staff_users, existing_rows, demands, max_hours_per_week, max_shifts_per_day
+    )
+
+    load = Counter(shift['staff_email'] for shift in assignments)
+    return jsonify({
+        'success': True,
+        'assignments': assignments,
+        'unfilled': unfilled,
+        'load': [{'staff_email': email, 'shifts': count} for email, count in sorted(load.items())]
+    })
+
+
+@app.route('/api/schedules/auto-assign/apply', methods=['POST'])
+@role_required('admin')
+def apply_shift_assignments():
+    """Book a proposed set of assignments in one step (admin only)"""
+    data = request.json or {}
+    user = get_session_user() or {}
+    manager_email = user.get('email', '')
+    assignments = data.get('assignments') or []
+    if not assignments:
+        return jsonify({'success': False, 'error': 'No assignments to apply'}), 400
+    if not isinstance(assignments, list) or not all(isinstance(a, dict) for a in assignments):
+        return jsonify({'success': False, 'error': 'assignments must be a list of objects'}), 400
+    if len(assignments) > SCHEDULE_BULK_LIMIT:
+        return jsonify({'success': False, 'error': f'At most {SCHEDULE_BULK_LIMIT} shifts can be created at once'}), 400
+
+    staff_users = read_users_by_emails([(a.get('staff_email') or '') for a in assignments])
+    report = []
+    candidates = []
+    for assignment in assignments:
+        staff_email = (assignment.get('staff_email') or '').strip().lower()
+        staff_user = staff_users.get(staff_email)
+        date = (assignment.get('date') or '').strip()
+        time_slot = (assignment.get('time_slot') or '').strip()
+        if not staff_user or staff_user.get('role') != 'staff' or not parse_date(date) or not time_slot:
+            report.append(dict(assignment, status='error', error='Invalid assignment'))
+            continue
+        shift = {
+            'staff_email': staff_email,
+            'staff_name': f"{staff_user.get('first_name', '').strip()} {staff_user.get('last_name', '').strip()}".strip() or staff_user.get('email'),
+            'date': date,
+            'time_slot': time_slot,
+            'start_time': assignment.get('start_time') or parse_time_string(date, time_slot),
+            'end_time': assignment.get('end_time'),
+            'location': (assignment.get('location') or 'Main Truck').strip(),
+            'shift_type': (assignment.get('shift_type') or DEFAULT_SHIFT_TYPES[0]).strip(),
+            'priority': (assignment.get('priority') or 'normal').strip(),
+            'notes': (assignment.get('notes') or '').strip(),
+        }
+        shift['start_time'], shift['end_time'] = shift_window(shift)
+        candidates.append(shift)
+
+    accepted = book_shifts(candidates, manager_email)
+    report.extend(candidates)
+    return jsonify({
+        'success': len(accepted) == len(assignments),
+        'created': len(accepted),
+        'rejected': len(assignments) - len(accepted),
+        'shifts': report
+    })
+
+
+@app.route('/api/schedules/coverage', methods=['GET'])
+@role_required('admin')
+def schedule_coverage():
+    """Booked and free staff for every time slot in a date window (admin only)"""
+    start_date = parse_date(request.args.get('from'))
+    end_date = parse_date(request.args.get('to')) or start_date
+    if not start_date:
+        return jsonify({'error': 'A from date is required'}), 400
+    if end_date < start_date:
+        return jsonify({'error': 'The to date must be on or after the from date'}), 400
+    if (end_date - start_date).days >= COVERAGE_MAX_DAYS:
+        return jsonify({'error': f'Date range cannot exceed {COVERAGE_MAX_DAYS} days'}), 400
+
+    staff = {
+        u['email'].lower(): f"{u.get('first_name', '').strip()} {u.get('last_name', '').strip()}".strip() or u['email']
+        for u in read_users() if u.get('role') == 'staff'
+    }
+    # Shifts from the previous day can run past midnight into the window
+    rows = read_schedules_in_range(
+        (start_date - timedelta(days=1)).isoformat(),
+        end_date.isoformat(),
+    )
+    intervals = []
+    for row in rows:
+        interval = shift_interval(row)
+        if interval:
+            intervals.append((interval[0], interval[1], (row.get('staff_email') or '').lower()))
+
+    slots = []
+    labels = []
+    day = start_date
+    while day <= end_date:
+        date_str = day.isoformat()
+        for time_slot in TIME_SLOTS:
+            slot_start = datetime.fromisoformat(parse_time_string(date_str, time_slot))
+            slots.append((slot_start, slot_start + timedelta(minutes=COVERAGE_SLOT_MINUTES)))
+            labels.append((date_str, time_slot))
+        day += timedelta(days=1)
+
+    grid = {}
+    for (date_str, time_slot), busy in zip(labels, sweep_slot_occupancy(intervals, slots)):
+        booked = sorted(email for email in busy if email in staff)
+        grid.setdefault(date_str, []).append({
+            'time_slot': time_slot,
+            'booked': [{'email': email, 'name': staff[email]} for email in booked],
+            'free': [{'email': email, 'name': name} for email, name in sorted(staff.items()) if email not in busy],
+            'headcount': len(booked)
+        })
+
+    return jsonify({
+        'from': start_date.isoformat(),
+        'to': end_date.isoformat(),
+        'staff_count': len(staff),
+        'days': [{'date': date_str, 'slots': grid[date_str]} for date_str in sorted(grid)]
+    })
+
+
 # Preview conflicts endpoint
 @app.route('/api/schedules/conflicts', methods=['GET'])
 @role_required('admin')
@@ -1015,7 +2327,7 @@ def preview_conflicts():
     return jsonify({'conflicts': conflicts})
 
 
-def update_schedule_record(appointment_id, updates):
+def update_schedule_record(appointment_id, updates, expected_version=None):
     """Update a schedule record in the database and return the updated row"""
     if not appointment_id:
         return None
@@ -1027,22 +2339,37 @@ def update_schedule_record(appointment_id, updates):
     for key, value in update_doc.items():
         set_clauses.append(f"{key} = %s")
         params.append(value)
-    params.append(appointment_id)
+    # Bump the version so concurrent editors holding an older ETag are rejected
+    set_clauses.append("version = version + 1")
+    params.extend([appointment_id, expected_version, expected_version])
     query = (
         "UPDATE schedules "
         f"SET {', '.join(set_clauses)} "
-        "WHERE appointment_id = %s "
+        "WHERE appointment_id = %s AND (%s::int IS NULL OR version = %s) "
         "RETURNING appointment_id, manager_email, staff_email, staff_name, date, time_slot, status, notes, created_at, "
-        "start_time, end_time, location, shift_type, staff_notes, priority"
+        "start_time, end_time, location, shift_type, staff_notes, priority, version"
     )
     with conn.cursor() as cur:
-        cur.execute(query, tuple(params))
+        cur.execute(log_changes_sql(query, 'schedules', 'appointment_id', 'update'), tuple(params))
         row = cur.fetchone()
+    record_write('schedules')
     if not row:
         return None
     return dict(row)
 
 
+@app.route('/api/schedules/<appointment_id>', methods=['GET'])
+@role_required('admin', 'staff')
+def get_schedule(appointment_id):
+    """Get a single appointment"""
+    user = get_session_user() or {}
+    staff_email = None if user.get('role') == 'admin' else user.get('email', '')
+    schedule = get_schedule_by_id(appointment_id, staff_email=staff_email)
+    if not schedule:
+        return jsonify({'error': 'Appointment not found'}), 404
+    return versioned_response(schedule, schedule.get('version'))
+
+
 @app.route('/api/schedules/<appointment_id>', methods=['PUT'])
 @login_required
 def update_schedule(appointment_id):
@@ -1052,15 +2379,23 @@ def update_schedule(appointment_id):
     role = user.get('role', '')
     user_email = user.get('email', '').lower()
 
-    # Load current schedule
-    schedules = read_schedules()
-    current = next((s for s in schedules if s.get('appointment_id') == appointment_id), None)
+    expected_version, error = parse_if_match()
+    if error:
+        return jsonify({'error': error}), 400
+
+    # Staff can only modify their own appointments, so only their own are loaded; the
+    # ownership check has to come before the version check, whose 412 carries the row
+    owner_email = user_email if role == 'staff' else None
+    current = get_schedule_by_id(appointment_id, staff_email=owner_email)
     if not current:
+        if owner_email and get_schedule_by_id(appointment_id):
+            return jsonify({'error': 'Forbidden'}), 403
         return jsonify({'error': 'Appointment not found'}), 404
-
-    # Staff can only modify their own appointments
-    if role == 'staff' and current.get('staff_email', '').lower() != user_email:
-        return jsonify({'error': 'Forbidden'}), 403
+    if expected_version is not None and current.get('version') != expected_version:
+        return versioned_response({
+            'error': 'Appointment was changed by someone else. Reload and try again.',
+            'schedule': current
+        }, current.get('version'), 412)
 
     updates = {}
 
@@ -1115,91 +2450,151 @@ def update_schedule(appointment_id):
     if data.get('staff_notes') is not None:
         updates['staff_notes'] = data.get('staff_notes', '')
 
-    updated_schedule = update_schedule_record(appointment_id, updates)
+    # manager_email alone is bookkeeping, not an edit
+    if not any(key != 'manager_email' for key in updates):
+        return jsonify({'error': 'No valid fields to update'}), 400
+
+    # The version check is repeated in the UPDATE itself, so a write that raced past the
+    # read above is still rejected
+    updated_schedule = update_schedule_record(appointment_id, updates, expected_version=expected_version)
     if not updated_schedule:
+        current = get_schedule_by_id(appointment_id, staff_email=owner_email) if expected_version is not None else None
+        if current:
+            return versioned_response({
+                'error': 'Appointment was changed by someone else. Reload and try again.',
+                'schedule': current
+            }, current.get('version'), 412)
         return jsonify({'error': 'Appointment not found'}), 404
 
-    return jsonify({'success': True, 'schedule': updated_schedule})
+    return versioned_response({'success': True, 'schedule': updated_schedule}, updated_schedule.get('version'))
 
 
 # ==================== ADMIN DASHBOARD ====================
 
+def compute_admin_dashboard(include_archived=False):
+    """Aggregate orders and schedules into the dashboard payload"""
+    db = read_connection()
+    orders = read_orders(db, include_archived=include_archived)
+    schedules = read_schedules(db)
+    return aggregate_dashboard(orders, schedules, datetime.now().date())
+
+
 @app.route('/api/admin/dashboard', methods=['GET'])
 @role_required('admin')
 def admin_dashboard():
     """Get admin dashboard stats"""
-    orders = read_orders()
-    schedules = read_schedules()
-    
-    total_orders = len(orders)
-    total_revenue = sum(float(o.get('total', 0) or 0) for o in orders)
-    pending_orders = len([o for o in orders if o.get('status') == 'pending'])
-    total_appointments = len(schedules)
-    
-    # Revenue trend (last 7 days)
-    today = datetime.now().date()
-    start_date = today - timedelta(days=6)
-    revenue_trend = []
-    for i in range(7):
-        current_day = start_date + timedelta(days=i)
-        day_label = current_day.strftime('%b %d')
-        day_orders = 0
-        day_revenue = 0.0
-        for order in orders:
-            created_at = parse_datetime(order.get('created_at'))
-            if created_at and created_at.date() == current_day:
-                day_orders += 1
-                day_revenue += float(order.get('total', 0) or 0)
-        revenue_trend.append({
-            'date': day_label,
-            'orders': day_orders,
-            'revenue': round(day_revenue, 2)
-        })
-    
-    # Top dishes
-    dish_counter = Counter()
-    for order in orders:
-        items_raw = order.get('items')
-        if not items_raw:
-            continue
-        try:
-            items = json.loads(items_raw)
-        except (TypeError, json.JSONDecodeError):
-            continue
-        for item in items:
-            name = item.get('name')
-            if not name:
-                continue
-            qty = int(item.get('quantity', 1))
-            dish_counter[name] += qty
-    top_dishes = [
-        {'name': name, 'orders': count}
-        for name, count in dish_counter.most_common(5)
-    ]
-    
-    recent_orders = sorted(orders, key=lambda x: x.get('created_at', ''), reverse=True)[:5]
-    
+    # All-time totals only cover archived orders when asked for
+    include_archived = request.args.get('include_archived') == 'true'
+    # The revenue trend is relative to today, so the date is part of the key
+    stats = query_cache.get_or_compute(
+        'admin_dashboard', [datetime.now().date().isoformat(), include_archived], ['orders', 'schedules'],
+        lambda: compute_admin_dashboard(include_archived)
+    )
+    return jsonify(stats)
+
+
+@app.route('/api/admin/cache', methods=['GET'])
+@role_required('admin')
+def admin_cache_stats():
+    """Query cache hit/miss statistics"""
+    return jsonify(query_cache.stats())
+
+
+@app.route('/api/admin/stripe', methods=['GET'])
+@role_required('admin')
+def admin_stripe_stats():
+    """Stripe circuit breaker state and per-operation latency histograms"""
+    return jsonify(stripe_gateway.snapshot())
+
+
+@app.route('/api/admin/admission', methods=['GET'])
+@role_required('admin')
+def admin_admission_stats():
+    """In-flight requests, per-endpoint queues and shed counts for this worker"""
+    return jsonify(admission.snapshot())
+
+
+@app.route('/api/admin/slow-queries', methods=['GET'])
+@role_required('admin')
+def admin_slow_queries():
+    """Slowest statements grouped by normalized SQL, plus the most recent slow executions"""
+    slow_query_log = InstrumentedCursor.slow_query_log
+    if slow_query_log is None:
+        return jsonify({'enabled': False, 'top': [], 'recent': []})
+    order_by = request.args.get('order_by', 'total_ms')
+    if order_by not in ('total_ms', 'max_ms', 'mean_ms', 'count'):
+        return jsonify({'error': 'order_by must be one of total_ms, max_ms, mean_ms, count'}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
     return jsonify({
-        'stats': {
-            'total_orders': total_orders,
-            'total_revenue': round(total_revenue, 2),
-            'pending_orders': pending_orders,
-            'total_appointments': total_appointments,
-            'revenue_trend': revenue_trend
-        },
-        'recent_orders': recent_orders,
-        'top_dishes': top_dishes
+        'enabled': True,
+        'threshold_ms': SLOW_QUERY_THRESHOLD_MS,
+        'top': slow_query_log.top(limit, order_by),
+        'recent': slow_query_log.recent(limit)
     })
 
 
+@app.route('/api/admin/profiles', methods=['GET'])
+@role_required('admin')
+def admin_profiles():
+    """Recently captured request profiles, newest first"""
+    return jsonify(request_profiler.list())
+
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@role_required('admin')
+def admin_profile(profile_id):
+    """One profile as a top-N table, or as collapsed stacks with ?format=collapsed"""
+    profile = request_profiler.get(profile_id)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    if request.args.get('format') == 'collapsed':
+        if profile['mode'] != 'sample':
+            return jsonify({'error': 'Collapsed stacks are only available for sampled profiles'}), 400
+        return Response(collapsed_stacks(profile), mimetype='text/plain')
+    return jsonify({key: value for key, value in profile.items() if key != 'collapsed'})
+
+
+@app.route('/api/admin/metrics', methods=['GET'])
+@role_required('admin')
+def admin_metrics():
+    """Request, SQL, Stripe and cache metrics in Prometheus text format"""
+    lines = request_metrics.render()
+    lines.extend(render_stripe(stripe_gateway.snapshot()))
+    lines.extend(render_query_cache(query_cache.stats()))
+    lines.extend(render_admission(admission.snapshot()))
+    lines.extend(render_deadlines(request_deadlines.snapshot()))
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
 # ==================== STAFF ====================
 
 @app.route('/api/staff', methods=['GET'])
 @role_required('admin')
 def list_staff():
     """Admin: list staff members"""
-    staff_users = [sanitize_user(u) for u in read_users() if u.get('role') == 'staff']
-    return jsonify(staff_users)
+    since, error = parse_since()
+    if error:
+        return jsonify({'error': error}), 400
+    if since is not None:
+        return delta_response(
+            'users', since,
+            lambda keys: [sanitize_user(u) for u in read_users_by_emails(keys).values() if u.get('role') == 'staff'],
+            lambda row: row['email'].lower()
+        )
+
+    def load():
+        db = read_connection()
+        cursor = current_change_cursor('users', db)
+        staff_users = [sanitize_user(u) for u in read_users(db) if u.get('role') == 'staff']
+        return {'cursor': cursor, 'rows': staff_users}
+
+    result = query_cache.get_or_compute('staff', ['admin'], ['users'], load)
+    response = jsonify(result['rows'])
+    response.headers['X-Change-Cursor'] = str(result['cursor'])
+    return response
 
 
 @app.route('/api/staff', methods=['POST'])
@@ -1293,6 +2688,82 @@ def get_time_slots():
     return jsonify(TIME_SLOTS)
 
 
+# ==================== HEALTH ====================
+
+def check_database():
+    started = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    return (DEGRADED if latency_ms > READINESS_DB_SLOW_MS else OK), {'latency_ms': latency_ms}
+
+
+def check_saturation():
+    if ADMISSION_CAPACITY <= 0:
+        return OK, {'admission_control': False}
+    snapshot = admission.snapshot()
+    details = {key: snapshot[key] for key in ('capacity', 'in_flight', 'utilization')}
+    return (FAIL if snapshot['utilization'] >= READINESS_MAX_UTILIZATION else OK), details
+
+
+def check_menu_cache():
+    try:
+        mtime = os.path.getmtime(MENU_CACHE_FILE)
+    except OSError:
+        return DEGRADED, {'error': 'menu cache file is missing, serving the built-in menu'}
+    # The file is only re-read when it changes
+    if menu_health_state['mtime'] != mtime:
+        try:
+            with open(MENU_CACHE_FILE, 'r', encoding='utf-8') as f:
+                timestamp = json.load(f).get('timestamp')
+            menu_health_state['timestamp'] = timestamp and datetime.fromisoformat(timestamp).astimezone().replace(tzinfo=None)
+            menu_health_state['error'] = None
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            # Unreadable JSON, a non-object document or a malformed timestamp
+            menu_health_state['timestamp'] = None
+            menu_health_state['error'] = f"menu cache is unreadable: {e}"
+        menu_health_state['mtime'] = mtime
+    if menu_health_state['error']:
+        return DEGRADED, {'error': menu_health_state['error']}
+    timestamp = menu_health_state['timestamp']
+    if not timestamp:
+        return DEGRADED, {'error': 'menu cache has no timestamp'}
+    age_hours = (datetime.now() - timestamp).total_seconds() / 3600
+    details = {'timestamp': timestamp.isoformat(), 'age_hours': round(age_hours, 1)}
+    return (DEGRADED if age_hours > MENU_CACHE_MAX_AGE_HOURS else OK), details
+
+
+def check_stripe():
+    if not STRIPE_SECRET_KEY:
+        return OK, {'configured': False}
+    circuit = stripe_gateway.breaker.snapshot()
+    return (OK if circuit['state'] == 'closed' else DEGRADED), circuit
+
+
+menu_health_state = {'mtime': None, 'timestamp': None, 'error': None}
+health_checker = HealthChecker({
+    'database': check_database,
+    'saturation': check_saturation,
+    'menu_cache': check_menu_cache,
+    'stripe': check_stripe,
+}, cache_seconds=READINESS_CACHE_SECONDS)
+
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests; touches no dependency"""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 503 while the database is unreachable or this worker is saturated"""
+    result = health_checker.readiness()
+    # A timed-out database check is already reported as failed; keep the check details in the body
+    g.pop('deadline_exceeded', None)
+    return jsonify(result), (200 if result['ready'] else 503)
+
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
 
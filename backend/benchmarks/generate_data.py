@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator for scale testing.
+
+Creates customers, staff, orders and shifts at production-like volumes and loads
+them with COPY, split into chunks that are generated and copied by parallel
+worker processes. Every chunk draws from its own RNG seeded with
+(seed, table, chunk), so the same arguments always produce the same rows no
+matter how many workers run.
+
+Orders are priced from menu_cache.json through pricing.price_cart, and shifts
+use the app's TIME_SLOTS and DEFAULT_SHIFT_TYPES. Synthetic accounts live under
+@synthetic.servedash.test and can be removed again with --reset.
+
+    python benchmarks/generate_data.py --customers 100000 --orders 5000000 --years 3 --workers 8
+    python benchmarks/generate_data.py --reset
+
+The schema must already exist: run setup_database.py and start the app once.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from multiprocessing import Pool
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+from werkzeug.security import generate_password_hash
+
+from menu import MENU_CACHE_FILE, load_menu_from_cache
+from order_partitions import add_months, create_month_partition, is_partitioned, month_start
+from pricing import MenuCatalog, price_cart
+from scheduling import DEFAULT_SHIFT_TYPES, TIME_SLOTS, parse_time_string
+
+load_dotenv(".env.local")
+load_dotenv()
+
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+EMAIL_DOMAIN = 'synthetic.servedash.test'
+SYNTHETIC_PASSWORD = 'password123'
+MANAGER_EMAIL = 'admin@foodtruck.com'
+CHUNK_ROWS = 50000
+
+USER_COLUMNS = ['email', 'password', 'first_name', 'last_name', 'mobile', 'address', 'dob', 'sex',
+                'registration_date', 'role', 'allergies', 'availability']
+ORDER_COLUMNS = ['order_id', 'email', 'items', 'subtotal', 'tax', 'tip', 'total', 'status', 'created_at',
+                 'payment_intent_id', 'payment_status', 'currency', 'version']
+SCHEDULE_COLUMNS = ['appointment_id', 'manager_email', 'staff_email', 'staff_name', 'date', 'time_slot',
+                    'status', 'notes', 'created_at', 'start_time', 'end_time', 'location', 'shift_type',
+                    'staff_notes', 'priority', 'version']
+
+FIRST_NAMES = ['Alex', 'Blair', 'Casey', 'Devon', 'Emery', 'Finley', 'Gray', 'Harper', 'Indy', 'Jordan',
+               'Kai', 'Logan', 'Morgan', 'Noel', 'Oakley', 'Parker', 'Quinn', 'Riley', 'Sage', 'Taylor']
+LAST_NAMES = ['Adams', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Ito', 'Jones',
+              'Khan', 'Lopez', 'Miller', 'Nguyen', 'Okafor', 'Patel', 'Rossi', 'Smith', 'Tanaka', 'Walker']
+ALLERGY_CHOICES = ['', '', '', '', 'peanuts', 'dairy', 'gluten', 'shellfish', 'soy, egg']
+AVAILABILITY_CHOICES = ['Weekdays 8a-5p', 'Weekends 10a-6p', 'Mon-Wed 9a-3p', 'Thu-Sun 11a-7p', 'Daily 9a-5p']
+LOCATIONS = ['Main Truck', 'Downtown Cart', 'Campus Pop-up', 'Catering Van']
+# Order statuses weighted so most history is completed
+ORDER_STATUS_WEIGHTS = {'completed': 85, 'cancelled': 5, 'ready': 3, 'preparing': 3, 'pending': 4}
+
+def chunk_rng(seed, table, chunk):
+    return random.Random(f"{seed}:{table}:{chunk}")
+
+
+def customer_email(index):
+    return f"customer{index:07d}@{EMAIL_DOMAIN}"
+
+
+def staff_email(index):
+    return f"staff{index:05d}@{EMAIL_DOMAIN}"
+
+
+def staff_name(index):
+    return f"{FIRST_NAMES[index % len(FIRST_NAMES)]} {LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+
+
+def user_rows(job):
+    rng = chunk_rng(job['seed'], 'users', job['chunk'])
+    registered = datetime.fromisoformat(job['start'])
+    for index in range(job['first'], job['last']):
+        is_staff = index < job['staff']
+        role_index = index if is_staff else index - job['staff']
+        yield [
+            staff_email(role_index) if is_staff else customer_email(role_index),
+            job['password_hash'],
+            FIRST_NAMES[rng.randrange(len(FIRST_NAMES))] if not is_staff else staff_name(role_index).split()[0],
+            LAST_NAMES[rng.randrange(len(LAST_NAMES))] if not is_staff else staff_name(role_index).split()[1],
+            f"555-{rng.randrange(10000):04d}",
+            f"{rng.randint(1, 9999)} Synthetic Ave",
+            f"{rng.randint(1950, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            rng.choice(['female', 'male', 'other']),
+            (registered + timedelta(minutes=rng.randrange(job['span_minutes']))).isoformat(),
+            'staff' if is_staff else 'customer',
+            '' if is_staff else rng.choice(ALLERGY_CHOICES),
+            rng.choice(AVAILABILITY_CHOICES) if is_staff else '',
+        ]
+
+
+def order_rows(job):
+    rng = chunk_rng(job['seed'], 'orders', job['chunk'])
+    items = load_menu_from_cache(os.path.join(BACKEND_DIR, MENU_CACHE_FILE))
+    catalog = MenuCatalog(items)
+    statuses = list(ORDER_STATUS_WEIGHTS)
+    weights = list(ORDER_STATUS_WEIGHTS.values())
+    start_ms = job['start_ms']
+    step_ms = job['step_ms']
+    for index in range(job['first'], job['last']):
+        # One slot of step_ms per order keeps ORD<ms> ids unique and chronological
+        created_ms = start_ms + index * step_ms + rng.randrange(step_ms)
+        created = datetime.fromtimestamp(created_ms / 1000)
+        lines = [
+            {'id': item['id'], 'quantity': rng.choices([1, 2, 3, 4], [60, 25, 10, 5])[0]}
+            for item in rng.sample(items, rng.choices([1, 2, 3, 4, 5], [35, 30, 20, 10, 5])[0])
+        ]
+        quote, _ = price_cart(catalog, lines, tip=rng.choice([0, 0, 1, 2, 3, 5]))
+        yield [
+            f"ORD{created_ms}",
+            customer_email(rng.randrange(job['customers'])),
+            json.dumps(quote['lines']),
+            quote['subtotal'],
+            quote['tax'],
+            quote['tip'],
+            quote['total'],
+            rng.choices(statuses, weights)[0],
+            created.isoformat(),
+            f"pi_synthetic_{index:010d}",
+            'paid',
+            'usd',
+            1,
+        ]
+
+
+def schedule_rows(job):
+    rng = chunk_rng(job['seed'], 'schedules', job['chunk'])
+    today = date.fromisoformat(job['today'])
+    first_day = date.fromisoformat(job['start'])
+    for index in range(job['first'], job['last']):
+        # Shifts are spread evenly over days; staff and slot vary per shift
+        day = first_day + timedelta(days=index * job['days'] // job['total'])
+        slot = rng.randrange(len(TIME_SLOTS))
+        start = parse_time_string(day.isoformat(), TIME_SLOTS[slot])
+        hours = rng.choice([2, 3, 4, 6, 8])
+        end = (datetime.fromisoformat(start) + timedelta(hours=hours)).isoformat()
+        member = rng.randrange(job['staff'])
+        if day < today:
+            status = rng.choices(['completed', 'cancelled', 'denied'], [92, 6, 2])[0]
+        else:
+            status = rng.choices(['scheduled', 'confirmed', 'requested'], [70, 20, 10])[0]
+        yield [
+            f"APT{job['id_base'] + index}",
+            MANAGER_EMAIL,
+            staff_email(member),
+            staff_name(member),
+            day.isoformat(),
+            TIME_SLOTS[slot],
+            status,
+            '',
+            (datetime.combine(day, datetime.min.time()) - timedelta(days=rng.randint(1, 21))).isoformat(),
+            start,
+            end,
+            rng.choice(LOCATIONS),
+            rng.choice(DEFAULT_SHIFT_TYPES),
+            '',
+            rng.choices(['normal', 'high', 'low'], [80, 15, 5])[0],
+            1,
+        ]
+
+
+GENERATORS = {
+    'users': (USER_COLUMNS, user_rows),
+    'orders': (ORDER_COLUMNS, order_rows),
+    'schedules': (SCHEDULE_COLUMNS, schedule_rows),
+}
+
+
+def csv_field(value):
+    text = str(value)
+    if any(char in text for char in ',"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def load_chunk(job):
+    """Worker: generate one chunk as CSV in memory and COPY it in"""
+    columns, generate = GENERATORS[job['table']]
+    buffer = io.StringIO()
+    for row in generate(job):
+        buffer.write(','.join(csv_field(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    conn = psycopg2.connect(job['database_url'])
+    try:
+        with conn, conn.cursor() as cur:
+            cur.copy_expert(f"COPY {job['table']} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        conn.close()
+    return job['last'] - job['first']
+
+
+def make_jobs(table, total, base):
+    return [
+        dict(base, table=table, chunk=chunk, first=first, last=min(first + CHUNK_ROWS, total))
+        for chunk, first in enumerate(range(0, total, CHUNK_ROWS))
+    ]
+
+
+def run_jobs(pool, table, jobs):
+    if not jobs:
+        return
+    started = time.perf_counter()
+    loaded = 0
+    for count in pool.imap_unordered(load_chunk, jobs):
+        loaded += count
+        print(f"\r  {table}: {loaded:,} rows", end='', flush=True)
+    elapsed = time.perf_counter() - started
+    print(f"\r  {table}: {loaded:,} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def check_schema(conn):
+    with conn.cursor() as cur:
+        for table, (columns, _) in GENERATORS.items():
+            cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+            missing = set(columns) - {row['column_name'] for row in cur.fetchall()}
+            if missing:
+                raise RuntimeError(
+                    f"{table} is missing columns {sorted(missing)}; run setup_database.py and start the app once first."
+                )
+
+
+def ensure_order_partitions(conn, first_day, last_day):
+    """Partitioned orders need a partition for every month the data covers"""
+    if not is_partitioned(conn):
+        return
+    month = month_start(first_day)
+    while month <= last_day:
+        create_month_partition(conn, month)
+        month = add_months(month, 1)
+
+
+def reset(conn):
+    pattern = f"%@{EMAIL_DOMAIN}"
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM orders WHERE email LIKE %s", (pattern,))
+        print(f"Deleted {cur.rowcount:,} synthetic orders")
+        cur.execute("DELETE FROM schedules WHERE staff_email LIKE %s", (pattern,))
+        print(f"Deleted {cur.rowcount:,} synthetic shifts")
+        cur.execute("DELETE FROM users WHERE email LIKE %s", (pattern,))
+        print(f"Deleted {cur.rowcount:,} synthetic users")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load synthetic users, orders and shifts for scale testing")
+    parser.add_argument('--customers', type=int, default=100000)
+    parser.add_argument('--staff', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=5000000)
+    parser.add_argument('--shifts', type=int, default=500000)
+    parser.add_argument('--years', type=float, default=3, help="History covered by orders and past shifts")
+    parser.add_argument('--future-days', type=int, default=60, help="Shifts scheduled ahead of --end-date")
+    parser.add_argument('--end-date', default=date.today().isoformat(),
+                        help="Last day of generated history; pin it for runs that must match exactly")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    parser.add_argument('--reset', action='store_true', help="Delete previously generated data and exit")
+    args = parser.parse_args()
+
+    if not SUPABASE_DB_URL:
+        raise RuntimeError("SUPABASE_DB_URL is not set. Please configure it before running this script.")
+    conn = psycopg2.connect(SUPABASE_DB_URL, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    if args.reset:
+        reset(conn)
+        return
+    check_schema(conn)
+
+    end_day = date.fromisoformat(args.end_date)
+    first_day = end_day - timedelta(days=int(args.years * 365))
+    start_ms = int(datetime.combine(first_day, datetime.min.time()).timestamp() * 1000)
+    end_ms = int(datetime.combine(end_day, datetime.max.time()).timestamp() * 1000)
+    step_ms = max(1, (end_ms - start_ms) // max(args.orders, 1))
+    ensure_order_partitions(conn, first_day, end_day)
+
+    base = {'seed': args.seed, 'database_url': SUPABASE_DB_URL}
+    user_jobs = make_jobs('users', args.staff + args.customers, dict(
+        base,
+        staff=args.staff,
+        start=first_day.isoformat(),
+        span_minutes=max(1, (end_day - first_day).days * 24 * 60),
+        # Hashing is deliberately slow, so every synthetic account shares one hash
+        password_hash=generate_password_hash(SYNTHETIC_PASSWORD),
+    ))
+    order_jobs = make_jobs('orders', args.orders, dict(
+        base, customers=max(args.customers, 1), start_ms=start_ms, step_ms=step_ms,
+    ))
+    schedule_jobs = make_jobs('schedules', args.shifts if args.staff else 0, dict(
+        base,
+        staff=args.staff,
+        start=first_day.isoformat(),
+        today=end_day.isoformat(),
+        days=(end_day - first_day).days + args.future_days,
+        total=args.shifts,
+        id_base=start_ms,
+    ))
+
+    print(f"Generating with seed {args.seed}, {args.workers} workers, history {first_day} to {end_day}")
+    with Pool(args.workers) as pool:
+        run_jobs(pool, 'users', user_jobs)
+        run_jobs(pool, 'orders', order_jobs)
+        run_jobs(pool, 'schedules', schedule_jobs)
+
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE users")
+        cur.execute("ANALYZE orders")
+        cur.execute("ANALYZE schedules")
+    conn.close()
+    print(f"Done. Synthetic accounts use the password '{SYNTHETIC_PASSWORD}'.")
+
+
+if __name__ == '__main__':
+    main()
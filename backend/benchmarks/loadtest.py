@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Mixed-traffic load generator for the Flask API.
+
+Drives a running app (normally a disposable local Postgres set up by
+run_loadtest.sh, with Stripe replaced by stripe_stub.py) with weighted
+scenarios: menu browsing, logins, checkout (PaymentIntent + order), admin
+dashboard polls, staff schedule views and shift booking. Reports throughput and
+p50/p95/p99 latency per endpoint, unexpected statuses, and duplicate order or
+appointment ids handed out to different requests.
+
+    python benchmarks/loadtest.py --base-url http://localhost:5000 --users 20 --duration 60
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import requests
+
+ADMIN = ('admin@foodtruck.com', 'admin123')
+STAFF = ('staff1@foodtruck.com', 'staff123')
+TIME_SLOTS = ['9:00 AM', '10:00 AM', '11:00 AM', '12:00 PM', '1:00 PM', '2:00 PM', '3:00 PM', '4:00 PM', '5:00 PM']
+
+# Relative weight of each scenario in the traffic mix
+DEFAULT_MIX = {
+    'browse_menu': 40,
+    'login': 5,
+    'checkout': 20,
+    'dashboard_poll': 10,
+    'staff_schedule': 15,
+    'book_shift': 10,
+}
+
+
+class Recorder:
+    """Thread-safe latency samples, status counts and issued ids per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.failures = defaultdict(Counter)
+        self.issued_ids = defaultdict(Counter)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status, expected):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.statuses[endpoint][status] += 1
+            if status not in expected:
+                self.failures[endpoint][status] += 1
+
+    def issued(self, kind, value):
+        if value:
+            with self.lock:
+                self.issued_ids[kind][value] += 1
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, rng, index):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.rng = rng
+        self.index = index
+        self.customer = None
+        self.sessions = {}
+        self.anonymous = requests.Session()
+        self.menu = []
+
+    def call(self, session, method, path, endpoint, expected=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, self.base_url + path, timeout=30, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response = None
+            status = 'connection_error'
+        self.recorder.record(endpoint, time.perf_counter() - started, status, expected)
+        return response
+
+    def session_for(self, role):
+        """Logged-in session per role, created on first use"""
+        if role not in self.sessions:
+            session = requests.Session()
+            if role == 'customer':
+                self.customer = self.signup(session)
+            else:
+                email, password = ADMIN if role == 'admin' else STAFF
+                self.call(session, 'POST', '/api/auth/login', 'POST /api/auth/login', json={'email': email, 'password': password})
+            self.sessions[role] = session
+        return self.sessions[role]
+
+    def signup(self, session):
+        email = f"loadtest-{uuid.uuid4().hex[:12]}@example.com"
+        password = 'loadtest123'
+        self.call(session, 'POST', '/api/auth/signup', 'POST /api/auth/signup', json={
+            'email': email, 'password': password, 'first_name': 'Load', 'last_name': f"User{self.index}",
+            'mobile': '555-0100', 'address': '1 Test St', 'dob': '1990-01-01', 'sex': 'other',
+        })
+        return email, password
+
+    def browse_menu(self):
+        response = self.call(self.anonymous, 'GET', '/api/menu', 'GET /api/menu')
+        if response is not None and response.ok:
+            self.menu = response.json()
+
+    def login(self):
+        session = requests.Session()
+        email, password = self.customer or ADMIN
+        self.call(session, 'POST', '/api/auth/login', 'POST /api/auth/login', json={'email': email, 'password': password})
+
+    def checkout(self):
+        session = self.session_for('customer')
+        if not self.menu:
+            self.browse_menu()
+        if not self.menu:
+            return
+        cart = [
+            {'id': item['id'], 'name': item['name'], 'price': item['price'], 'quantity': self.rng.randint(1, 3)}
+            for item in self.rng.sample(self.menu, min(len(self.menu), self.rng.randint(1, 4)))
+        ]
+        body = {'items': cart, 'tip': self.rng.choice([0, 1, 2, 5])}
+        response = self.call(
+            session, 'POST', '/api/payments/create-intent', 'POST /api/payments/create-intent',
+            json=body, headers={'Idempotency-Key': uuid.uuid4().hex}
+        )
+        if response is None or not response.ok:
+            return
+        body['payment_intent_id'] = response.json().get('paymentIntentId')
+        response = self.call(
+            session, 'POST', '/api/orders', 'POST /api/orders',
+            json=body, headers={'Idempotency-Key': uuid.uuid4().hex}
+        )
+        if response is not None and response.ok:
+            self.recorder.issued('order_id', response.json().get('order_id'))
+
+    def dashboard_poll(self):
+        self.call(self.session_for('admin'), 'GET', '/api/admin/dashboard', 'GET /api/admin/dashboard')
+
+    def staff_schedule(self):
+        session = self.session_for('staff')
+        self.call(session, 'GET', '/api/schedules', 'GET /api/schedules')
+        self.call(session, 'GET', '/api/time-slots', 'GET /api/time-slots')
+
+    def book_shift(self):
+        day = date.today() + timedelta(days=self.rng.randint(1, 365))
+        response = self.call(
+            self.session_for('admin'), 'POST', '/api/schedules', 'POST /api/schedules',
+            # 400 is the expected answer when the staff member is already booked
+            expected=(200, 400),
+            json={
+                'staff_email': STAFF[0],
+                'date': day.isoformat(),
+                'time_slot': self.rng.choice(TIME_SLOTS),
+                'notes': 'load test',
+            }
+        )
+        if response is not None and response.ok:
+            self.recorder.issued('appointment_id', response.json().get('appointment_id'))
+
+
+def worker(user, mix, deadline, think_time):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.monotonic() < deadline:
+        getattr(user, user.rng.choices(names, weights)[0])()
+        if think_time:
+            time.sleep(user.rng.uniform(0, think_time))
+
+
+def report(recorder, elapsed):
+    summary = {'elapsed_seconds': round(elapsed, 2), 'endpoints': {}, 'duplicate_ids': {}}
+    print()
+    print(f"{'endpoint':<36} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fail':>6}")
+    print("=" * 88)
+    for endpoint in sorted(recorder.latencies):
+        samples = sorted(recorder.latencies[endpoint])
+        failures = sum(recorder.failures[endpoint].values())
+        row = {
+            'count': len(samples),
+            'throughput': round(len(samples) / elapsed, 2),
+            'p50_ms': round(percentile(samples, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(samples, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(samples, 0.99) * 1000, 1),
+            'failures': failures,
+            'statuses': {str(status): count for status, count in recorder.statuses[endpoint].items()},
+        }
+        summary['endpoints'][endpoint] = row
+        print(
+            f"{endpoint:<36} {row['count']:>7} {row['throughput']:>8} {row['p50_ms']:>8} "
+            f"{row['p95_ms']:>8} {row['p99_ms']:>8} {failures:>6}"
+        )
+    for endpoint, statuses in recorder.failures.items():
+        if statuses:
+            print(f"  unexpected statuses for {endpoint}: {dict(statuses)}")
+    for kind, counts in recorder.issued_ids.items():
+        duplicates = {value: count for value, count in counts.items() if count > 1}
+        summary['duplicate_ids'][kind] = len(duplicates)
+        if duplicates:
+            print(f"  {len(duplicates)} duplicate {kind} values issued, e.g. {next(iter(duplicates))}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed-traffic load test for the API")
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--users', type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=60, help="Seconds to run")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Max random pause between actions, seconds")
+    parser.add_argument('--mix', help="JSON object overriding scenario weights, e.g. '{\"checkout\": 50}'")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Write the summary JSON here")
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix.update(json.loads(args.mix))
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+
+    recorder = Recorder()
+    users = [VirtualUser(args.base_url, recorder, random.Random(args.seed + index), index) for index in range(args.users)]
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=worker, args=(user, mix, deadline, args.think_time)) for user in users]
+    print(f"Running {args.users} users against {args.base_url} for {args.duration:.0f}s")
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = report(recorder, time.monotonic() - started)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nWrote {args.output}")
+    failed = any(row['failures'] for row in summary['endpoints'].values()) or any(summary['duplicate_ids'].values())
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
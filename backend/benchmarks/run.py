@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark suite for the backend's pure hot paths.
+
+Each benchmark runs over a range of input sizes. The whole suite is measured
+--rounds times, so a burst of load on the machine only spoils one round, and
+each case reports the best time per call over every repeat of every round (with
+the median alongside). String hashing is pinned with PYTHONHASHSEED so dict and
+set layouts match between runs.
+
+Results are written as JSON and can be compared against a stored baseline; any
+case slower than the baseline by more than --threshold is measured again and,
+if it is still slow, fails the run with exit status 1. Cases faster than
+--noise-floor-us in the baseline are reported but never fail the run, as timer
+and scheduler jitter alone moves them by more than the threshold.
+benchmarks/baseline.json is the committed baseline; regenerate it with
+--save-baseline on the machine that runs the comparison.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.15
+    python benchmarks/run.py --only pricing,dashboard --max-size 10000
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from allergies import ALLERGEN_KEYWORDS, allergy_search_terms, detect_allergy_conflicts
+from menu import MENU_CACHE_FILE, load_menu_from_cache
+from pricing import MenuCatalog, price_cart
+from reporting import aggregate_dashboard, parse_datetime
+from scheduling import TIME_SLOTS, find_schedule_conflicts, overlap, parse_time_string
+
+CART_SIZES = [1, 10, 50, 100, 250, 500]
+SHIFT_SIZES = [10, 100, 1000, 10000, 100000]
+ORDER_SIZES = [1000, 10000, 100000, 1000000]
+# Aim for roughly this much wall time per repeat when calibrating
+TARGET_SECONDS = 0.2
+REPEATS = 5
+ROUNDS = 3
+# Baseline cases faster than this are too close to timer jitter to gate on
+NOISE_FLOOR_US = 10.0
+SEED = 1234
+HASH_SEED = '0'
+
+# The app runs from the backend directory, so its menu cache path is relative to it
+MENU_CACHE_PATH = os.path.join(BACKEND_DIR, MENU_CACHE_FILE)
+
+
+def menu_items():
+    return load_menu_from_cache(MENU_CACHE_PATH)
+
+
+def build_cart(items, size):
+    """Cart of `size` lines cycling through the menu, as the frontend sends it"""
+    return [
+        {
+            'id': item['id'],
+            'name': item['name'],
+            'description': item.get('description', ''),
+            'price': item['price'],
+            'quantity': (index % 3) + 1,
+        }
+        for index, item in ((i, items[i % len(items)]) for i in range(size))
+    ]
+
+
+def build_shifts(size, rng):
+    """Schedule rows for one staff member over size/4 days, in both stored formats"""
+    start = date(2025, 1, 6)
+    rows = []
+    for index in range(size):
+        day = (start + timedelta(days=index // 4)).isoformat()
+        slot = TIME_SLOTS[rng.randrange(len(TIME_SLOTS))]
+        row = {'appointment_id': f"APT{index}", 'date': day, 'time_slot': slot, 'start_time': None, 'end_time': None}
+        if index % 2:
+            row['start_time'] = parse_time_string(day, slot)
+            row['end_time'] = (datetime.fromisoformat(row['start_time']) + timedelta(hours=3)).isoformat()
+        rows.append(row)
+    return rows
+
+
+def build_orders(size, items, rng, today):
+    """Order rows spread over the last 30 days with 1-4 JSON-encoded items each"""
+    statuses = ['pending', 'preparing', 'ready', 'completed', 'cancelled']
+    orders = []
+    for index in range(size):
+        created = datetime.combine(today, datetime.min.time()) - timedelta(minutes=rng.randrange(30 * 24 * 60))
+        lines = [
+            {'name': item['name'], 'price': item['price'], 'quantity': rng.randint(1, 3)}
+            for item in rng.sample(items, rng.randint(1, min(4, len(items))))
+        ]
+        orders.append({
+            'order_id': f"ORD{index}",
+            'items': json.dumps(lines),
+            'total': f"{sum(line['price'] * line['quantity'] for line in lines) * 1.1:.2f}",
+            'status': statuses[index % len(statuses)],
+            'created_at': created.isoformat(),
+        })
+    return orders
+
+
+# Each setup returns a zero-argument callable for one input size
+def setup_pricing(size):
+    items = menu_items()
+    catalog = MenuCatalog(items)
+    cart = build_cart(items, size)
+    return lambda: price_cart(catalog, cart, tip=2)
+
+
+def setup_allergy_conflicts(size):
+    cart = build_cart(menu_items(), size)
+    allergies = ['dairy', 'nuts', 'gluten']
+    return lambda: detect_allergy_conflicts(cart, allergies)
+
+
+def setup_allergy_terms(size):
+    allergies = (list(ALLERGEN_KEYWORDS) + ['peanut', 'shrimp', 'kiwi']) * (size // 11 + 1)
+    allergies = allergies[:size]
+    return lambda: [allergy_search_terms(allergy) for allergy in allergies]
+
+
+def setup_parse_time_string(size):
+    rng = random.Random(SEED)
+    inputs = [
+        ('2025-03-14', rng.choice(TIME_SLOTS + ['14:30', '2025-03-14T09:00:00']))
+        for _ in range(size)
+    ]
+    return lambda: [parse_time_string(day, value) for day, value in inputs]
+
+
+def setup_parse_datetime(size):
+    rng = random.Random(SEED)
+    base = datetime(2025, 1, 1)
+    inputs = [
+        (base + timedelta(seconds=rng.randrange(365 * 86400))).isoformat() if i % 4 else '2025-05-01 12:30:00'
+        for i in range(size)
+    ]
+    return lambda: [parse_datetime(value) for value in inputs]
+
+
+def setup_overlap(size):
+    rng = random.Random(SEED)
+    windows = []
+    for _ in range(size):
+        start = datetime(2025, 1, 1) + timedelta(minutes=30 * rng.randrange(10000))
+        windows.append((start.isoformat(), (start + timedelta(hours=2)).isoformat()))
+    probe_start, probe_end = windows[0]
+    return lambda: [overlap(probe_start, probe_end, start, end) for start, end in windows]
+
+
+def setup_schedule_conflicts(size):
+    rows = build_shifts(size, random.Random(SEED))
+    start = parse_time_string(rows[len(rows) // 2]['date'], '12:00 PM')
+    return lambda: find_schedule_conflicts(rows, start, None)
+
+
+def setup_load_menu(size):
+    return lambda: load_menu_from_cache(MENU_CACHE_PATH)
+
+
+def setup_dashboard(size):
+    rng = random.Random(SEED)
+    today = date(2025, 6, 30)
+    orders = build_orders(size, menu_items(), rng, today)
+    schedules = [{}] * (size // 10)
+    return lambda: aggregate_dashboard(orders, schedules, today)
+
+
+BENCHMARKS = {
+    'pricing': (CART_SIZES, setup_pricing),
+    'allergy_conflicts': (CART_SIZES, setup_allergy_conflicts),
+    'allergy_search_terms': (CART_SIZES, setup_allergy_terms),
+    'parse_time_string': (SHIFT_SIZES, setup_parse_time_string),
+    'parse_datetime': (ORDER_SIZES, setup_parse_datetime),
+    'overlap': (SHIFT_SIZES, setup_overlap),
+    'schedule_conflicts': (SHIFT_SIZES, setup_schedule_conflicts),
+    'load_menu_from_cache': ([1], setup_load_menu),
+    'dashboard': (ORDER_SIZES, setup_dashboard),
+}
+
+
+def calibrate(fn):
+    """Loop count that takes roughly TARGET_SECONDS, and how many repeats to time"""
+    number, elapsed = timeit.Timer(fn).autorange()
+    number = max(1, int(number * TARGET_SECONDS / max(elapsed, 1e-9)))
+    repeats = REPEATS if elapsed / number * REPEATS < 30 else 1
+    return number, repeats
+
+
+def measure(fn, number, repeats):
+    """Seconds per call for each of `repeats` timed loops"""
+    return [total / number for total in timeit.Timer(fn).repeat(repeat=repeats, number=number)]
+
+
+def select_cases(selected, max_size):
+    """(benchmark, size) pairs to run"""
+    return [
+        (name, size)
+        for name, (sizes, _) in BENCHMARKS.items()
+        if not selected or name in selected
+        for size in sizes
+        if not max_size or size <= max_size
+    ]
+
+
+def run(cases, rounds=ROUNDS):
+    prepared = []
+    for name, size in cases:
+        fn = BENCHMARKS[name][1](size)
+        prepared.append((f"{name}[{size}]", name, size, fn, calibrate(fn)))
+
+    samples = {key: [] for key, *_ in prepared}
+    for round_number in range(1, rounds + 1):
+        print(f"Round {round_number}/{rounds}")
+        for key, _, size, fn, (number, repeats) in prepared:
+            seconds = measure(fn, number, repeats)
+            samples[key].extend(seconds)
+            print(f"  {key:<32} {min(seconds) * 1e6:14.1f} us/call  ({min(seconds) / size * 1e6:8.3f} us/item)")
+
+    results = {}
+    for key, name, size, _, _ in prepared:
+        results[key] = {
+            'benchmark': name,
+            'size': size,
+            'seconds_per_call': min(samples[key]),
+            'median_seconds_per_call': statistics.median(samples[key]),
+            'samples': len(samples[key]),
+        }
+    return results
+
+
+def compare(results, baseline, threshold, noise_floor_us=NOISE_FLOOR_US):
+    """Return the cases whose best time got slower than the baseline's best * (1 + threshold)"""
+    regressions = []
+    print()
+    print(f"Compared with baseline (threshold {threshold:.0%}, noise floor {noise_floor_us:g} us)")
+    print("=" * 70)
+    for key, result in results.items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous:
+            print(f"  {key:<32} new")
+            continue
+        ratio = result['seconds_per_call'] / previous['seconds_per_call']
+        if previous['seconds_per_call'] * 1e6 < noise_floor_us:
+            marker = 'below noise floor' if ratio > 1 + threshold else ''
+        else:
+            marker = 'REGRESSION' if ratio > 1 + threshold else ''
+        print(f"  {key:<32} {ratio:8.2f}x  {marker}")
+        if marker == 'REGRESSION':
+            regressions.append((key, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend microbenchmarks")
+    parser.add_argument('--only', help="Comma separated benchmark names: " + ', '.join(BENCHMARKS))
+    parser.add_argument('--max-size', type=int, help="Skip input sizes above this")
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before failing, 0.2 = 20%%")
+    parser.add_argument('--noise-floor-us', type=float, default=NOISE_FLOOR_US,
+                        help="Never fail on cases faster than this in the baseline")
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help="Times to measure the whole suite")
+    parser.add_argument('--save-baseline', help="Write results as the new baseline here")
+    args = parser.parse_args()
+
+    selected = set(args.only.split(',')) if args.only else None
+    print(f"Backend microbenchmarks (Python {platform.python_version()})")
+    print("=" * 70)
+    rounds = max(1, args.rounds)
+    results = run(select_cases(selected, args.max_size), rounds)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.noise_floor_us)
+        if regressions:
+            # A regression has to show up twice; a burst of load elsewhere on the machine rarely does
+            print(f"\nRe-measuring {len(regressions)} case(s)")
+            print("=" * 70)
+            cases = [(results[key]['benchmark'], results[key]['size']) for key, _ in regressions]
+            for key, result in run(cases, rounds).items():
+                best = min(results[key]['seconds_per_call'], result['seconds_per_call'])
+                results[key] = dict(result, seconds_per_call=best, samples=results[key]['samples'] + result['samples'])
+            regressions = compare(
+                {key: results[key] for key, _ in regressions}, baseline, args.threshold, args.noise_floor_us
+            )
+
+    document = {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'seed': SEED,
+            'hash_seed': os.environ.get('PYTHONHASHSEED'),
+            'rounds': rounds,
+        },
+        'results': results,
+    }
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, indent=2)
+        print(f"\nWrote {path}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed beyond {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if os.environ.get('PYTHONHASHSEED') != HASH_SEED:
+        # The seed can only take effect at interpreter start-up
+        os.environ['PYTHONHASHSEED'] = HASH_SEED
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    started = time.perf_counter()
+    status = main()
+    print(f"\nFinished in {time.perf_counter() - started:.1f}s")
+    sys.exit(status)
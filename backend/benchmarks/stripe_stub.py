@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Minimal stand-in for the Stripe PaymentIntents API, for load tests.
+
+Start the app with STRIPE_SECRET_KEY=sk_test_stub and
+STRIPE_API_BASE=http://localhost:12111 and it talks to this server instead of
+Stripe. Intents are created already 'succeeded' so checkout completes, repeated
+Idempotency-Keys return the original intent, and an optional latency models the
+real API's round trip. Tests can queue error responses with `fail_next()` and
+read back every request received in `requests`.
+
+    python benchmarks/stripe_stub.py --port 12111 --latency-ms 150
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class StripeStubState:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.intents = {}
+        self.idempotent = {}
+        self.ids = itertools.count(1)
+        # HTTP statuses to answer the next requests with, oldest first
+        self.failures = collections.deque()
+        # (method, path, Idempotency-Key) of every request received
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def fail_next(self, count=1, status=500):
+        with self.lock:
+            self.failures.extend([status] * count)
+
+    def receive(self, method, path, idempotency_key=None):
+        """Log a request; returns the status of a queued failure to answer it with, or None"""
+        with self.lock:
+            self.requests.append((method, path, idempotency_key))
+            return self.failures.popleft() if self.failures else None
+
+    def create_intent(self, params, idempotency_key=None):
+        with self.lock:
+            if idempotency_key and idempotency_key in self.idempotent:
+                return self.idempotent[idempotency_key]
+            intent_id = f"pi_stub_{next(self.ids):012d}"
+            intent = {
+                'id': intent_id,
+                'object': 'payment_intent',
+                'amount': int(params.get('amount', 0)),
+                'currency': params.get('currency', 'usd'),
+                'status': 'succeeded',
+                'client_secret': f"{intent_id}_secret_stub",
+                'created': int(time.time()),
+                'metadata': {},
+            }
+            self.intents[intent_id] = intent
+            if idempotency_key:
+                self.idempotent[idempotency_key] = intent
+            return intent
+
+
+def make_handler(state):
+    class StripeStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def fail(self, status):
+            kind = 'rate_limit_error' if status == 429 else 'api_error'
+            self.send_json(status, {'error': {'type': kind, 'message': f"Injected {status} response"}})
+
+        def not_found(self):
+            self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': f"No such route: {self.path}"}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            form = parse_qs(self.rfile.read(length).decode('utf-8'))
+            params = {key: values[-1] for key, values in form.items()}
+            path = urlparse(self.path).path
+            status = state.receive('POST', path, self.headers.get('Idempotency-Key'))
+            time.sleep(state.latency)
+            if status:
+                return self.fail(status)
+            if path != '/v1/payment_intents':
+                return self.not_found()
+            self.send_json(200, state.create_intent(params, self.headers.get('Idempotency-Key')))
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            status = state.receive('GET', path)
+            time.sleep(state.latency)
+            if status:
+                return self.fail(status)
+            if path == '/v1/payment_intents':
+                with state.lock:
+                    data = list(state.intents.values())[-100:]
+                return self.send_json(200, {'object': 'list', 'url': path, 'has_more': False, 'data': data})
+            if path.startswith('/v1/payment_intents/'):
+                with state.lock:
+                    intent = state.intents.get(path.rsplit('/', 1)[-1])
+                if intent is None:
+                    return self.send_json(404, {'error': {'type': 'invalid_request_error', 'message': 'No such payment_intent'}})
+                return self.send_json(200, intent)
+            self.not_found()
+
+    return StripeStubHandler
+
+
+def start_stub(port=12111, latency=0.0):
+    """
+    Run the stub in a background thread; returns the server (call shutdown() to
+    stop). Port 0 picks a free port, see server.server_address; the stub's state
+    is server.state.
+    """
+    state = StripeStubState(latency)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Stripe PaymentIntents API for load tests")
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Delay added to every response")
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(StripeStubState(args.latency_ms / 1000)))
+    print(f"Stripe stub listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
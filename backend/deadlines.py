@@ -0,0 +1,135 @@
+"""
+Per-request deadlines.
+
+Each request gets a time budget when it starts, per endpoint with a default.
+InstrumentedCursor asks `statement_prefix()` for the SET LOCAL commands to send
+in front of every statement, so Postgres cancels the statement
+(statement_timeout) or gives up on a lock (lock_timeout) once the remaining
+budget is spent rather than holding the worker. Several statements sent in one
+query run as one implicit transaction, so the settings end with the statement
+and never leak to other users of the shared autocommit connection. Outbound
+calls take `remaining()` or `current_deadline()` for their own timeouts.
+
+When the budget runs out and the handler answers with a server error, the
+response becomes a 504 in the usual error shape, and the endpoint is counted in
+`exceeded`. Responses the handler chose to give despite the timeout (a cached
+fallback, a validation error) are left alone.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, jsonify, request
+from psycopg2 import errors as pg_errors
+
+# statement_timeout and lock_timeout cancellations
+TIMEOUT_ERRORS = (pg_errors.QueryCanceled, pg_errors.LockNotAvailable)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def parse_budgets(spec):
+    """'login=3000,create_order=20000' -> {'login': 3.0, 'create_order': 20.0} (seconds)"""
+    budgets = {}
+    for item in (spec or '').split(','):
+        name, _, value = item.partition('=')
+        if name.strip() and value.strip():
+            budgets[name.strip()] = float(value) / 1000
+    return budgets
+
+
+def current_deadline():
+    """Absolute time.monotonic() deadline of the current request, or None"""
+    if not has_request_context():
+        return None
+    return g.get('deadline')
+
+
+def remaining():
+    deadline = current_deadline()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def suspended():
+    """Run bookkeeping that must finish even after the request's budget is spent"""
+    if not has_request_context():
+        yield
+        return
+    deadline = g.pop('deadline', None)
+    try:
+        yield
+    finally:
+        if deadline is not None:
+            g.deadline = deadline
+
+
+def mark_exceeded():
+    if has_request_context():
+        g.deadline_exceeded = True
+
+
+def statement_prefix(lock_timeout_ms):
+    """SET LOCAL commands to run ahead of a statement; raises when the budget is already spent"""
+    left = remaining()
+    if left is None:
+        return ''
+    timeout_ms = int(left * 1000)
+    if timeout_ms <= 0:
+        mark_exceeded()
+        raise DeadlineExceeded('Request deadline exceeded before the query ran')
+    return f"SET LOCAL statement_timeout = {timeout_ms}; SET LOCAL lock_timeout = {min(timeout_ms, lock_timeout_ms)}; "
+
+
+class RequestDeadlines:
+    def __init__(self, default_seconds=10.0, budgets=None, lock_timeout_ms=2000):
+        self.default_seconds = default_seconds
+        self.budgets = budgets or {}
+        self.lock_timeout_ms = lock_timeout_ms
+        self.exceeded = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.register_error_handler(DeadlineExceeded, self._handle_exceeded)
+
+    def budget(self, endpoint):
+        return self.budgets.get(endpoint, self.default_seconds)
+
+    def _before_request(self):
+        g.deadline = time.monotonic() + self.budget(request.endpoint)
+
+    def _handle_exceeded(self, error):
+        mark_exceeded()
+        return self._timeout_response()
+
+    def _timeout_response(self):
+        response = jsonify({'success': False, 'error': 'Request deadline exceeded'})
+        response.status_code = 504
+        return response
+
+    def _after_request(self, response):
+        if not g.get('deadline_exceeded'):
+            return response
+        with self._lock:
+            self.exceeded[request.endpoint or 'unmatched'] += 1
+        if response.status_code < 500 or response.status_code == 504:
+            return response
+        # The handler caught the cancelled query and failed on its own; keep one shape for timeouts
+        return self._timeout_response()
+
+    def snapshot(self):
+        with self._lock:
+            exceeded = dict(self.exceeded)
+        return {
+            'default_ms': self.default_seconds * 1000,
+            'budgets_ms': {endpoint: seconds * 1000 for endpoint, seconds in sorted(self.budgets.items())},
+            'exceeded': exceeded,
+        }
@@ -0,0 +1,56 @@
+"""
+Readiness checks for orchestrator probes.
+
+A check is a callable returning (status, details) with status one of 'ok',
+'degraded' or 'fail'; raising counts as 'fail'. The process is ready while no
+check fails, and degraded dependencies (a stale menu cache, an open Stripe
+circuit) are reported without taking the worker out of rotation, since every
+worker would share them.
+
+Results are cached for `cache_seconds` and only one thread refreshes them at a
+time; concurrent probes get the previous result, so probes add a bounded, tiny
+load however often they arrive.
+"""
+
+import threading
+import time
+
+OK = 'ok'
+DEGRADED = 'degraded'
+FAIL = 'fail'
+
+
+class HealthChecker:
+    def __init__(self, checks, cache_seconds=2.0):
+        self.checks = checks
+        self.cache_seconds = cache_seconds
+        self._result = None
+        self._checked_at = float('-inf')
+        self._refreshing = threading.Lock()
+
+    def run_checks(self):
+        results = {}
+        for name, check in self.checks.items():
+            started = time.perf_counter()
+            try:
+                status, details = check()
+            except Exception as e:
+                status, details = FAIL, {'error': str(e)}
+            results[name] = dict(details, status=status, check_ms=round((time.perf_counter() - started) * 1000, 2))
+        statuses = {result['status'] for result in results.values()}
+        status = FAIL if FAIL in statuses else DEGRADED if DEGRADED in statuses else OK
+        return {'ready': status != FAIL, 'status': status, 'checked_at': time.time(), 'checks': results}
+
+    def readiness(self):
+        now = time.monotonic()
+        if self._result is not None and now - self._checked_at < self.cache_seconds:
+            return self._result
+        if not self._refreshing.acquire(blocking=self._result is None):
+            return self._result
+        try:
+            if time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = self.run_checks()
+                self._checked_at = time.monotonic()
+            return self._result
+        finally:
+            self._refreshing.release()
@@ -0,0 +1,32 @@
+"""
+Menu items from the cached menu API data, with a built-in fallback menu.
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger('servedash.menu')
+
+DATA_DIR = "data"
+MENU_CACHE_FILE = os.path.join(DATA_DIR, "menu_cache.json")
+
+
+def load_menu_from_cache(path=MENU_CACHE_FILE):
+    """Load menu items from cached API data"""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                cache_data = json.load(f)
+                return cache_data.get('items', [])
+        except Exception as e:
+            logger.error("unable to load menu cache: %s", e)
+
+    # Fallback to default menu if cache doesn't exist
+    return [
+        {"id": "1", "name": "Classic Cheeseburger", "description": "Juicy beef patty with cheese, lettuce, tomato, and special sauce", "price": 8.99, "category": "burgers", "image": ""},
+        {"id": "2", "name": "BBQ Pulled Pork Sandwich", "description": "Slow-cooked pork with tangy BBQ sauce and coleslaw", "price": 9.99, "category": "sandwiches", "image": ""},
+        {"id": "3", "name": "Fish Tacos (3pc)", "description": "Fresh fish with cabbage slaw, lime crema, and cilantro", "price": 11.99, "category": "tacos", "image": ""},
+        {"id": "4", "name": "Loaded Nachos", "description": "Crispy tortilla chips with cheese, jalapeños, sour cream, and guacamole", "price": 7.99, "category": "appetizers", "image": ""},
+        {"id": "5", "name": "Chicken Wings (8pc)", "description": "Crispy wings with your choice of Buffalo, BBQ, or Honey Garlic", "price": 10.99, "category": "appetizers", "image": ""},
+    ]
@@ -0,0 +1,267 @@
+"""
+Per-route request and SQL metrics in Prometheus text format.
+
+RequestMetrics hooks into Flask to count requests by endpoint, method and status
+and to record latency histograms. InstrumentedCursor is used as the psycopg2
+cursor factory and tallies queries, rows and database time for the request it
+runs in, so each endpoint also gets queries-per-request and DB time histograms.
+
+Recording costs a dict lookup, a bisect and a few additions under one lock per
+request. Values are per process; with several gunicorn workers each worker
+reports its own numbers.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+
+from flask import g, has_request_context, request
+from psycopg2.extras import RealDictCursor
+
+from deadlines import TIMEOUT_ERRORS, DeadlineExceeded, mark_exceeded, remaining, statement_prefix
+
+LATENCY_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BOUNDS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def render_histogram(name, labels, bounds, counts, total, count):
+    """Prometheus histogram lines; `counts` are per bucket, with overflow last"""
+    lines = []
+    cumulative = 0
+    for bound, bucket in zip(list(bounds) + ['+Inf'], counts):
+        cumulative += bucket
+        lines.append(f"{name}_bucket{format_labels(dict(labels, le=bound))} {cumulative}")
+    lines.append(f"{name}_sum{format_labels(labels)} {total}")
+    lines.append(f"{name}_count{format_labels(labels)} {count}")
+    return lines
+
+
+class InstrumentedCursor(RealDictCursor):
+    """RealDictCursor that charges each statement's time and rows to the current request"""
+
+    # Set to a SlowQueryLog to have statements over its threshold recorded
+    slow_query_log = None
+    # Set to a lock_timeout cap (ms) to bound statements by the request deadline
+    deadline_lock_timeout_ms = None
+
+    def _with_deadline(self, query):
+        if self.deadline_lock_timeout_ms is None:
+            return query
+        prefix = statement_prefix(self.deadline_lock_timeout_ms)
+        if not prefix:
+            return query
+        if isinstance(query, bytes):
+            return prefix.encode() + query
+        if not isinstance(query, str):
+            query = query.as_string(self)
+        return prefix + query
+
+    def _run(self, method, query, args):
+        try:
+            return method(self._with_deadline(query), args)
+        except TIMEOUT_ERRORS as e:
+            if remaining() is None:
+                raise
+            mark_exceeded()
+            raise DeadlineExceeded('Request deadline exceeded while waiting on the database') from e
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return self._run(super().execute, query, vars)
+        finally:
+            seconds = time.perf_counter() - started
+            record_query(seconds, self.rowcount)
+            slow_query_log = self.slow_query_log
+            if slow_query_log is not None and seconds >= slow_query_log.threshold:
+                slow_query_log.record(query, vars, seconds)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return self._run(super().executemany, query, vars_list)
+        finally:
+            seconds = time.perf_counter() - started
+            record_query(seconds, self.rowcount)
+            slow_query_log = self.slow_query_log
+            if slow_query_log is not None and seconds >= slow_query_log.threshold:
+                # Parameters differ per row; the statement alone identifies it
+                slow_query_log.record(query, None, seconds)
+
+
+def record_query(seconds, rowcount):
+    if not has_request_context():
+        return
+    stats = g.get('db_stats')
+    if stats is None:
+        return
+    stats[0] += 1
+    stats[1] += max(rowcount, 0)
+    stats[2] += seconds
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.requests = Counter()
+        self.latency = {}
+        self.db_queries = {}
+        self.db_time = {}
+        self.db_rows = Counter()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        # [queries, rows, seconds], filled in by InstrumentedCursor
+        g.db_stats = [0, 0, 0.0]
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is not None:
+            queries, rows, db_seconds = g.get('db_stats') or (0, 0, 0.0)
+            self.observe(
+                request.endpoint or 'unmatched', request.method, response.status_code,
+                time.perf_counter() - started, queries, rows, db_seconds
+            )
+        return response
+
+    def observe(self, endpoint, method, status, seconds, queries, rows, db_seconds):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram(LATENCY_BOUNDS)
+                self.db_queries[endpoint] = Histogram(QUERY_COUNT_BOUNDS)
+                self.db_time[endpoint] = Histogram(LATENCY_BOUNDS)
+            histogram.observe(seconds)
+            self.db_queries[endpoint].observe(queries)
+            self.db_time[endpoint].observe(db_seconds)
+            self.db_rows[endpoint] += rows
+
+    def render(self):
+        with self._lock:
+            requests = dict(self.requests)
+            histograms = [
+                (name, {endpoint: (h.bounds, list(h.counts), h.sum, h.count) for endpoint, h in source.items()})
+                for name, source in (
+                    ('servedash_http_request_duration_seconds', self.latency),
+                    ('servedash_db_queries_per_request', self.db_queries),
+                    ('servedash_db_duration_seconds_per_request', self.db_time),
+                )
+            ]
+            rows = dict(self.db_rows)
+
+        lines = [
+            '# HELP servedash_process_start_time_seconds Start time of the process since unix epoch.',
+            '# TYPE servedash_process_start_time_seconds gauge',
+            f'servedash_process_start_time_seconds {self.started_at}',
+            '# HELP servedash_http_requests_total Requests handled, by endpoint, method and status.',
+            '# TYPE servedash_http_requests_total counter',
+        ]
+        for (endpoint, method, status), count in sorted(requests.items()):
+            labels = {'endpoint': endpoint, 'method': method, 'status': status}
+            lines.append(f"servedash_http_requests_total{format_labels(labels)} {count}")
+        for name, by_endpoint in histograms:
+            lines.append(f'# TYPE {name} histogram')
+            for endpoint, (bounds, counts, total, count) in sorted(by_endpoint.items()):
+                lines.extend(render_histogram(name, {'endpoint': endpoint}, bounds, counts, total, count))
+        lines.append('# HELP servedash_db_rows_total Rows returned or affected by SQL, by endpoint.')
+        lines.append('# TYPE servedash_db_rows_total counter')
+        for endpoint, count in sorted(rows.items()):
+            lines.append(f"servedash_db_rows_total{format_labels({'endpoint': endpoint})} {count}")
+        return lines
+
+
+def render_stripe(snapshot):
+    """Lines for a StripeGateway.snapshot()"""
+    circuit = snapshot['circuit']
+    lines = [
+        '# HELP servedash_stripe_circuit_open 1 while the Stripe circuit breaker is open or half open.',
+        '# TYPE servedash_stripe_circuit_open gauge',
+        f"servedash_stripe_circuit_open {0 if circuit['state'] == 'closed' else 1}",
+        '# TYPE servedash_stripe_request_duration_seconds histogram',
+    ]
+    errors = []
+    for operation, stats in sorted(snapshot['operations'].items()):
+        bounds = [bucket['le'] for bucket in stats['buckets'] if bucket['le'] != 'inf']
+        counts = [bucket['count'] for bucket in stats['buckets']]
+        lines.extend(render_histogram(
+            'servedash_stripe_request_duration_seconds', {'operation': operation},
+            bounds, counts, stats['sum_seconds'], stats['count']
+        ))
+        errors.append(f"servedash_stripe_errors_total{format_labels({'operation': operation})} {stats['errors']}")
+    lines.append('# TYPE servedash_stripe_errors_total counter')
+    lines.extend(errors)
+    return lines
+
+
+def render_query_cache(stats):
+    """Lines for a QueryCache.stats()"""
+    lines = ['# TYPE servedash_query_cache_lookups_total counter']
+    for result in ('hits', 'misses'):
+        lines.append(f"servedash_query_cache_lookups_total{format_labels({'result': result})} {stats[result]}")
+    lines.append('# TYPE servedash_query_cache_invalidations_total counter')
+    lines.append(f"servedash_query_cache_invalidations_total {stats['invalidations']}")
+    lines.append('# TYPE servedash_query_cache_errors_total counter')
+    lines.append(f"servedash_query_cache_errors_total {stats['errors']}")
+    if stats.get('entries') is not None:
+        lines.append('# TYPE servedash_query_cache_entries gauge')
+        lines.append(f"servedash_query_cache_entries {stats['entries']}")
+    return lines
+
+
+def render_admission(snapshot):
+    """Lines for an AdmissionController.snapshot()"""
+    lines = [
+        '# TYPE servedash_admission_capacity gauge',
+        f"servedash_admission_capacity {snapshot['capacity']}",
+        '# TYPE servedash_admission_in_flight gauge',
+        f"servedash_admission_in_flight {snapshot['in_flight']}",
+        '# HELP servedash_admission_rejected_total Requests shed or rate limited, by endpoint and reason.',
+        '# TYPE servedash_admission_rejected_total counter',
+    ]
+    for item in snapshot['shed']:
+        labels = {'endpoint': item['endpoint'], 'reason': item['reason']}
+        lines.append(f"servedash_admission_rejected_total{format_labels(labels)} {item['count']}")
+    return lines
+
+
+def render_deadlines(snapshot):
+    """Lines for a RequestDeadlines.snapshot()"""
+    lines = [
+        '# HELP servedash_deadline_exceeded_total Requests that ran out of their time budget, by endpoint.',
+        '# TYPE servedash_deadline_exceeded_total counter',
+    ]
+    for endpoint, count in sorted(snapshot['exceeded'].items()):
+        lines.append(f"servedash_deadline_exceeded_total{format_labels({'endpoint': endpoint})} {count}")
+    return lines
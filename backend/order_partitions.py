@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Monthly range partitioning and archival for the orders table.
+
+`orders` is partitioned by RANGE (created_at) with one partition per month named
+orders_yYYYYmMM, plus orders_default for anything outside the known months.
+created_at holds ISO timestamps as TEXT, which sort chronologically, so month
+bounds are plain 'YYYY-MM-01' strings and a created_at predicate prunes to the
+matching partitions.
+
+A partitioned table can only enforce uniqueness on columns that include the
+partition key, so order ids are claimed in the order_ids table by a row trigger
+on orders; a duplicate id fails the insert just as the old primary key did. Ids
+stay claimed when their partition is archived or exported.
+
+Partitions older than the retention window are detached and attached to
+orders_archive (a metadata-only move), or exported to a gzip CSV file and
+dropped. Reads only reach the archive when asked to explicitly.
+
+    python order_partitions.py migrate               # one-off conversion of an existing table
+    python order_partitions.py maintain --months-ahead 3
+    python order_partitions.py archive --retention-months 12 [--export-dir archive/]
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+logger = logging.getLogger('servedash.order_partitions')
+
+ARCHIVE_TABLE = 'orders_archive'
+DEFAULT_PARTITION = 'orders_default'
+LEGACY_TABLE = 'orders_unpartitioned'
+ORDER_ID_TABLE = 'order_ids'
+PARTITION_NAME_PATTERN = re.compile(r'^orders_y(\d{4})m(\d{2})$')
+# Order ids are ORD<epoch ms> taken a moment before created_at is stamped
+ORDER_ID_PATTERN = re.compile(r'^ORD(\d{13})$')
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"orders_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(name):
+    match = PARTITION_NAME_PATTERN.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def order_created_window(order_ids):
+    """
+    created_at bounds (inclusive lower, exclusive upper ISO strings) implied by
+    ORD<ms> order ids, padded by a day either side, or None if any id does not
+    follow that format. Adding the window to a lookup lets the planner prune to
+    the one or two partitions that can hold the rows.
+    """
+    stamps = []
+    for order_id in order_ids:
+        match = ORDER_ID_PATTERN.match(order_id or '')
+        if not match:
+            return None
+        stamps.append(datetime.fromtimestamp(int(match.group(1)) / 1000))
+    if not stamps:
+        return None
+    return (
+        (min(stamps) - timedelta(days=1)).isoformat(),
+        (max(stamps) + timedelta(days=1)).isoformat(),
+    )
+
+
+def table_exists(conn, name):
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL AS present", (name,))
+        return cur.fetchone()['present']
+
+
+def is_partitioned(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('orders')) AS partitioned"
+        )
+        return cur.fetchone()['partitioned']
+
+
+def list_partitions(conn, parent='orders'):
+    """Monthly partition names attached to `parent`, oldest first"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT child.relname AS name
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+            """,
+            (parent,),
+        )
+        names = [row['name'] for row in cur.fetchall()]
+    return sorted(name for name in names if partition_month(name))
+
+
+def create_month_partition(conn, month, parent='orders'):
+    """Create the partition for `month` if it is missing; returns True when created"""
+    name = partition_name(month)
+    if table_exists(conn, name):
+        return False
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)").format(
+                sql.Identifier(name), sql.Identifier(parent)
+            ),
+            (month.isoformat(), add_months(month, 1).isoformat()),
+        )
+    return True
+
+
+def ensure_future_partitions(conn, months_ahead=3, today=None):
+    """Make sure the current month and the next `months_ahead` months have partitions"""
+    current = month_start(today or date.today())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        try:
+            if create_month_partition(conn, month):
+                created.append(partition_name(month))
+        except psycopg2.Error as e:
+            # Usually rows for that month already sit in orders_default; they have to
+            # be moved out by hand before the partition can be created
+            logger.warning("unable to create partition %s: %s", partition_name(month), e)
+    return created
+
+
+def create_order_id_guard(conn, table):
+    """Claim every order id of `table` in order_ids and keep the claims in step with its rows"""
+    with conn.cursor() as cur:
+        cur.execute(
+            sql.SQL("CREATE TABLE IF NOT EXISTS {} (order_id TEXT PRIMARY KEY)").format(
+                sql.Identifier(ORDER_ID_TABLE)
+            )
+        )
+        cur.execute(
+            sql.SQL("""
+            CREATE OR REPLACE FUNCTION orders_claim_order_id() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                    DELETE FROM {ids} WHERE order_id = OLD.order_id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO {ids} (order_id) VALUES (NEW.order_id);
+                END IF;
+                RETURN NULL;
+            END
+            $$
+            """).format(ids=sql.Identifier(ORDER_ID_TABLE))
+        )
+        cur.execute(
+            sql.SQL("INSERT INTO {} (order_id) SELECT order_id FROM {}").format(
+                sql.Identifier(ORDER_ID_TABLE), sql.Identifier(table)
+            )
+        )
+        cur.execute(
+            sql.SQL(
+                "CREATE TRIGGER orders_order_id_unique AFTER INSERT OR DELETE OR UPDATE OF order_id ON {} "
+                "FOR EACH ROW EXECUTE FUNCTION orders_claim_order_id()"
+            ).format(sql.Identifier(table))
+        )
+
+
+def migrate(conn, months_ahead=3):
+    """
+    Convert a plain orders table into the partitioned layout in one transaction.
+    The old table is kept as orders_unpartitioned (its indexes renamed out of the
+    way) so nothing is lost; drop it once the new table has been checked. Aborts
+    without changing anything if order ids are missing or not unique.
+    """
+    if is_partitioned(conn):
+        print("orders is already partitioned")
+        return
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("LOCK TABLE orders IN ACCESS EXCLUSIVE MODE")
+            cur.execute(
+                "SELECT order_id FROM orders GROUP BY order_id HAVING COUNT(*) > 1 OR order_id IS NULL LIMIT 5"
+            )
+            duplicates = [row['order_id'] for row in cur.fetchall()]
+            if duplicates:
+                raise RuntimeError(
+                    f"orders has missing or duplicate order ids ({', '.join(map(str, duplicates))}); "
+                    "fix them before migrating"
+                )
+            cur.execute(
+                "SELECT MIN(created_at) AS oldest FROM orders WHERE created_at ~ '^[0-9]{4}-[0-9]{2}'"
+            )
+            oldest = cur.fetchone()['oldest']
+            cur.execute(
+                "CREATE TABLE orders_partitioned (LIKE orders INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+            )
+            cur.execute(
+                sql.SQL("CREATE TABLE {} PARTITION OF orders_partitioned DEFAULT").format(
+                    sql.Identifier(DEFAULT_PARTITION)
+                )
+            )
+
+        first = month_start(datetime.fromisoformat(oldest[:10]) if oldest else date.today())
+        last = add_months(month_start(date.today()), months_ahead)
+        month = first
+        while month <= last:
+            create_month_partition(conn, month, parent='orders_partitioned')
+            month = add_months(month, 1)
+
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO orders_partitioned SELECT * FROM orders")
+        create_order_id_guard(conn, 'orders_partitioned')
+
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("ALTER TABLE orders RENAME TO {}").format(sql.Identifier(LEGACY_TABLE)))
+            cur.execute("ALTER TABLE orders_partitioned RENAME TO orders")
+            # Index names are schema-wide; free them so the app recreates them on the new table
+            cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (LEGACY_TABLE,))
+            for row in cur.fetchall():
+                cur.execute(
+                    sql.SQL("ALTER INDEX {} RENAME TO {}").format(
+                        sql.Identifier(row['indexname']),
+                        sql.Identifier(f"{row['indexname'][:50]}_unpartitioned"),
+                    )
+                )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = autocommit
+    print(f"orders partitioned by month; previous table kept as {LEGACY_TABLE}")
+
+
+def ensure_archive_table(conn):
+    """Create orders_archive with the current orders columns, adding any it is missing"""
+    with conn.cursor() as cur:
+        if not table_exists(conn, ARCHIVE_TABLE):
+            cur.execute(
+                sql.SQL("CREATE TABLE {} (LIKE orders INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)").format(
+                    sql.Identifier(ARCHIVE_TABLE)
+                )
+            )
+            return
+        # Columns added to orders since the archive was created must exist there too,
+        # or attaching a detached partition fails
+        cur.execute(
+            """
+            SELECT a.attname AS name, format_type(a.atttypid, a.atttypmod) AS type
+            FROM pg_attribute a
+            WHERE a.attrelid = 'orders'::regclass AND a.attnum > 0 AND NOT a.attisdropped
+              AND a.attname NOT IN (
+                  SELECT attname FROM pg_attribute
+                  WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+              )
+            """,
+            (ARCHIVE_TABLE,),
+        )
+        for column in cur.fetchall():
+            cur.execute(
+                sql.SQL("ALTER TABLE {} ADD COLUMN {} {}").format(
+                    sql.Identifier(ARCHIVE_TABLE), sql.Identifier(column['name']), sql.SQL(column['type'])
+                )
+            )
+
+
+def export_partition(conn, name, export_dir):
+    """Write partition `name` to <export_dir>/<name>.csv.gz and make sure it is on disk before returning"""
+    path = os.path.join(export_dir, f"{name}.csv.gz")
+    partial = f"{path}.partial"
+    with open(partial, 'wb') as raw:
+        with gzip.open(raw, 'wt', encoding='utf-8') as handle, conn.cursor() as cur:
+            cur.copy_expert(
+                sql.SQL("COPY {} TO STDOUT WITH (FORMAT csv, HEADER true)").format(sql.Identifier(name)),
+                handle,
+            )
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    directory = os.open(export_dir, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+    return path
+
+
+def archive_partitions(conn, retention_months=12, export_dir=None, today=None):
+    """
+    Move monthly partitions that end before the retention window out of orders.
+    Without export_dir they are attached to orders_archive; with it they are
+    written to <export_dir>/<partition>.csv.gz and dropped. Each partition moves
+    in its own transaction, so a failure leaves it either in orders or fully
+    archived; an export is on disk before its partition is dropped.
+    """
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+    expired = [name for name in list_partitions(conn) if partition_month(name) < cutoff]
+    if not expired:
+        return []
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+    else:
+        ensure_archive_table(conn)
+
+    archived = []
+    autocommit = conn.autocommit
+    conn.autocommit = False
+    try:
+        for name in expired:
+            month = partition_month(name)
+            try:
+                if export_dir:
+                    with conn.cursor() as cur:
+                        # Hold writes off until the partition is gone so the export is complete
+                        cur.execute(sql.SQL("LOCK TABLE {} IN SHARE MODE").format(sql.Identifier(name)))
+                    path = export_partition(conn, name, export_dir)
+                    with conn.cursor() as cur:
+                        cur.execute(sql.SQL("ALTER TABLE orders DETACH PARTITION {}").format(sql.Identifier(name)))
+                        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+                    archived.append(path)
+                else:
+                    with conn.cursor() as cur:
+                        cur.execute(sql.SQL("ALTER TABLE orders DETACH PARTITION {}").format(sql.Identifier(name)))
+                        cur.execute(
+                            sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(
+                                sql.Identifier(ARCHIVE_TABLE), sql.Identifier(name)
+                            ),
+                            (month.isoformat(), add_months(month, 1).isoformat()),
+                        )
+                    archived.append(name)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.autocommit = autocommit
+    return archived
+
+
+def main():
+    load_dotenv(".env.local")
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the orders table")
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subcommands.add_parser('migrate', help="Convert orders to a partitioned table")
+    migrate_parser.add_argument('--months-ahead', type=int, default=3)
+    maintain_parser = subcommands.add_parser('maintain', help="Create partitions for upcoming months")
+    maintain_parser.add_argument('--months-ahead', type=int, default=3)
+    archive_parser = subcommands.add_parser('archive', help="Archive partitions older than the retention window")
+    archive_parser.add_argument('--retention-months', type=int, default=12)
+    archive_parser.add_argument('--export-dir', help="Write expired partitions to gzip CSV here and drop them")
+    args = parser.parse_args()
+
+    database_url = os.getenv("SUPABASE_DB_URL")
+    if not database_url:
+        raise RuntimeError("SUPABASE_DB_URL is not set. Please configure it before running this script.")
+    conn = psycopg2.connect(database_url, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    try:
+        if args.command == 'migrate':
+            migrate(conn, args.months_ahead)
+        elif args.command == 'maintain':
+            if not is_partitioned(conn):
+                raise RuntimeError("orders is not partitioned yet; run the migrate command first")
+            created = ensure_future_partitions(conn, args.months_ahead)
+            print(f"Created partitions: {', '.join(created) or 'none'}")
+        elif args.command == 'archive':
+            archived = archive_partitions(conn, args.retention_months, args.export_dir)
+            print(f"Archived: {', '.join(archived) or 'nothing past the retention window'}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Server-side cart pricing.
+
+Prices always come from the menu catalog, never from the client payload, and all
+arithmetic is done in integer cents so the Stripe amount and the stored order
+agree to the cent.
+"""
+
+import math
+
+MAX_LINE_QUANTITY = 99
+MAX_TIP_CENTS = 100000
+
+
+def dollars_to_cents(amount):
+    """Convert dollar amount to cents (integer)"""
+    try:
+        if isinstance(amount, str):
+            amount = float(amount)
+        # JSON accepts Infinity, NaN and 1e400, none of which is an amount
+        if not math.isfinite(amount):
+            return None
+        return int(round(amount * 100))
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def format_cents(cents):
+    """Render integer cents as a two-decimal dollar string, e.g. 1999 -> '19.99'"""
+    sign = '-' if cents < 0 else ''
+    cents = abs(cents)
+    return f"{sign}{cents // 100}.{cents % 100:02d}"
+
+
+class MenuCatalog:
+    """Menu items indexed by id, built once per menu load"""
+
+    def __init__(self, items):
+        self.items = items
+        self.by_id = {}
+        self.price_cents = {}
+        for item in items:
+            item_id = str(item.get('id', ''))
+            cents = dollars_to_cents(item.get('price'))
+            if not item_id or cents is None or cents < 0:
+                continue
+            self.by_id[item_id] = item
+            self.price_cents[item_id] = cents
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+def price_cart(catalog, lines, tip=0, tax_rate_bps=1000):
+    """
+    Reprice a cart against the catalog in O(lines).
+
+    Returns (quote, errors). `errors` lists per-line problems (unknown item, bad
+    quantity, stale client price); when it is non-empty the quote must not be
+    charged. Tax is tax_rate_bps basis points of the subtotal, rounded half up.
+    """
+    errors = []
+    priced_lines = []
+    subtotal_cents = 0
+
+    if not lines:
+        errors.append({'id': None, 'error': 'Cart is empty'})
+
+    for index, line in enumerate(lines or []):
+        if not isinstance(line, dict):
+            errors.append({'id': None, 'line': index, 'error': 'Invalid cart line'})
+            continue
+        item_id = str(line.get('id', ''))
+        item = catalog.by_id.get(item_id)
+        if item is None:
+            errors.append({'id': item_id, 'line': index, 'error': 'Item is no longer on the menu'})
+            continue
+        try:
+            quantity = int(line.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if not 1 <= quantity <= MAX_LINE_QUANTITY:
+            errors.append({'id': item_id, 'line': index, 'error': 'Invalid quantity'})
+            continue
+        unit_cents = catalog.price_cents[item_id]
+        if line.get('price') is not None and dollars_to_cents(line.get('price')) != unit_cents:
+            errors.append({
+                'id': item_id,
+                'line': index,
+                'error': 'Price has changed',
+                'price': format_cents(unit_cents)
+            })
+            continue
+        line_cents = unit_cents * quantity
+        subtotal_cents += line_cents
+        priced_lines.append({
+            'id': item_id,
+            'name': item.get('name', ''),
+            'description': item.get('description', ''),
+            'category': item.get('category', ''),
+            'price': unit_cents / 100,
+            'quantity': quantity,
+            'line_total': format_cents(line_cents),
+        })
+
+    tip_cents = dollars_to_cents(tip or 0)
+    if tip_cents is None or not 0 <= tip_cents <= MAX_TIP_CENTS:
+        errors.append({'id': None, 'error': 'Invalid tip amount'})
+        tip_cents = 0
+
+    tax_cents = (subtotal_cents * tax_rate_bps + 5000) // 10000
+    total_cents = subtotal_cents + tax_cents + tip_cents
+    quote = {
+        'lines': priced_lines,
+        'subtotal_cents': subtotal_cents,
+        'tax_cents': tax_cents,
+        'tip_cents': tip_cents,
+        'total_cents': total_cents,
+        'subtotal': format_cents(subtotal_cents),
+        'tax': format_cents(tax_cents),
+        'tip': format_cents(tip_cents),
+        'total': format_cents(total_cents),
+    }
+    return quote, errors
@@ -0,0 +1,221 @@
+"""
+On-demand profiling of single requests.
+
+An admin adds `X-Profile: 1` (or `?_profile=1`) to a request and it runs under a
+profiler: by default a sampler thread that snapshots the request thread's stack
+every few milliseconds, or cProfile with `X-Profile: cprofile`. Results are kept
+in a small in-memory store and can be fetched as a top-N table or, for sampled
+profiles, as collapsed stacks ready for flamegraph.pl / speedscope.
+
+Only one request is profiled at a time and at most `max_per_minute` per process;
+requests over the limit run normally and say so in X-Profile-Status.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+
+from flask import g, request, session
+
+TOP_N = 30
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def top(self, limit=TOP_N):
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for label in set(frames):
+                inclusive[label] += count
+        total = max(self.samples, 1)
+        return [
+            {
+                'function': label,
+                'self_samples': own[label],
+                'self_pct': round(own[label] * 100 / total, 1),
+                'total_samples': inclusive[label],
+                'total_pct': round(inclusive[label] * 100 / total, 1),
+            }
+            for label, _ in own.most_common(limit)
+        ]
+
+
+class RequestProfiler:
+    def __init__(self, max_profiles=20, max_per_minute=6, sample_interval=0.005):
+        self.max_profiles = max_profiles
+        self.max_per_minute = max_per_minute
+        self.sample_interval = sample_interval
+        self.profiles = OrderedDict()
+        self._recent = deque()
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _requested_mode(self):
+        flag = (request.headers.get('X-Profile') or request.args.get('_profile') or '').strip().lower()
+        if not flag or flag in ('0', 'false'):
+            return None
+        return 'cprofile' if flag == 'cprofile' else 'sample'
+
+    def _admit(self):
+        """Rate limit and single-flight check; returns True when this request may be profiled"""
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_per_minute:
+                return False
+            if not self._busy.acquire(blocking=False):
+                return False
+            self._recent.append(now)
+            return True
+
+    def _before_request(self):
+        mode = self._requested_mode()
+        if mode is None:
+            return
+        if session.get('role') != 'admin':
+            g.profile_status = 'forbidden'
+            return
+        if not self._admit():
+            g.profile_status = 'rate-limited'
+            return
+        if mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        g.profile = {'mode': mode, 'profiler': profiler, 'started': time.perf_counter()}
+
+    def _after_request(self, response):
+        status = g.get('profile_status')
+        active = g.pop('profile', None)
+        if active is None:
+            if status:
+                response.headers['X-Profile-Status'] = status
+            return response
+        try:
+            duration = time.perf_counter() - active['started']
+            profiler = active['profiler']
+            profile = {
+                'id': uuid.uuid4().hex[:12],
+                'mode': active['mode'],
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'created_at': time.time(),
+            }
+            if active['mode'] == 'cprofile':
+                profiler.disable()
+                profile.update(cprofile_summary(profiler))
+            else:
+                profiler.stop()
+                profile['samples'] = profiler.samples
+                profile['sample_interval_ms'] = self.sample_interval * 1000
+                profile['top'] = profiler.top()
+                profile['collapsed'] = dict(profiler.stacks)
+            self._store(profile)
+            response.headers['X-Profile-Id'] = profile['id']
+            response.headers['X-Profile-Status'] = 'captured'
+        finally:
+            self._busy.release()
+        return response
+
+    def _teardown_request(self, error=None):
+        # after_request did not run (e.g. the response could not be built); never keep the slot
+        active = g.pop('profile', None)
+        if active is None:
+            return
+        if active['mode'] == 'cprofile':
+            active['profiler'].disable()
+        else:
+            active['profiler'].stop()
+        self._busy.release()
+
+    def _store(self, profile):
+        with self._lock:
+            self.profiles[profile['id']] = profile
+            while len(self.profiles) > self.max_profiles:
+                self.profiles.popitem(last=False)
+
+    def list(self):
+        with self._lock:
+            profiles = list(self.profiles.values())
+        return [
+            {key: value for key, value in profile.items() if key not in ('top', 'collapsed', 'stats_text')}
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id):
+        with self._lock:
+            return self.profiles.get(profile_id)
+
+
+def cprofile_summary(profiler, limit=TOP_N):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (calls, primitive, own, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{name} ({os.path.basename(filename)}:{line})",
+            'calls': calls,
+            'primitive_calls': primitive,
+            'self_ms': round(own * 1000, 3),
+            'cumulative_ms': round(cumulative * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(limit)
+    return {'top': rows[:limit], 'stats_text': text.getvalue()}
+
+
+def collapsed_stacks(profile):
+    """Brendan Gregg's folded format: one 'frame;frame;frame count' line per stack"""
+    return '\n'.join(f"{stack} {count}" for stack, count in sorted(profile.get('collapsed', {}).items())) + '\n'
@@ -0,0 +1,181 @@
+"""
+Read-through cache for list endpoint results.
+
+Entries are keyed by endpoint plus caller (role/user) and tagged with the tables
+they were built from. Each tag carries a version number; the versions are folded
+into the cache key, so bumping a tag after a write makes every dependent entry
+unreachable without having to find and delete them.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+
+try:
+    import redis
+except ImportError:  # optional dependency, only needed for the redis backend
+    redis = None
+
+logger = logging.getLogger('servedash.query_cache')
+
+
+class MemoryCacheBackend:
+    """In-process LRU with per-entry TTL. Tag versions are local to the process, so it is only correct with one worker."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            return [self._tags.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] = self._tags.get(tag, 0) + 1
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """
+    Shared backend for multi-worker deployments. `client` can be any object that
+    speaks the redis-py API subset used here (get/set/mget/incr), so a local
+    stand-in such as fakeredis can be passed in place of a server connection.
+    """
+
+    def __init__(self, client, prefix='servedash:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if redis is None:
+            raise RuntimeError("The redis package is required for the redis cache backend")
+        return cls(redis.Redis.from_url(url, socket_timeout=0.25, socket_connect_timeout=0.25), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, json.dumps(value, default=str), ex=max(int(ttl), 1))
+
+    def tag_versions(self, tags):
+        values = self.client.mget([f"{self.prefix}tag:{tag}" for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        for tag in tags:
+            self.client.incr(f"{self.prefix}tag:{tag}")
+
+    def size(self):
+        return None
+
+
+class QueryCache:
+    """Tag-versioned read-through cache with hit/miss accounting"""
+
+    def __init__(self, backend, default_ttl=30, enabled=True):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, name, endpoint=None):
+        with self._lock:
+            self._stats[name] += 1
+            if endpoint:
+                self._stats[f"{endpoint}:{name}"] += 1
+
+    def get_or_compute(self, endpoint, parts, tags, compute, ttl=None):
+        """Return the cached value for (endpoint, parts) or compute and store it"""
+        if not self.enabled:
+            return compute()
+        try:
+            versions = self.backend.tag_versions(tags)
+            key = ':'.join(
+                [endpoint]
+                + [str(part) for part in parts]
+                + [f"{tag}={version}" for tag, version in zip(tags, versions)]
+            )
+            cached = self.backend.get(key)
+        except Exception as e:
+            # A cache outage must never take the endpoint down with it
+            logger.warning("query cache read failed: %s", e)
+            self._count('errors', endpoint)
+            return compute()
+        if cached is not None:
+            self._count('hits', endpoint)
+            return cached
+        self._count('misses', endpoint)
+        value = compute()
+        try:
+            self.backend.set(key, value, ttl or self.default_ttl)
+        except Exception as e:
+            logger.warning("query cache write failed: %s", e)
+            self._count('errors', endpoint)
+        return value
+
+    def invalidate(self, *tags):
+        """Bump tag versions after a write so dependent entries are never served again"""
+        if not self.enabled or not tags:
+            return
+        try:
+            self.backend.bump(tags)
+            self._count('invalidations')
+        except Exception as e:
+            logger.warning("query cache invalidation failed: %s", e)
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        hits = stats.get('hits', 0)
+        misses = stats.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'enabled': self.enabled,
+            'backend': type(self.backend).__name__,
+            'entries': self.backend.size(),
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+            'invalidations': stats.get('invalidations', 0),
+            'errors': stats.get('errors', 0),
+            'endpoints': {
+                name.split(':', 1)[0]: {
+                    'hits': stats.get(f"{name.split(':', 1)[0]}:hits", 0),
+                    'misses': stats.get(f"{name.split(':', 1)[0]}:misses", 0),
+                }
+                for name in stats if ':' in name
+            }
+        }
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Reconcile orders stuck in payment_status = 'pending' against Stripe.
+
+Orders only leave 'pending' when the payment_intent.succeeded webhook arrives; if
+it never does, nothing revisits them. This job pages through pending orders that
+carry a payment_intent_id, looks their intents up with PaymentIntent.list over the
+batch's creation window (one request per 100 intents instead of one per order),
+and applies each batch with a single set-based UPDATE.
+
+Progress is checkpointed in job_checkpoints after every batch, so an interrupted
+run resumes where it stopped. Batches that change orders bump the API's query
+cache 'orders' tag through the shared redis backend (REDIS_URL), as the app's own
+write helpers do; a memory-backed cache lives inside the app's process and only
+expires by TTL. Run it from cron, e.g. every 15 minutes:
+
+    python reconcile_payments.py --batch-size 200 --requests-per-second 10
+
+Set STRIPE_API_BASE=http://localhost:12111 to run against stripe-mock.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import psycopg2
+import stripe
+from psycopg2.extras import RealDictCursor, execute_values
+from dotenv import load_dotenv
+
+from query_cache import QueryCache, RedisCacheBackend
+from stripe_client import StripeGateway, StripeUnavailable
+
+load_dotenv(".env.local")
+load_dotenv()
+
+SUPABASE_DB_URL = os.getenv("SUPABASE_DB_URL")
+STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
+STRIPE_API_BASE = os.getenv("STRIPE_API_BASE")
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "redis" if os.getenv("REDIS_URL") else "off").lower()
+REDIS_URL = os.getenv("REDIS_URL")
+
+JOB_NAME = 'payment_reconciliation'
+STRIPE_LIST_PAGE_SIZE = 100  # Stripe's maximum page size
+# Intents are created before the order is saved, so the list window reaches back
+# this far from the oldest order in the batch (and a little past the newest).
+INTENT_LOOKBACK = timedelta(hours=6)
+INTENT_LOOKAHEAD = timedelta(minutes=30)
+# Stripe intent status -> orders.payment_status; anything else stays pending
+PAYMENT_STATUS_MAP = {
+    'succeeded': 'paid',
+    'canceled': 'failed',
+}
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, with bursts up to `burst`"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+def ensure_checkpoint_table(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_checkpoints (
+                job_name TEXT PRIMARY KEY,
+                checkpoint TEXT,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+
+
+def load_checkpoint(conn):
+    """Return the (created_at, order_id) keyset position of the last finished batch"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT checkpoint FROM job_checkpoints WHERE job_name = %s", (JOB_NAME,))
+        row = cur.fetchone()
+    if not row or not row['checkpoint']:
+        return None
+    checkpoint = json.loads(row['checkpoint'])
+    return checkpoint['created_at'], checkpoint['order_id']
+
+
+def save_checkpoint(conn, position):
+    value = json.dumps({'created_at': position[0], 'order_id': position[1]}) if position else None
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO job_checkpoints (job_name, checkpoint, updated_at)
+            VALUES (%s, %s, now())
+            ON CONFLICT (job_name) DO UPDATE SET checkpoint = EXCLUDED.checkpoint, updated_at = now()
+            """,
+            (JOB_NAME, value),
+        )
+
+
+def read_pending_batch(conn, after, cutoff, batch_size):
+    """Next page of pending orders by (created_at, order_id), oldest first"""
+    after_created, after_id = after or ('', '')
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT order_id, created_at, payment_intent_id
+            FROM orders
+            WHERE payment_status = 'pending'
+              AND payment_intent_id IS NOT NULL
+              AND created_at < %s
+              AND (created_at, order_id) > (%s, %s)
+            ORDER BY created_at, order_id
+            LIMIT %s
+            """,
+            (cutoff, after_created, after_id, batch_size),
+        )
+        return [dict(row) for row in cur.fetchall()]
+
+
+def fetch_intents(gateway, limiter, intent_ids, window_start, window_end, known):
+    """
+    Page through PaymentIntent.list for the window until every id in `intent_ids`
+    has been seen. Results accumulate in `known` (id -> (status, currency)) so
+    overlapping windows of later batches are served without another request.
+    """
+    missing = {intent_id for intent_id in intent_ids if intent_id not in known}
+    starting_after = None
+    requests_made = 0
+    while missing:
+        params = {
+            'limit': STRIPE_LIST_PAGE_SIZE,
+            'created': {'gte': int(window_start.timestamp()), 'lte': int(window_end.timestamp())},
+        }
+        if starting_after:
+            params['starting_after'] = starting_after
+        limiter.acquire()
+        page = gateway.call('payment_intent.list', stripe.PaymentIntent.list, **params)
+        requests_made += 1
+        for intent in page.data:
+            known[intent.id] = (intent.status, intent.currency)
+            missing.discard(intent.id)
+        if not page.has_more or not page.data:
+            break
+        starting_after = page.data[-1].id
+    return requests_made
+
+
+def apply_batch(conn, resolved, cache=None):
+    """
+    One UPDATE for the whole batch. Only rows still pending are touched, so a
+    webhook that lands mid-run wins, and each change is written to change_log
+    in the same statement so ?since= delta sync picks it up. When orders changed,
+    the 'orders' tag of `cache` is bumped so cached order lists and the dashboard
+    stop serving the old payment status.
+    """
+    if not resolved:
+        return []
+    with conn.cursor() as cur:
+        rows = execute_values(
+            cur,
+            """
+            WITH resolved (payment_intent_id, payment_status, currency) AS (VALUES %s),
+            changed AS (
+                UPDATE orders o
+                SET payment_status = r.payment_status,
+                    currency = COALESCE(r.currency, o.currency),
+                    version = o.version + 1
+                FROM resolved r
+                WHERE o.payment_intent_id = r.payment_intent_id
+                  AND o.payment_status = 'pending'
+                RETURNING o.order_id
+            ),
+            logged AS (
+                INSERT INTO change_log (table_name, row_key, operation)
+                SELECT 'orders', order_id, 'update' FROM changed
+            )
+            SELECT order_id FROM changed
+            """,
+            resolved,
+            fetch=True,
+        )
+    if rows and cache is not None:
+        cache.invalidate('orders')
+    return [row['order_id'] for row in rows]
+
+
+def reconcile(conn, gateway, limiter, batch_size, grace_minutes, max_batches=None, cache=None):
+    """Run until the pending backlog is exhausted (or max_batches); returns a summary"""
+    cutoff = (datetime.now() - timedelta(minutes=grace_minutes)).isoformat()
+    position = load_checkpoint(conn)
+    known = {}
+    summary = {'batches': 0, 'orders_checked': 0, 'orders_updated': 0, 'unresolved': 0, 'stripe_requests': 0}
+
+    while max_batches is None or summary['batches'] < max_batches:
+        batch = read_pending_batch(conn, position, cutoff, batch_size)
+        if not batch:
+            # Reached the end; the next run starts over to revisit orders still pending
+            save_checkpoint(conn, None)
+            break
+
+        created = [datetime.fromisoformat(row['created_at']) for row in batch]
+        intent_ids = [row['payment_intent_id'] for row in batch]
+        summary['stripe_requests'] += fetch_intents(
+            gateway, limiter, intent_ids,
+            min(created) - INTENT_LOOKBACK, max(created) + INTENT_LOOKAHEAD, known
+        )
+
+        resolved = []
+        for intent_id in set(intent_ids):
+            status, currency = known.get(intent_id, (None, None))
+            if status in PAYMENT_STATUS_MAP:
+                resolved.append((intent_id, PAYMENT_STATUS_MAP[status], currency))
+        updated = apply_batch(conn, resolved, cache)
+
+        position = (batch[-1]['created_at'], batch[-1]['order_id'])
+        save_checkpoint(conn, position)
+        summary['batches'] += 1
+        summary['orders_checked'] += len(batch)
+        summary['orders_updated'] += len(updated)
+        summary['unresolved'] += sum(1 for intent_id in intent_ids if intent_id not in known)
+
+    return summary
+
+
+def build_query_cache():
+    """The API's query cache when it is shared through redis; None when the job cannot reach it"""
+    if QUERY_CACHE_BACKEND != 'redis' or not REDIS_URL:
+        return None
+    try:
+        return QueryCache(RedisCacheBackend.from_url(REDIS_URL))
+    except RuntimeError as e:
+        print(f"Not invalidating the query cache, cached orders expire by TTL: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile pending order payments against Stripe")
+    parser.add_argument('--batch-size', type=int, default=200, help="Orders per batch")
+    parser.add_argument('--requests-per-second', type=float, default=10, help="Stripe API request budget")
+    parser.add_argument('--grace-minutes', type=int, default=15, help="Skip orders younger than this; their webhook may still arrive")
+    parser.add_argument('--max-batches', type=int, default=None, help="Stop after this many batches (resume on the next run)")
+    parser.add_argument('--reset', action='store_true', help="Discard the checkpoint and start from the oldest pending order")
+    args = parser.parse_args()
+
+    if not SUPABASE_DB_URL:
+        raise RuntimeError("SUPABASE_DB_URL is not set. Please configure it before running this script.")
+    if not STRIPE_SECRET_KEY:
+        raise RuntimeError("STRIPE_SECRET_KEY is not set. Please configure it before running this script.")
+    stripe.api_key = STRIPE_SECRET_KEY
+    if STRIPE_API_BASE:
+        stripe.api_base = STRIPE_API_BASE
+
+    conn = psycopg2.connect(SUPABASE_DB_URL, cursor_factory=RealDictCursor)
+    conn.autocommit = True
+    ensure_checkpoint_table(conn)
+    if args.reset:
+        save_checkpoint(conn, None)
+
+    gateway = StripeGateway()
+    limiter = RateLimiter(args.requests_per_second)
+    try:
+        summary = reconcile(
+            conn, gateway, limiter, args.batch_size, args.grace_minutes, args.max_batches, build_query_cache()
+        )
+    except StripeUnavailable as e:
+        # The checkpoint already covers every finished batch; the next run picks up from there
+        print(f"Stopping early, Stripe is unavailable: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    print(
+        f"Checked {summary['orders_checked']} pending orders in {summary['batches']} batches "
+        f"({summary['stripe_requests']} Stripe requests): "
+        f"{summary['orders_updated']} updated, {summary['unresolved']} not found in Stripe"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+"""
+Admin dashboard aggregation over already loaded order and schedule rows.
+"""
+
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+
+def parse_datetime(value):
+    """Safely parse ISO datetime strings"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return None
+
+
+def parse_order_items(raw):
+    """Decode the JSON items column, tolerating empty or malformed values"""
+    if not raw:
+        return []
+    if isinstance(raw, list):
+        return raw
+    try:
+        items = json.loads(raw)
+    except (TypeError, json.JSONDecodeError):
+        return []
+    return items if isinstance(items, list) else []
+
+
+def aggregate_dashboard(orders, schedules, today):
+    """Build the dashboard payload from already loaded rows"""
+    total_orders = len(orders)
+    total_revenue = sum(float(o.get('total', 0) or 0) for o in orders)
+    pending_orders = len([o for o in orders if o.get('status') == 'pending'])
+    total_appointments = len(schedules)
+    
+    # Revenue trend (last 7 days)
+    start_date = today - timedelta(days=6)
+    revenue_trend = []
+    for i in range(7):
+        current_day = start_date + timedelta(days=i)
+        day_label = current_day.strftime('%b %d')
+        day_orders = 0
+        day_revenue = 0.0
+        for order in orders:
+            created_at = parse_datetime(order.get('created_at'))
+            if created_at and created_at.date() == current_day:
+                day_orders += 1
+                day_revenue += float(order.get('total', 0) or 0)
+        revenue_trend.append({
+            'date': day_label,
+            'orders': day_orders,
+            'revenue': round(day_revenue, 2)
+        })
+    
+    # Top dishes
+    dish_counter = Counter()
+    for order in orders:
+        for item in parse_order_items(order.get('items')):
+            name = item.get('name')
+            if not name:
+                continue
+            qty = int(item.get('quantity', 1))
+            dish_counter[name] += qty
+    top_dishes = [
+        {'name': name, 'orders': count}
+        for name, count in dish_counter.most_common(5)
+    ]
+    
+    recent_orders = sorted(orders, key=lambda x: x.get('created_at', ''), reverse=True)[:5]
+    
+    return {
+        'stats': {
+            'total_orders': total_orders,
+            'total_revenue': round(total_revenue, 2),
+            'pending_orders': pending_orders,
+            'total_appointments': total_appointments,
+            'revenue_trend': revenue_trend
+        },
+        'recent_orders': recent_orders,
+        'top_dishes': top_dishes
+    }
@@ -0,0 +1,159 @@
+"""
+Structured JSON request logging with request IDs.
+
+Every request gets an id, taken from an incoming X-Request-ID header when it
+looks sane or generated otherwise, and echoed back in the response. One JSON
+line is emitted per request with its status, duration and a breakdown of where
+the time went: SQL (from the InstrumentedCursor stats), Stripe calls and
+password hashing. Successful requests are sampled at `sample_rate`; errors and
+requests slower than `slow_ms` are always logged.
+
+Records are handed to a QueueHandler and written by a QueueListener thread, so
+a slow stdout or log shipper never holds up a request. When the queue is full
+records are dropped and counted instead of blocking.
+"""
+
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request, session
+
+LOGGER_NAME = 'servedash'
+REQUEST_ID_HEADER = 'X-Request-ID'
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+_RESERVED = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        # Anything passed through `extra=` becomes a top-level field
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records logged while handling a request with that request's id"""
+
+    def filter(self, record):
+        if not hasattr(record, 'request_id') and has_request_context():
+            record.request_id = g.get('request_id')
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking or raising when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level='INFO', queue_size=10000, stream=None):
+    """
+    Route the `servedash` logger through a bounded queue to a JSON stream handler.
+    Returns the started QueueListener.
+    """
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(RequestIdFilter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    listener = QueueListener(handler.queue, output, respect_handler_level=False)
+    listener.start()
+    return listener
+
+
+def add_timing(name, seconds):
+    """Charge `seconds` of `name` work to the current request, if there is one"""
+    if not has_request_context():
+        return
+    timings = g.get('timings')
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def timed(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - started)
+
+
+class RequestLogger:
+    def __init__(self, sample_rate=0.1, slow_ms=1000):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_ms / 1000
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        incoming = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        g.log_started = time.perf_counter()
+        g.timings = {}
+
+    def _after_request(self, response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers[REQUEST_ID_HEADER] = request_id
+        started = g.get('log_started')
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        status = response.status_code
+        if status < 400 and seconds < self.slow_seconds and random.random() >= self.sample_rate:
+            return response
+
+        queries, rows, db_seconds = g.get('db_stats') or (0, 0, 0.0)
+        timings = g.get('timings') or {}
+        fields = {
+            'request_id': request_id,
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': status,
+            'duration_ms': round(seconds * 1000, 2),
+            'db_ms': round(db_seconds * 1000, 2),
+            'db_queries': queries,
+            'db_rows': rows,
+            'stripe_ms': round(timings.get('stripe', 0.0) * 1000, 2),
+            'hashing_ms': round(timings.get('hashing', 0.0) * 1000, 2),
+            'user': session.get('user_id'),
+            'sampled': status < 400 and seconds < self.slow_seconds,
+        }
+        level = logging.ERROR if status >= 500 else logging.WARNING if status >= 400 else logging.INFO
+        logger.log(level, 'request', extra=fields)
+        return response
@@ -0,0 +1,375 @@
+"""
+Shift scheduling helpers: time parsing, overlap and conflict sweeps, free-text
+availability and the auto-assign solver.
+
+Everything here works on plain rows and datetimes; loading and saving shifts
+stays in app.py.
+"""
+
+import heapq
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+TIME_SLOTS = ['9:00 AM', '10:00 AM', '11:00 AM', '12:00 PM', '1:00 PM', '2:00 PM', '3:00 PM', '4:00 PM', '5:00 PM']
+
+DEFAULT_SHIFT_TYPES = [
+    'Prep Shift',
+    'Lunch Service',
+    'Dinner Service',
+    'Event / Catering',
+    'Inventory & Restock',
+]
+
+WEEKDAY_NAMES = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+AVAILABILITY_DAY_GROUPS = {
+    'weekdays': range(0, 5),
+    'weekday': range(0, 5),
+    'weekends': range(5, 7),
+    'weekend': range(5, 7),
+    'daily': range(0, 7),
+    'everyday': range(0, 7),
+    'any': range(0, 7),
+    'anytime': range(0, 7),
+}
+AVAILABILITY_TIME_PATTERN = re.compile(r'(\d{1,2})(?::(\d{2}))?\s*([ap])?m?')
+
+# Shifts in these states do not occupy the staff member
+SCHEDULE_INACTIVE_STATUSES = ['cancelled', 'denied']
+
+
+def parse_time_string(date_str, time_value):
+    """Convert various time inputs into ISO string."""
+    if not date_str:
+        return None
+    if not time_value:
+        return None
+    try:
+        # If already ISO-like
+        if 'T' in time_value:
+            return time_value
+        time_value = time_value.strip()
+        if ' ' in time_value:
+            time_part, meridiem = time_value.split()
+            hour_str, minute_str = time_part.split(':')
+            hours = int(hour_str)
+            minutes = int(minute_str)
+            meridiem = meridiem.upper()
+            if meridiem == 'PM' and hours != 12:
+                hours += 12
+            if meridiem == 'AM' and hours == 12:
+                hours = 0
+        else:
+            hour_str, minute_str = time_value.split(':')
+            hours = int(hour_str)
+            minutes = int(minute_str)
+        return f"{date_str}T{str(hours).zfill(2)}:{str(minutes).zfill(2)}:00"
+    except Exception:
+        return None
+
+
+def overlap(a_start, a_end, b_start, b_end):
+    if not a_start or not a_end or not b_start or not b_end:
+        return False
+    try:
+        a_start_dt = datetime.fromisoformat(a_start)
+        a_end_dt = datetime.fromisoformat(a_end)
+        b_start_dt = datetime.fromisoformat(b_start)
+        b_end_dt = datetime.fromisoformat(b_end)
+        return max(a_start_dt, b_start_dt) < min(a_end_dt, b_end_dt)
+    except Exception:
+        return False
+
+
+def shift_window(row):
+    """Resolve a schedule row to ISO (start, end), defaulting to a two hour shift"""
+    start = row.get('start_time') or parse_time_string(row.get('date'), row.get('time_slot'))
+    end = row.get('end_time')
+    if not end and start:
+        try:
+            end = (datetime.fromisoformat(start) + timedelta(hours=2)).isoformat()
+        except Exception:
+            end = None
+    return start, end
+
+
+def shift_interval(row):
+    """Like shift_window but as datetimes; None when the row has no usable times"""
+    start, end = shift_window(row)
+    try:
+        start_dt = datetime.fromisoformat(start)
+        end_dt = datetime.fromisoformat(end)
+    except (TypeError, ValueError):
+        return None
+    if end_dt <= start_dt:
+        return None
+    return start_dt, end_dt
+
+
+def sweep_interval_conflicts(existing, candidates):
+    """
+    Find overlaps between candidate and existing intervals in one sweep.
+
+    Both arguments are lists of (start, end, key) tuples for a single staff member.
+    Returns {candidate_key: [existing_key, ...]}.
+    """
+    events = sorted(
+        [(start, 1, end, key) for start, end, key in existing] +
+        [(start, 0, end, key) for start, end, key in candidates],
+        key=lambda event: (event[0], event[1])
+    )
+    active_existing = []
+    active_candidates = []
+    conflicts = {}
+    for start, is_existing, end, key in events:
+        while active_existing and active_existing[0][0] <= start:
+            heapq.heappop(active_existing)
+        while active_candidates and active_candidates[0][0] <= start:
+            heapq.heappop(active_candidates)
+        if is_existing:
+            for _, candidate_key in active_candidates:
+                conflicts.setdefault(candidate_key, []).append(key)
+            heapq.heappush(active_existing, (end, key))
+        else:
+            if active_existing:
+                conflicts[key] = [existing_key for _, existing_key in active_existing]
+            heapq.heappush(active_candidates, (end, key))
+    return conflicts
+
+
+def parse_weekday(value):
+    """Accept 0-6 (Monday first) or a weekday name/abbreviation"""
+    if isinstance(value, int):
+        return value if 0 <= value <= 6 else None
+    text = str(value or '').strip().lower()
+    if text.isdigit():
+        return parse_weekday(int(text))
+    for index, name in enumerate(WEEKDAY_NAMES):
+        if text and (text == name or text == name[:3]):
+            return index
+    return None
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD string into a date, or None"""
+    try:
+        return datetime.strptime((value or '').strip(), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def sweep_slot_occupancy(intervals, slots):
+    """
+    Report which keys are busy during each slot with a single sweep.
+
+    `intervals` is a list of (start, end, key) and `slots` a chronologically sorted
+    list of (start, end). Returns one set of keys per slot.
+    """
+    intervals = sorted(intervals, key=lambda interval: interval[0])
+    active = []
+    position = 0
+    occupancy = []
+    for slot_start, slot_end in slots:
+        while position < len(intervals) and intervals[position][0] < slot_end:
+            start, end, key = intervals[position]
+            heapq.heappush(active, (end, position, key))
+            position += 1
+        while active and active[0][0] <= slot_start:
+            heapq.heappop(active)
+        occupancy.append({key for _, _, key in active})
+    return occupancy
+
+
+def find_schedule_conflicts(rows, start_time, end_time, appointment_id=None):
+    """In-memory half of check_schedule_conflicts: rows overlapping the requested window"""
+    requested_start = start_time
+    requested_end = end_time
+    if not requested_end and requested_start:
+        try:
+            requested_end = (datetime.fromisoformat(requested_start) + timedelta(hours=2)).isoformat()
+        except Exception:
+            requested_end = None
+    conflicts = []
+    for row in rows:
+        if appointment_id and row['appointment_id'] == appointment_id:
+            continue
+        if row.get('status') in SCHEDULE_INACTIVE_STATUSES:
+            continue
+        existing_start, existing_end = shift_window(row)
+        if overlap(requested_start, requested_end, existing_start, existing_end):
+            conflicts.append({
+                'appointment_id': row['appointment_id'],
+                'date': row.get('date'),
+                'time_slot': row.get('time_slot'),
+                'start_time': existing_start,
+                'end_time': existing_end
+            })
+    return conflicts
+
+
+def parse_clock_minutes(token):
+    """Parse '8a', '5pm', '8:30am' or '17:00' into minutes after midnight"""
+    match = AVAILABILITY_TIME_PATTERN.fullmatch(token.strip().lower())
+    if not match:
+        return None
+    hours = int(match.group(1))
+    minutes = int(match.group(2) or 0)
+    meridiem = match.group(3)
+    if meridiem == 'p' and hours != 12:
+        hours += 12
+    if meridiem == 'a' and hours == 12:
+        hours = 0
+    if hours > 24 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+def parse_availability(raw):
+    """
+    Turn free-text availability such as "Weekdays 8a-5p; Sat 10am-2pm" into
+    {weekday: [(start_minute, end_minute), ...]}. Returns None when the text is
+    empty or cannot be understood, meaning the staff member is unrestricted.
+    """
+    text = (raw or '').strip().lower()
+    if not text:
+        return None
+    windows = {}
+    for segment in re.split(r'[;,\n]+', text):
+        segment = segment.strip()
+        if not segment:
+            continue
+        days = set()
+        for word in re.findall(r'[a-z]+(?:\s*-\s*[a-z]+)?', segment):
+            if word in AVAILABILITY_DAY_GROUPS:
+                days.update(AVAILABILITY_DAY_GROUPS[word])
+            elif '-' in word:
+                first, last = (parse_weekday(part.strip()) for part in word.split('-', 1))
+                if first is not None and last is not None:
+                    day = first
+                    while True:
+                        days.add(day)
+                        if day == last:
+                            break
+                        day = (day + 1) % 7
+            elif parse_weekday(word) is not None:
+                days.add(parse_weekday(word))
+        time_range = re.search(r'(\d{1,2}(?::\d{2})?\s*[ap]?\.?m?\.?)\s*(?:-|to)\s*(\d{1,2}(?::\d{2})?\s*[ap]?\.?m?\.?)', segment)
+        if time_range:
+            start = parse_clock_minutes(time_range.group(1).replace('.', ''))
+            end = parse_clock_minutes(time_range.group(2).replace('.', ''))
+            if start is None or end is None or end <= start:
+                continue
+        else:
+            start, end = 0, 24 * 60
+        if not days and not time_range:
+            continue
+        for day in days or range(7):
+            windows.setdefault(day, []).append((start, end))
+    return windows or None
+
+
+def is_available(windows, start_dt, end_dt):
+    """Check a shift against parsed availability windows"""
+    if windows is None:
+        return True
+    if start_dt.date() != end_dt.date():
+        return False
+    start_minute = start_dt.hour * 60 + start_dt.minute
+    end_minute = end_dt.hour * 60 + end_dt.minute
+    return any(
+        window_start <= start_minute and end_minute <= window_end
+        for window_start, window_end in windows.get(start_dt.weekday(), [])
+    )
+
+
+def propose_shift_assignments(staff_users, existing_rows, demands, max_hours_per_week, max_shifts_per_day):
+    """
+    Greedily fill coverage demands, hardest slots first, giving each slot to the
+    eligible staff member with the fewest hours that week. Returns
+    (assignments, unfilled) where assignments are candidate shift dicts.
+    """
+    staff = {}
+    for user in staff_users:
+        email = user['email'].lower()
+        staff[email] = {
+            'email': email,
+            'name': f"{user.get('first_name', '').strip()} {user.get('last_name', '').strip()}".strip() or user['email'],
+            'windows': parse_availability(user.get('availability')),
+            'busy': {},
+            'hours': Counter(),
+            'daily': Counter(),
+        }
+
+    def book(member, start_dt, end_dt):
+        week = start_dt.date() - timedelta(days=start_dt.weekday())
+        member['busy'].setdefault(start_dt.date(), []).append((start_dt, end_dt))
+        member['hours'][week] += (end_dt - start_dt).total_seconds() / 3600
+        member['daily'][start_dt.date()] += 1
+
+    for row in existing_rows:
+        member = staff.get((row.get('staff_email') or '').lower())
+        interval = shift_interval(row)
+        if member and interval:
+            book(member, *interval)
+
+    def eligible(member, start_dt, end_dt):
+        week = start_dt.date() - timedelta(days=start_dt.weekday())
+        hours = (end_dt - start_dt).total_seconds() / 3600
+        if member['hours'][week] + hours > max_hours_per_week:
+            return False
+        if member['daily'][start_dt.date()] >= max_shifts_per_day:
+            return False
+        if not is_available(member['windows'], start_dt, end_dt):
+            return False
+        return not any(
+            busy_start < end_dt and start_dt < busy_end
+            for busy_start, busy_end in member['busy'].get(start_dt.date(), [])
+        )
+
+    # Slots with the fewest available people are filled first so they are not starved
+    ranked = []
+    for demand in demands:
+        start_dt, end_dt = demand['interval']
+        available = sum(1 for member in staff.values() if is_available(member['windows'], start_dt, end_dt))
+        ranked.append((available - demand['headcount'], start_dt, demand))
+    ranked.sort(key=lambda entry: (entry[0], entry[1]))
+
+    assignments = []
+    unfilled = []
+    for _, start_dt, demand in ranked:
+        end_dt = demand['interval'][1]
+        week = start_dt.date() - timedelta(days=start_dt.weekday())
+        filled = 0
+        for _ in range(demand['headcount']):
+            choices = [member for member in staff.values() if eligible(member, start_dt, end_dt)]
+            if not choices:
+                break
+            member = min(choices, key=lambda m: (m['hours'][week], m['daily'][start_dt.date()], m['email']))
+            book(member, start_dt, end_dt)
+            assignments.append({
+                'staff_email': member['email'],
+                'staff_name': member['name'],
+                'date': demand['date'],
+                'time_slot': demand['time_slot'],
+                'start_time': start_dt.isoformat(),
+                'end_time': end_dt.isoformat(),
+                'location': demand['location'],
+                'shift_type': demand['shift_type'],
+                'priority': demand['priority'],
+                'notes': '',
+            })
+            filled += 1
+        if filled < demand['headcount']:
+            unfilled.append({
+                'date': demand['date'],
+                'time_slot': demand['time_slot'],
+                'shift_type': demand['shift_type'],
+                'location': demand['location'],
+                'needed': demand['headcount'],
+                'assigned': filled
+            })
+
+    assignments.sort(key=lambda shift: (shift['start_time'], shift['staff_email']))
+    unfilled.sort(key=lambda slot: (slot['date'], parse_time_string(slot['date'], slot['time_slot']) or ''))
+    return assignments, unfilled
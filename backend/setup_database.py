@@ -23,6 +23,55 @@ conn = psycopg2.connect(SUPABASE_DB_URL, cursor_factory=RealDictCursor)
 conn.autocommit = True
 
 
+def ensure_tables():
+    """Create the base tables on an empty database (e.g. a disposable local Postgres)"""
+    statements = [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            email TEXT PRIMARY KEY,
+            password TEXT NOT NULL,
+            first_name TEXT,
+            last_name TEXT,
+            mobile TEXT,
+            address TEXT,
+            dob TEXT,
+            sex TEXT,
+            registration_date TEXT,
+            role TEXT NOT NULL DEFAULT 'customer'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_id TEXT PRIMARY KEY,
+            email TEXT NOT NULL,
+            items TEXT,
+            subtotal TEXT,
+            tax TEXT,
+            tip TEXT,
+            total TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created_at TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS schedules (
+            appointment_id TEXT PRIMARY KEY,
+            manager_email TEXT,
+            staff_email TEXT NOT NULL,
+            staff_name TEXT,
+            date TEXT,
+            time_slot TEXT,
+            status TEXT,
+            notes TEXT,
+            created_at TEXT
+        )
+        """,
+    ]
+    for statement in statements:
+        with conn.cursor() as cur:
+            cur.execute(statement)
+
+
 def ensure_columns():
     user_columns = {
         'allergies': "ALTER TABLE users ADD COLUMN allergies TEXT DEFAULT ''",
@@ -35,6 +84,7 @@ def ensure_columns():
         'shift_type': "ALTER TABLE schedules ADD COLUMN shift_type TEXT",
         'staff_notes': "ALTER TABLE schedules ADD COLUMN staff_notes TEXT",
         'priority': "ALTER TABLE schedules ADD COLUMN priority TEXT DEFAULT 'normal'",
+        'version': "ALTER TABLE schedules ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
     }
 
     with conn.cursor() as cur:
@@ -132,6 +182,7 @@ def seed_demo_users():
 
 
 def main():
+    ensure_tables()
     ensure_columns()
     seed_demo_users()
     print("Database setup complete.")
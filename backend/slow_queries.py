@@ -0,0 +1,171 @@
+"""
+Slow-query log with sampled EXPLAIN capture.
+
+Statements slower than the threshold are kept in a ring buffer with their
+normalized SQL, the shapes of their bound parameters (types and lengths, never
+values), duration and the Flask endpoint that ran them, and are aggregated per
+normalized statement. A sample of them is re-planned on a separate connection by
+a background thread: SELECTs with EXPLAIN (ANALYZE, BUFFERS), writes with plain
+EXPLAIN unless analyze_writes is set, in which case they run inside a
+transaction that is rolled back.
+"""
+
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import has_request_context, request
+
+MAX_STATEMENTS = 500
+MAX_SQL_LENGTH = 2000
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUES_LIST = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Collapse literals, placeholders and multi-row VALUES lists so similar statements group together"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()[:MAX_SQL_LENGTH]
+
+
+def parameter_shape(value):
+    if value is None:
+        return 'None'
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def parameter_shapes(params):
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {key: parameter_shape(value) for key, value in params.items()}
+    return [parameter_shape(value) for value in params]
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms=200, size=500, explain_sample_rate=0.1, explain_interval=60,
+                 analyze_writes=False, explain_connect=None):
+        self.threshold = threshold_ms / 1000
+        self.entries = deque(maxlen=size)
+        self.statements = OrderedDict()
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_interval = explain_interval
+        self.analyze_writes = analyze_writes
+        self.explain_connect = explain_connect
+        self._explain_conn = None
+        self._explain_queue = queue.Queue(maxsize=16)
+        self._explain_thread = None
+        self._lock = threading.Lock()
+
+    def record(self, sql, params, seconds):
+        """Called by InstrumentedCursor for statements at or above the threshold"""
+        statement = normalize_sql(sql)
+        endpoint = request.endpoint if has_request_context() else None
+        entry = {
+            'at': time.time(),
+            'statement': statement,
+            'params': parameter_shapes(params),
+            'duration_ms': round(seconds * 1000, 2),
+            'endpoint': endpoint or 'background',
+        }
+        explain = False
+        with self._lock:
+            self.entries.append(entry)
+            stats = self.statements.pop(statement, None) or {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': {}, 'plan': None, 'explained_at': 0.0,
+            }
+            stats['count'] += 1
+            stats['total_ms'] += entry['duration_ms']
+            stats['max_ms'] = max(stats['max_ms'], entry['duration_ms'])
+            stats['endpoints'][entry['endpoint']] = stats['endpoints'].get(entry['endpoint'], 0) + 1
+            # Most recently seen statements stay; the stalest drop out first
+            self.statements[statement] = stats
+            while len(self.statements) > MAX_STATEMENTS:
+                self.statements.popitem(last=False)
+            if (self.explain_connect and random.random() < self.explain_sample_rate
+                    and time.time() - stats['explained_at'] >= self.explain_interval):
+                stats['explained_at'] = time.time()
+                explain = True
+        if explain:
+            self._queue_explain(statement, sql, params)
+
+    def _queue_explain(self, statement, sql, params):
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        if not sql.lstrip().lower().startswith(EXPLAINABLE):
+            return
+        try:
+            self._explain_queue.put_nowait((statement, sql, params))
+        except queue.Full:
+            return
+        with self._lock:
+            if self._explain_thread is None:
+                self._explain_thread = threading.Thread(target=self._explain_worker, daemon=True)
+                self._explain_thread.start()
+
+    def _explain_worker(self):
+        while True:
+            statement, sql, params = self._explain_queue.get()
+            try:
+                plan = self._explain(sql, params)
+            except Exception as e:
+                plan = f"EXPLAIN failed: {e}"
+                # Start from a fresh connection next time in case this one is broken
+                if self._explain_conn is not None:
+                    self._explain_conn.close()
+                self._explain_conn = None
+            with self._lock:
+                if statement in self.statements:
+                    self.statements[statement]['plan'] = plan
+
+    def _explain(self, sql, params):
+        if self._explain_conn is None or self._explain_conn.closed:
+            self._explain_conn = self.explain_connect()
+            self._explain_conn.autocommit = True
+        is_read = sql.lstrip().lower().startswith('select')
+        analyze = is_read or self.analyze_writes
+        options = '(ANALYZE, BUFFERS)' if analyze else ''
+        with self._explain_conn.cursor() as cur:
+            if analyze and not is_read:
+                cur.execute("BEGIN")
+            try:
+                cur.execute(f"EXPLAIN {options} {sql}", params)
+                rows = cur.fetchall()
+            finally:
+                if analyze and not is_read:
+                    cur.execute("ROLLBACK")
+        return '\n'.join(next(iter(dict(row).values())) for row in rows)
+
+    def top(self, limit=20, order_by='total_ms'):
+        """Statements grouped by normalized SQL, worst first"""
+        with self._lock:
+            statements = [
+                dict(stats, statement=statement, endpoints=dict(stats['endpoints']))
+                for statement, stats in self.statements.items()
+            ]
+        for stats in statements:
+            stats['total_ms'] = round(stats['total_ms'], 2)
+            stats['mean_ms'] = round(stats['total_ms'] / stats['count'], 2)
+            stats.pop('explained_at', None)
+        statements.sort(key=lambda stats: stats.get(order_by, 0), reverse=True)
+        return statements[:limit]
+
+    def recent(self, limit=50):
+        with self._lock:
+            return list(self.entries)[-limit:][::-1]
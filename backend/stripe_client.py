@@ -0,0 +1,240 @@
+"""
+Resilient access to the Stripe API.
+
+Wraps the global `stripe` module with a pooled keep-alive HTTP client, per-call
+deadlines, bounded retries with jittered backoff for transient failures, and a
+circuit breaker that fails fast while Stripe is unhealthy. Latency per operation
+is recorded in fixed-bucket histograms.
+"""
+
+import random
+import threading
+import time
+import uuid
+
+import requests
+import stripe
+from requests.adapters import HTTPAdapter
+
+# Upper bounds in seconds, Prometheus style; the last bucket catches everything else
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+
+class StripeUnavailable(Exception):
+    """Stripe is unreachable, too slow, or the circuit breaker is open"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineRequestsClient(stripe.http_client.RequestsClient):
+    """
+    RequestsClient whose timeout can be narrowed per call. The stripe library reads
+    `self._timeout` on every request, so it is served from a thread-local override
+    while a deadline-bound call is running.
+    """
+
+    _local = threading.local()
+
+    @property
+    def _timeout(self):
+        override = getattr(self._local, 'timeout', None)
+        return override if override is not None else self._default_timeout
+
+    @_timeout.setter
+    def _timeout(self, value):
+        self._default_timeout = value
+
+    def set_call_timeout(self, timeout):
+        self._local.timeout = timeout
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures, probes again after `reset_seconds`"""
+
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return (allowed, retry_after_seconds)"""
+        with self._lock:
+            if self.state == 'closed':
+                return True, None
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == 'open' and elapsed >= self.reset_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True, None
+            return False, max(1, int(self.reset_seconds - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give back a half-open probe slot taken by allow() when the call ends without an outcome"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        if error:
+            self.errors += 1
+
+
+def is_transient(error):
+    """Errors worth retrying: network failures, rate limits and Stripe-side 5xx"""
+    if isinstance(error, (stripe.error.APIConnectionError, stripe.error.RateLimitError)):
+        return True
+    if isinstance(error, stripe.error.APIError):
+        return (error.http_status or 500) >= 500
+    return False
+
+
+class StripeGateway:
+    def __init__(self, timeout=10.0, max_retries=2, failure_threshold=5, reset_seconds=30, pool_size=20):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.histograms = {}
+        # Callables invoked as observer(operation, seconds, error) after every attempt
+        self.observers = []
+        self._lock = threading.Lock()
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self.http_client = DeadlineRequestsClient(timeout=timeout, session=session)
+        stripe.default_http_client = self.http_client
+        # Retries are handled here so they can respect the caller's deadline
+        stripe.max_network_retries = 0
+
+    def _observe(self, operation, seconds, error=False):
+        with self._lock:
+            histogram = self.histograms.setdefault(operation, LatencyHistogram())
+            histogram.observe(seconds, error)
+        for observer in self.observers:
+            observer(operation, seconds, error)
+
+    def call(self, operation, fn, *args, deadline=None, **kwargs):
+        """
+        Run a Stripe API call. `deadline` is an absolute time.monotonic() value; each
+        attempt's timeout is capped by the time remaining. Raises StripeUnavailable
+        when the circuit is open or transient failures exhaust the retry budget;
+        other Stripe errors (card declined, invalid request) propagate unchanged.
+        """
+        deadline = deadline or time.monotonic() + self.timeout * (self.max_retries + 1)
+        if deadline <= time.monotonic():
+            # Nothing went out, so this says nothing about Stripe's health
+            raise StripeUnavailable('Payment service timed out', self.breaker.reset_seconds)
+
+        allowed, retry_after = self.breaker.allow()
+        if not allowed:
+            raise StripeUnavailable('Payment service is temporarily unavailable', retry_after)
+        # An open breaker only lets a call through as its half-open probe
+        probing = self.breaker.state != 'closed'
+
+        recorded = False
+        attempt = 0
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Only count it against Stripe if an attempt actually went out and failed
+                    if attempt:
+                        self.breaker.record_failure()
+                        recorded = True
+                    raise StripeUnavailable('Payment service timed out', self.breaker.reset_seconds)
+                self.http_client.set_call_timeout(min(self.timeout, remaining))
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except stripe.error.StripeError as e:
+                    self._observe(operation, time.perf_counter() - started, error=True)
+                    if not is_transient(e):
+                        # The request reached Stripe and was answered; the service is healthy
+                        self.breaker.record_success()
+                        recorded = True
+                        raise
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        self.breaker.record_failure()
+                        recorded = True
+                        raise StripeUnavailable(
+                            'Payment service is temporarily unavailable', self.breaker.reset_seconds
+                        ) from e
+                    # Full jitter backoff, never sleeping past the deadline
+                    backoff = random.uniform(0, min(2.0, 0.25 * (2 ** attempt)))
+                    time.sleep(max(0.0, min(backoff, deadline - time.monotonic())))
+                    continue
+                finally:
+                    self.http_client.set_call_timeout(None)
+                self._observe(operation, time.perf_counter() - started)
+                self.breaker.record_success()
+                recorded = True
+                return result
+        finally:
+            # Unexpected exceptions and unspent probes must not leave the breaker half-open forever
+            if probing and not recorded:
+                self.breaker.release_probe()
+
+    def create_payment_intent(self, idempotency_key=None, deadline=None, **params):
+        # A stable key makes the retries above safe for this non-idempotent POST
+        params['idempotency_key'] = idempotency_key or f"servedash-{uuid.uuid4()}"
+        return self.call('payment_intent.create', stripe.PaymentIntent.create, deadline=deadline, **params)
+
+    def retrieve_payment_intent(self, payment_intent_id, deadline=None):
+        return self.call('payment_intent.retrieve', stripe.PaymentIntent.retrieve, payment_intent_id, deadline=deadline)
+
+    def snapshot(self):
+        """Breaker state and per-operation latency histograms"""
+        with self._lock:
+            operations = {
+                operation: {
+                    'buckets': [
+                        {'le': 'inf' if bound == float('inf') else bound, 'count': count}
+                        for bound, count in zip(LATENCY_BUCKETS, histogram.counts)
+                    ],
+                    'count': histogram.count,
+                    'errors': histogram.errors,
+                    'sum_seconds': round(histogram.total, 6),
+                }
+                for operation, histogram in self.histograms.items()
+            }
+        return {'circuit': self.breaker.snapshot(), 'operations': operations}
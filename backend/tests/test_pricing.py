@@ -0,0 +1,126 @@
+"""
+Server-side cart pricing: catalog prices, integer-cent rounding and tax basis points.
+"""
+
+import pytest
+
+from pricing import MAX_LINE_QUANTITY, MenuCatalog, dollars_to_cents, format_cents, price_cart
+
+MENU = [
+    {'id': '1', 'name': 'Classic Cheeseburger', 'price': 8.99, 'category': 'burgers'},
+    {'id': '2', 'name': 'Fries', 'price': '0.29', 'category': 'sides'},
+    {'id': 3, 'name': 'Lemonade', 'price': 0.05, 'category': 'drinks'},
+    {'id': '4', 'name': 'No price', 'price': 'free'},
+    {'id': '', 'name': 'No id', 'price': 1.00},
+]
+
+
+@pytest.fixture
+def catalog():
+    return MenuCatalog(MENU)
+
+
+def test_catalog_skips_items_without_an_id_or_price(catalog):
+    assert len(catalog) == 3
+    assert catalog.price_cents == {'1': 899, '2': 29, '3': 5}
+
+
+@pytest.mark.parametrize('amount, cents', [
+    (8.99, 899),
+    ('0.29', 29),
+    (0.1 + 0.2, 30),
+    ('19.999', 2000),
+    (0, 0),
+    ('abc', None),
+    (None, None),
+    (float('inf'), None),
+    (float('nan'), None),
+    ('Infinity', None),
+    ('1e400', None),
+    (1e308, None),
+    (10 ** 400, None),
+])
+def test_dollars_to_cents(amount, cents):
+    assert dollars_to_cents(amount) == cents
+
+
+@pytest.mark.parametrize('cents, text', [(0, '0.00'), (5, '0.05'), (1999, '19.99'), (-250, '-2.50')])
+def test_format_cents(cents, text):
+    assert format_cents(cents) == text
+
+
+def test_prices_come_from_the_catalog(catalog):
+    quote, errors = price_cart(catalog, [{'id': '1', 'quantity': 3}, {'id': 2, 'quantity': '2'}], tip='2.50')
+
+    assert errors == []
+    assert quote['subtotal_cents'] == 3 * 899 + 2 * 29
+    assert quote['tax_cents'] == 276
+    assert quote['tip_cents'] == 250
+    assert quote['total_cents'] == 2755 + 276 + 250
+    assert quote['total'] == '32.81'
+    assert [line['line_total'] for line in quote['lines']] == ['26.97', '0.58']
+
+
+@pytest.mark.parametrize('quantity, tax_rate_bps, tax_cents', [
+    # 5c at 10% is half a cent, rounded up
+    (1, 1000, 1),
+    # 15c at 10% is 1.5c
+    (3, 1000, 2),
+    # 35c at 8.25% is 2.8875c
+    (7, 825, 3),
+    # 5c at 8.25% is 0.4125c
+    (1, 825, 0),
+    (10, 0, 0),
+])
+def test_tax_is_rounded_half_up_in_basis_points(catalog, quantity, tax_rate_bps, tax_cents):
+    quote, errors = price_cart(catalog, [{'id': '3', 'quantity': quantity}], tax_rate_bps=tax_rate_bps)
+
+    assert errors == []
+    assert quote['tax_cents'] == tax_cents
+    assert quote['total_cents'] == quantity * 5 + tax_cents
+
+
+def test_stale_client_price_is_rejected(catalog):
+    quote, errors = price_cart(catalog, [{'id': '1', 'quantity': 1, 'price': 7.99}, {'id': '2', 'price': '0.29'}])
+
+    assert errors == [{'id': '1', 'line': 0, 'error': 'Price has changed', 'price': '8.99'}]
+    assert quote['subtotal_cents'] == 29
+
+
+@pytest.mark.parametrize('line, error', [
+    ({'id': '99'}, 'Item is no longer on the menu'),
+    ({'id': '4'}, 'Item is no longer on the menu'),
+    ({'id': '1', 'quantity': 0}, 'Invalid quantity'),
+    ({'id': '1', 'quantity': MAX_LINE_QUANTITY + 1}, 'Invalid quantity'),
+    ({'id': '1', 'quantity': 'two'}, 'Invalid quantity'),
+    ('1', 'Invalid cart line'),
+])
+def test_invalid_lines_are_reported(catalog, line, error):
+    quote, errors = price_cart(catalog, [line])
+
+    assert [entry['error'] for entry in errors] == [error]
+    assert quote['lines'] == []
+
+
+def test_empty_cart_is_an_error(catalog):
+    _, errors = price_cart(catalog, [])
+
+    assert errors == [{'id': None, 'error': 'Cart is empty'}]
+
+
+@pytest.mark.parametrize('tip', ['-1', 'lots', 1000.01, float('inf'), 'Infinity', float('nan')])
+def test_invalid_tip_is_reported_and_not_charged(catalog, tip):
+    quote, errors = price_cart(catalog, [{'id': '1'}], tip=tip)
+
+    assert errors == [{'id': None, 'error': 'Invalid tip amount'}]
+    assert quote['tip_cents'] == 0
+
+
+def test_non_finite_client_price_is_rejected(catalog):
+    quote, errors = price_cart(catalog, [{'id': '1', 'price': float('inf')}], tip=float('inf'))
+
+    assert errors == [
+        {'id': '1', 'line': 0, 'error': 'Price has changed', 'price': '8.99'},
+        {'id': None, 'error': 'Invalid tip amount'},
+    ]
+    assert quote['total_cents'] == 0
@@ -0,0 +1,183 @@
+"""
+Payment reconciliation: apply_batch, checkpoints and resumable runs against
+Postgres and the Stripe stub.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from query_cache import MemoryCacheBackend, QueryCache
+from reconcile_payments import (
+    RateLimiter, apply_batch, ensure_checkpoint_table, load_checkpoint, reconcile, save_checkpoint
+)
+from stripe_client import StripeGateway, StripeUnavailable
+
+
+@pytest.fixture
+def conn(postgres_primary):
+    """Autocommit connection with its own schema holding orders, change_log and job_checkpoints"""
+    schema = f"reconcile_{uuid.uuid4().hex[:8]}"
+    connection = psycopg2.connect(postgres_primary, cursor_factory=RealDictCursor, options=f"-c search_path={schema}")
+    connection.autocommit = True
+    with connection.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(
+            """
+            CREATE TABLE orders (
+                order_id TEXT PRIMARY KEY,
+                created_at TEXT,
+                payment_intent_id TEXT,
+                payment_status TEXT,
+                currency TEXT,
+                version INTEGER NOT NULL DEFAULT 1
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE change_log (
+                id BIGSERIAL PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+    ensure_checkpoint_table(connection)
+    yield connection
+    with connection.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {schema} CASCADE")
+    connection.close()
+
+
+def add_orders(conn, *orders):
+    """orders are (order_id, payment_intent_id, payment_status) created an hour apart, oldest first"""
+    start = datetime.now() - timedelta(days=1)
+    with conn.cursor() as cur:
+        for index, (order_id, intent_id, status) in enumerate(orders):
+            cur.execute(
+                "INSERT INTO orders (order_id, created_at, payment_intent_id, payment_status) VALUES (%s, %s, %s, %s)",
+                (order_id, (start + timedelta(hours=index)).isoformat(), intent_id, status),
+            )
+
+
+def order_states(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT order_id, payment_status, currency, version FROM orders ORDER BY order_id")
+        return {row['order_id']: (row['payment_status'], row['currency'], row['version']) for row in cur.fetchall()}
+
+
+def logged_changes(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT table_name, row_key, operation FROM change_log ORDER BY row_key")
+        return [tuple(row.values()) for row in cur.fetchall()]
+
+
+@pytest.fixture
+def cache():
+    return QueryCache(MemoryCacheBackend())
+
+
+def orders_tag(cache):
+    return cache.backend.tag_versions(['orders'])[0]
+
+
+def test_apply_batch_updates_only_pending_orders(conn, cache):
+    add_orders(conn, ('ORD1', 'pi_1', 'pending'), ('ORD2', 'pi_2', 'pending'), ('ORD3', 'pi_3', 'paid'))
+
+    updated = apply_batch(conn, [('pi_1', 'paid', 'usd'), ('pi_2', 'failed', None), ('pi_3', 'failed', 'usd')], cache)
+
+    assert sorted(updated) == ['ORD1', 'ORD2']
+    assert order_states(conn) == {
+        'ORD1': ('paid', 'usd', 2),
+        'ORD2': ('failed', None, 2),
+        'ORD3': ('paid', None, 1),
+    }
+    assert logged_changes(conn) == [('orders', 'ORD1', 'update'), ('orders', 'ORD2', 'update')]
+    assert orders_tag(cache) == 1
+
+
+def test_apply_batch_without_changes_keeps_the_cache(conn, cache):
+    add_orders(conn, ('ORD1', 'pi_1', 'paid'))
+
+    assert apply_batch(conn, [('pi_1', 'failed', 'usd')], cache) == []
+    assert orders_tag(cache) == 0
+
+
+def test_apply_batch_with_nothing_resolved(conn):
+    assert apply_batch(conn, []) == []
+
+
+def test_checkpoint_round_trip(conn):
+    assert load_checkpoint(conn) is None
+
+    save_checkpoint(conn, ('2025-03-10T09:00:00', 'ORD1'))
+    assert load_checkpoint(conn) == ('2025-03-10T09:00:00', 'ORD1')
+
+    save_checkpoint(conn, ('2025-03-11T09:00:00', 'ORD2'))
+    assert load_checkpoint(conn) == ('2025-03-11T09:00:00', 'ORD2')
+
+    save_checkpoint(conn, None)
+    assert load_checkpoint(conn) is None
+
+
+@pytest.fixture
+def gateway(stub):
+    return StripeGateway(timeout=2.0, max_retries=0, failure_threshold=5)
+
+
+def paid_intent(gateway):
+    return gateway.create_payment_intent(amount=1000, currency='usd').id
+
+
+def test_reconcile_resumes_from_the_checkpoint(conn, gateway, stub, cache):
+    first, second, third = (paid_intent(gateway) for _ in range(3))
+    add_orders(
+        conn,
+        ('ORD1', first, 'pending'),
+        ('ORD2', 'pi_unknown', 'pending'),
+        ('ORD3', second, 'pending'),
+        ('ORD4', third, 'pending'),
+    )
+    limiter = RateLimiter(1000)
+
+    summary = reconcile(conn, gateway, limiter, batch_size=2, grace_minutes=0, max_batches=1, cache=cache)
+
+    assert summary['batches'] == 1
+    assert summary['orders_updated'] == 1
+    assert summary['unresolved'] == 1
+    assert load_checkpoint(conn)[1] == 'ORD2'
+    assert order_states(conn)['ORD3'][0] == 'pending'
+    assert orders_tag(cache) == 1
+
+    summary = reconcile(conn, gateway, limiter, batch_size=2, grace_minutes=0, cache=cache)
+
+    assert summary['orders_checked'] == 2
+    assert summary['orders_updated'] == 2
+    # A finished run starts the next one from the oldest order still pending
+    assert load_checkpoint(conn) is None
+    assert {order_id: state[0] for order_id, state in order_states(conn).items()} == {
+        'ORD1': 'paid', 'ORD2': 'pending', 'ORD3': 'paid', 'ORD4': 'paid',
+    }
+    # One bump per batch that changed orders
+    assert orders_tag(cache) == 2
+
+
+def test_stripe_outage_keeps_the_last_checkpoint(conn, gateway, stub):
+    add_orders(conn, *((f"ORD{index}", paid_intent(gateway), 'pending') for index in range(1, 5)))
+    limiter = RateLimiter(1000)
+    reconcile(conn, gateway, limiter, batch_size=2, grace_minutes=0, max_batches=1)
+    checkpoint = load_checkpoint(conn)
+    stub.fail_next(1, status=503)
+
+    # The run resumes at the second batch, whose lookup fails
+    with pytest.raises(StripeUnavailable):
+        reconcile(conn, gateway, limiter, batch_size=2, grace_minutes=0)
+
+    assert load_checkpoint(conn) == checkpoint
+    assert [order_states(conn)[f"ORD{index}"][0] for index in range(1, 5)] == ['paid', 'paid', 'pending', 'pending']
@@ -0,0 +1,120 @@
+"""
+read_connection() and record_write() against a real primary and streaming replica.
+"""
+
+import time
+
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from conftest import free_port
+
+MAX_LAG_SECONDS = 1.0
+REPLAY_TIMEOUT = 30
+
+
+@pytest.fixture
+def primary(postgres_primary):
+    connection = psycopg2.connect(postgres_primary, cursor_factory=RealDictCursor)
+    connection.autocommit = True
+    with connection.cursor() as cur:
+        cur.execute("CREATE TABLE IF NOT EXISTS replica_probe (id SERIAL PRIMARY KEY, at TIMESTAMPTZ DEFAULT now())")
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def replica(postgres_replica):
+    connection = psycopg2.connect(postgres_replica, cursor_factory=RealDictCursor)
+    connection.autocommit = True
+    yield connection
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_wal_replay_resume()")
+    connection.close()
+
+
+@pytest.fixture
+def routing(app_module, postgres_replica, monkeypatch):
+    """Route with a short lag limit, re-checking the replica on every call"""
+    monkeypatch.setattr(app_module, 'SUPABASE_REPLICA_DB_URL', postgres_replica)
+    monkeypatch.setattr(app_module, 'REPLICA_MAX_LAG_SECONDS', MAX_LAG_SECONDS)
+    monkeypatch.setattr(app_module, 'REPLICA_LAG_CHECK_INTERVAL', 0)
+    monkeypatch.setitem(app_module.replica_state, 'last_write', float('-inf'))
+    monkeypatch.setitem(app_module.replica_state, 'checked_at', 0.0)
+    return app_module
+
+
+def write_probe(primary):
+    """Commit a row on the primary; returns the WAL position it ends at"""
+    with primary.cursor() as cur:
+        cur.execute("INSERT INTO replica_probe DEFAULT VALUES")
+        cur.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+        return cur.fetchone()['lsn']
+
+
+def wait_for_replica(replica, lsn, function='pg_last_wal_replay_lsn'):
+    deadline = time.monotonic() + REPLAY_TIMEOUT
+    with replica.cursor() as cur:
+        while True:
+            cur.execute(f"SELECT {function}() >= %s::pg_lsn AS reached", (lsn,))
+            if cur.fetchone()['reached']:
+                return
+            assert time.monotonic() < deadline, f"replica did not reach {lsn}"
+            time.sleep(0.1)
+
+
+def is_standby(connection):
+    with connection.cursor() as cur:
+        cur.execute("SELECT pg_is_in_recovery() AS standby")
+        return cur.fetchone()['standby']
+
+
+def test_caught_up_replica_serves_reads(routing, primary, replica):
+    wait_for_replica(replica, write_probe(primary))
+
+    connection = routing.read_connection()
+
+    assert connection is not routing.conn
+    assert is_standby(connection)
+    assert routing.replica_state['lag'] <= MAX_LAG_SECONDS
+
+
+def test_write_pins_reads_to_primary(routing, primary, replica):
+    wait_for_replica(replica, write_probe(primary))
+    assert routing.read_connection() is not routing.conn
+
+    routing.record_write('orders')
+    assert routing.read_connection() is routing.conn
+
+    # The pin only lasts as long as the replica is allowed to lag
+    routing.replica_state['last_write'] -= MAX_LAG_SECONDS
+    assert routing.read_connection() is not routing.conn
+
+
+def test_lagging_replica_falls_back_to_primary(routing, primary, replica):
+    # Replay a transaction first so the replica has a replay timestamp to lag behind
+    wait_for_replica(replica, write_probe(primary))
+    with replica.cursor() as cur:
+        cur.execute("SELECT pg_wal_replay_pause()")
+    time.sleep(MAX_LAG_SECONDS + 0.5)
+    wait_for_replica(replica, write_probe(primary), function='pg_last_wal_receive_lsn')
+
+    assert routing.read_connection() is routing.conn
+    assert routing.replica_state['lag'] > MAX_LAG_SECONDS
+
+    with replica.cursor() as cur:
+        cur.execute("SELECT pg_wal_replay_resume()")
+    wait_for_replica(replica, write_probe(primary))
+    assert routing.read_connection() is not routing.conn
+
+
+def test_unreachable_replica_falls_back_to_primary(routing, monkeypatch):
+    stale = routing.replica_state['conn']
+    if stale is not None:
+        stale.close()
+    monkeypatch.setattr(routing, 'SUPABASE_REPLICA_DB_URL', f"postgresql://postgres@127.0.0.1:{free_port()}/postgres")
+
+    assert routing.read_connection() is routing.conn
+    assert routing.replica_state['lag'] is None
+    assert routing.replica_state['conn'] is None
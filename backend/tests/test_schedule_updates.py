@@ -0,0 +1,116 @@
+"""
+PUT /api/schedules/<id>: ownership and If-Match version checks.
+"""
+
+import uuid
+
+import psycopg2
+import pytest
+from psycopg2.extras import RealDictCursor
+
+STALE_ETAG = '"999"'
+
+
+@pytest.fixture(scope='module')
+def db(postgres_primary):
+    """Autocommit connection to a primary holding the users and schedules tables"""
+    connection = psycopg2.connect(postgres_primary, cursor_factory=RealDictCursor)
+    connection.autocommit = True
+    with connection.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                email TEXT PRIMARY KEY,
+                password TEXT NOT NULL,
+                first_name TEXT,
+                last_name TEXT,
+                mobile TEXT,
+                address TEXT,
+                dob TEXT,
+                sex TEXT,
+                registration_date TEXT,
+                role TEXT NOT NULL DEFAULT 'customer',
+                allergies TEXT DEFAULT '',
+                availability TEXT DEFAULT ''
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schedules (
+                appointment_id TEXT PRIMARY KEY,
+                manager_email TEXT,
+                staff_email TEXT NOT NULL,
+                staff_name TEXT,
+                date TEXT,
+                time_slot TEXT,
+                status TEXT,
+                notes TEXT,
+                created_at TEXT,
+                start_time TEXT,
+                end_time TEXT,
+                location TEXT,
+                shift_type TEXT,
+                staff_notes TEXT,
+                priority TEXT,
+                version INTEGER NOT NULL DEFAULT 1
+            )
+            """
+        )
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def appointment(db):
+    """An appointment assigned to one staff member, plus a second staff member"""
+    suffix = uuid.uuid4().hex[:8]
+    owner, other = f"owner-{suffix}@example.com", f"other-{suffix}@example.com"
+    appointment_id = f"APT-{suffix}"
+    with db.cursor() as cur:
+        for email in (owner, other):
+            cur.execute("INSERT INTO users (email, password, role) VALUES (%s, 'x', 'staff')", (email,))
+        cur.execute(
+            """
+            INSERT INTO schedules (appointment_id, manager_email, staff_email, staff_name, date, time_slot, status)
+            VALUES (%s, 'admin@example.com', %s, 'Owner', '2025-03-10', '9:00 AM', 'scheduled')
+            """,
+            (appointment_id, owner),
+        )
+    yield {'id': appointment_id, 'owner': owner, 'other': other}
+    with db.cursor() as cur:
+        cur.execute("DELETE FROM schedules WHERE appointment_id = %s", (appointment_id,))
+        cur.execute("DELETE FROM users WHERE email = ANY(%s)", ([owner, other],))
+
+
+def put_status(client, appointment_id, etag):
+    return client.put(f"/api/schedules/{appointment_id}", json={'status': 'confirmed'}, headers={'If-Match': etag})
+
+
+def test_stale_version_on_someone_elses_appointment_is_forbidden(login, appointment):
+    response = put_status(login(appointment['other'], 'staff'), appointment['id'], STALE_ETAG)
+
+    assert response.status_code == 403
+    assert 'schedule' not in response.get_json()
+
+
+def test_stale_version_on_own_appointment_returns_the_current_row(login, appointment):
+    response = put_status(login(appointment['owner'], 'staff'), appointment['id'], STALE_ETAG)
+
+    assert response.status_code == 412
+    assert response.get_json()['schedule']['appointment_id'] == appointment['id']
+    assert response.headers['ETag'] == '"1"'
+
+
+def test_missing_appointment_is_not_found(login, appointment):
+    response = put_status(login(appointment['other'], 'staff'), 'APT-missing', STALE_ETAG)
+
+    assert response.status_code == 404
+
+
+def test_owner_update_bumps_the_version(login, appointment):
+    response = put_status(login(appointment['owner'], 'staff'), appointment['id'], '"1"')
+
+    assert response.status_code == 200
+    assert response.get_json()['schedule']['status'] == 'confirmed'
+    assert response.headers['ETag'] == '"2"'
@@ -0,0 +1,177 @@
+"""
+Free-text availability parsing and the auto-assign solver.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from scheduling import is_available, parse_availability, parse_clock_minutes, propose_shift_assignments
+
+# 2025-03-10 is a Monday
+MONDAY = '2025-03-10'
+SATURDAY = '2025-03-15'
+
+
+@pytest.mark.parametrize('token, minutes', [
+    ('8a', 480),
+    ('5pm', 1020),
+    ('8:30am', 510),
+    ('17:00', 1020),
+    ('12pm', 720),
+    ('12am', 0),
+    ('25:00', None),
+    ('noon', None),
+])
+def test_parse_clock_minutes(token, minutes):
+    assert parse_clock_minutes(token) == minutes
+
+
+@pytest.mark.parametrize('raw, windows', [
+    ('Weekdays 8a-5p', {day: [(480, 1020)] for day in range(5)}),
+    ('Mon-Wed 9a-3p', {0: [(540, 900)], 1: [(540, 900)], 2: [(540, 900)]}),
+    # Ranges wrap around the end of the week
+    ('Fri-Mon 10am-2pm', {4: [(600, 840)], 5: [(600, 840)], 6: [(600, 840)], 0: [(600, 840)]}),
+    ('Weekends', {5: [(0, 1440)], 6: [(0, 1440)]}),
+    ('9:30 a.m. to 1:15 p.m.', {day: [(570, 795)] for day in range(7)}),
+    ('Tue 8a-12p; Tue 2p-6p', {1: [(480, 720), (840, 1080)]}),
+])
+def test_parse_availability(raw, windows):
+    assert parse_availability(raw) == windows
+
+
+def test_parse_availability_merges_segments():
+    windows = parse_availability('Weekdays 8a-5p; Sat 10am-2pm')
+
+    assert sorted(windows) == [0, 1, 2, 3, 4, 5]
+    assert windows[5] == [(600, 840)]
+
+
+@pytest.mark.parametrize('raw', [None, '', '   ', 'whenever', 'Mon 5p-8a'])
+def test_unparseable_availability_means_unrestricted(raw):
+    assert parse_availability(raw) is None
+
+
+def test_is_available():
+    windows = parse_availability('Weekdays 9a-5p')
+
+    assert is_available(windows, datetime(2025, 3, 10, 9), datetime(2025, 3, 10, 17))
+    assert not is_available(windows, datetime(2025, 3, 10, 8), datetime(2025, 3, 10, 12))
+    assert not is_available(windows, datetime(2025, 3, 15, 10), datetime(2025, 3, 15, 12))
+    # Shifts that cross midnight never fit a single day's window
+    assert not is_available(parse_availability('Daily'), datetime(2025, 3, 10, 22), datetime(2025, 3, 11, 2))
+    assert is_available(None, datetime(2025, 3, 10, 22), datetime(2025, 3, 11, 2))
+
+
+def staff(email, availability=''):
+    return {'email': email, 'first_name': email.split('@')[0].title(), 'last_name': '', 'availability': availability}
+
+
+def demand(day, start, end, headcount=1, location='Main Truck'):
+    start_dt = datetime.fromisoformat(f"{day}T{start}")
+    end_dt = datetime.fromisoformat(f"{day}T{end}")
+    return {
+        'interval': (start_dt, end_dt),
+        'headcount': headcount,
+        'date': day,
+        'time_slot': start_dt.strftime('%I:%M %p').lstrip('0'),
+        'location': location,
+        'shift_type': 'Lunch Service',
+        'priority': 'normal',
+    }
+
+
+def propose(staff_users, demands, existing=(), max_hours_per_week=40, max_shifts_per_day=2):
+    return propose_shift_assignments(staff_users, list(existing), demands, max_hours_per_week, max_shifts_per_day)
+
+
+def test_only_available_staff_are_assigned():
+    assignments, unfilled = propose(
+        [staff('ann@example.com', 'Weekdays 9a-5p'), staff('bob@example.com')],
+        [demand(SATURDAY, '10:00', '14:00')],
+    )
+
+    assert [shift['staff_email'] for shift in assignments] == ['bob@example.com']
+    assert unfilled == []
+    assert assignments[0]['start_time'] == f"{SATURDAY}T10:00:00"
+    assert assignments[0]['staff_name'] == 'Bob'
+
+
+def test_hours_are_balanced_across_staff():
+    assignments, _ = propose(
+        [staff('ann@example.com'), staff('bob@example.com')],
+        [demand(MONDAY, '09:00', '13:00'), demand(MONDAY, '14:00', '18:00')],
+    )
+
+    assert sorted(shift['staff_email'] for shift in assignments) == ['ann@example.com', 'bob@example.com']
+
+
+def test_existing_shifts_block_overlapping_assignments():
+    existing = [{'staff_email': 'ANN@example.com', 'date': MONDAY, 'start_time': f"{MONDAY}T10:00:00",
+                 'end_time': f"{MONDAY}T12:00:00"}]
+
+    assignments, _ = propose(
+        [staff('ann@example.com'), staff('bob@example.com')],
+        [demand(MONDAY, '11:00', '13:00')],
+        existing=existing,
+    )
+
+    assert [shift['staff_email'] for shift in assignments] == ['bob@example.com']
+
+
+def test_scarce_slots_are_filled_first():
+    # Filling in time order would give ann the 9:00 slot and leave 10:00 to nobody
+    assignments, unfilled = propose(
+        [staff('ann@example.com'), staff('zed@example.com', 'Mon 9a-11a')],
+        [demand(MONDAY, '09:00', '11:00'), demand(MONDAY, '10:00', '12:00')],
+        max_shifts_per_day=1,
+    )
+
+    assert unfilled == []
+    assert [(shift['start_time'], shift['staff_email']) for shift in assignments] == [
+        (f"{MONDAY}T09:00:00", 'zed@example.com'),
+        (f"{MONDAY}T10:00:00", 'ann@example.com'),
+    ]
+
+
+def test_limits_leave_demand_unfilled():
+    assignments, unfilled = propose(
+        [staff('ann@example.com')],
+        [demand(MONDAY, '08:00', '12:00', headcount=2), demand('2025-03-11', '08:00', '12:00')],
+        max_hours_per_week=6,
+    )
+
+    assert len(assignments) == 1
+    assert unfilled == [
+        {'date': MONDAY, 'time_slot': '8:00 AM', 'shift_type': 'Lunch Service', 'location': 'Main Truck',
+         'needed': 2, 'assigned': 1},
+        {'date': '2025-03-11', 'time_slot': '8:00 AM', 'shift_type': 'Lunch Service', 'location': 'Main Truck',
+         'needed': 1, 'assigned': 0},
+    ]
+
+
+def test_shifts_per_day_limit():
+    assignments, unfilled = propose(
+        [staff('ann@example.com')],
+        [demand(MONDAY, '08:00', '10:00'), demand(MONDAY, '11:00', '13:00')],
+        max_shifts_per_day=1,
+    )
+
+    assert len(assignments) == 1
+    assert len(unfilled) == 1
+
+
+@pytest.mark.parametrize('coverage', [
+    ['x'],
+    [1],
+    {'time_slot': '9:00 AM'},
+    [{'time_slot': 9}],
+    [{'time_slot': '9:00 AM', 'location': ['Main Truck']}],
+])
+def test_auto_assign_rejects_malformed_coverage(login, coverage):
+    client = login('admin@example.com', 'admin')
+
+    response = client.post('/api/schedules/auto-assign', json={'week_start': MONDAY, 'coverage': coverage})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Each coverage entry needs a valid time slot and headcount'
@@ -0,0 +1,164 @@
+"""
+StripeGateway retries, deadlines and circuit breaker against benchmarks/stripe_stub.py.
+"""
+
+import threading
+import time
+
+import pytest
+import stripe
+
+from stripe_client import StripeGateway, StripeUnavailable
+
+RESET_SECONDS = 0.2
+
+
+@pytest.fixture
+def make_gateway(stub):
+    def make(**options):
+        options = dict(dict(timeout=2.0, max_retries=2, failure_threshold=2, reset_seconds=RESET_SECONDS), **options)
+        return StripeGateway(**options)
+    return make
+
+
+def create_intent(gateway, **options):
+    return gateway.create_payment_intent(amount=1000, currency='usd', **options)
+
+
+def open_breaker(gateway, stub):
+    stub.fail_next(gateway.breaker.failure_threshold * (gateway.max_retries + 1))
+    for _ in range(gateway.breaker.failure_threshold):
+        with pytest.raises(StripeUnavailable):
+            create_intent(gateway)
+    assert gateway.breaker.state == 'open'
+
+
+def test_transient_errors_are_retried_with_a_stable_idempotency_key(make_gateway, stub):
+    gateway = make_gateway()
+    stub.fail_next(1, status=500)
+    stub.fail_next(1, status=429)
+
+    intent = create_intent(gateway)
+
+    assert intent.status == 'succeeded'
+    keys = [key for _, _, key in stub.requests]
+    assert len(keys) == 3
+    assert len(set(keys)) == 1 and keys[0].startswith('servedash-')
+    assert len(stub.intents) == 1
+    assert gateway.breaker.state == 'closed'
+    assert gateway.snapshot()['operations']['payment_intent.create']['errors'] == 2
+
+
+def test_caller_idempotency_key_is_forwarded(make_gateway, stub):
+    gateway = make_gateway()
+
+    first = create_intent(gateway, idempotency_key='checkout-1')
+    second = create_intent(gateway, idempotency_key='checkout-1')
+
+    assert first.id == second.id
+    assert [key for _, _, key in stub.requests] == ['checkout-1', 'checkout-1']
+
+
+def test_non_transient_errors_are_not_retried(make_gateway, stub):
+    gateway = make_gateway()
+    stub.fail_next(1, status=400)
+
+    with pytest.raises(stripe.error.InvalidRequestError):
+        create_intent(gateway)
+
+    assert len(stub.requests) == 1
+    assert gateway.breaker.snapshot() == {'state': 'closed', 'consecutive_failures': 0}
+
+
+def test_exhausted_retries_open_the_breaker(make_gateway, stub):
+    gateway = make_gateway(max_retries=1)
+    open_breaker(gateway, stub)
+    sent = len(stub.requests)
+
+    with pytest.raises(StripeUnavailable) as error:
+        create_intent(gateway)
+
+    # Fails fast without reaching Stripe
+    assert len(stub.requests) == sent
+    assert error.value.retry_after >= 1
+
+
+def test_successful_probe_closes_the_breaker(make_gateway, stub):
+    gateway = make_gateway(max_retries=0)
+    open_breaker(gateway, stub)
+    time.sleep(RESET_SECONDS)
+
+    create_intent(gateway)
+
+    assert gateway.breaker.snapshot() == {'state': 'closed', 'consecutive_failures': 0}
+
+
+def test_failed_probe_reopens_the_breaker(make_gateway, stub):
+    gateway = make_gateway(max_retries=0)
+    open_breaker(gateway, stub)
+    time.sleep(RESET_SECONDS)
+    stub.fail_next(1)
+
+    with pytest.raises(StripeUnavailable):
+        create_intent(gateway)
+
+    assert gateway.breaker.state == 'open'
+
+
+def test_only_one_probe_runs_while_half_open(make_gateway, stub):
+    gateway = make_gateway(max_retries=0)
+    open_breaker(gateway, stub)
+    time.sleep(RESET_SECONDS)
+    stub.latency = 0.5
+    probe = threading.Thread(target=create_intent, args=(gateway,))
+    probe.start()
+    time.sleep(0.1)
+
+    with pytest.raises(StripeUnavailable):
+        create_intent(gateway)
+
+    probe.join()
+    assert gateway.breaker.state == 'closed'
+
+
+def test_attempts_are_capped_by_the_deadline(make_gateway, stub):
+    gateway = make_gateway(timeout=5.0)
+    stub.latency = 2.0
+    started = time.monotonic()
+
+    with pytest.raises(StripeUnavailable):
+        create_intent(gateway, deadline=time.monotonic() + 0.3)
+
+    assert time.monotonic() - started < 1.0
+    # The attempt timed out against Stripe, which counts as a failure
+    assert gateway.breaker.failures == 1
+    assert gateway.http_client._timeout == 5.0
+
+
+def test_spent_deadline_does_not_take_the_probe(make_gateway, stub):
+    gateway = make_gateway(max_retries=0)
+    open_breaker(gateway, stub)
+    time.sleep(RESET_SECONDS)
+    sent = len(stub.requests)
+
+    with pytest.raises(StripeUnavailable):
+        create_intent(gateway, deadline=time.monotonic() - 1)
+
+    assert len(stub.requests) == sent
+    create_intent(gateway)
+    assert gateway.breaker.state == 'closed'
+
+
+def test_unexpected_exception_releases_the_probe(make_gateway, stub):
+    gateway = make_gateway(max_retries=0)
+    open_breaker(gateway, stub)
+    time.sleep(RESET_SECONDS)
+
+    def broken():
+        raise ValueError('bad response')
+
+    with pytest.raises(ValueError):
+        gateway.call('payment_intent.create', broken)
+
+    create_intent(gateway)
+    assert gateway.breaker.state == 'closed'
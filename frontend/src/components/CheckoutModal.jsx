@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import { CardElement, useStripe, useElements } from '@stripe/react-stripe-js';
 import { X, Loader } from 'lucide-react';
-import { createPaymentIntent, confirmPayment } from '../services/api';
+import { createPaymentIntent, confirmPayment, newIdempotencyKey } from '../services/api';
 import { useToast } from './Toast';
 
 const CheckoutModal = ({ cartData, onClose, onSuccess }) => {
@@ -11,6 +11,8 @@ const CheckoutModal = ({ cartData, onClose, onSuccess }) => {
   const [clientSecret, setClientSecret] = useState(null);
   const [paymentIntentId, setPaymentIntentId] = useState(null);
   const [error, setError] = useState(null);
+  // The cart is fixed while the modal is open, so retries reuse this key
+  const [idempotencyKey] = useState(newIdempotencyKey);
   const { showToast } = useToast();
 
   const cardElementOptions = {
@@ -39,7 +41,7 @@ const CheckoutModal = ({ cartData, onClose, onSuccess }) => {
         tax: cartData.tax,
         tip: cartData.tip,
         total: cartData.total,
-      });
+      }, idempotencyKey);
 
       if (response.success) {
         setClientSecret(response.clientSecret);
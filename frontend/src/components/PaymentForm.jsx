@@ -5,7 +5,7 @@ import { CreditCard, Lock, CheckCircle, XCircle, Loader2 } from 'lucide-react';
 import { getStripeConfig, createPaymentIntent } from '../services/api';
 import { useToast } from './Toast';
 
-const PaymentFormInner = ({ amount, items, subtotal, tax, tip, onSuccess, onCancel }) => {
+const PaymentFormInner = ({ amount, items, subtotal, tax, tip, idempotencyKey, onSuccess, onCancel }) => {
   const stripe = useStripe();
   const elements = useElements();
   const { showToast } = useToast();
@@ -20,7 +20,7 @@ const PaymentFormInner = ({ amount, items, subtotal, tax, tip, onSuccess, onCanc
           items,
           tip: parseFloat(tip),
           tax: parseFloat(tax),
-        });
+        }, idempotencyKey);
         setClientSecret(intentData.clientSecret);
       } catch (error) {
         showToast(error.response?.data?.error || 'Failed to initialize payment', 'error');
@@ -33,7 +33,7 @@ const PaymentFormInner = ({ amount, items, subtotal, tax, tip, onSuccess, onCanc
     if (stripe && elements) {
       initializePayment();
     }
-  }, [stripe, elements, items, tip, tax]);
+  }, [stripe, elements, items, tip, tax, idempotencyKey]);
 
   const handleSubmit = async (event) => {
     event.preventDefault();
@@ -182,7 +182,7 @@ const PaymentFormInner = ({ amount, items, subtotal, tax, tip, onSuccess, onCanc
   );
 };
 
-const PaymentForm = ({ amount, items, subtotal, tax, tip, onSuccess, onCancel }) => {
+const PaymentForm = ({ amount, items, subtotal, tax, tip, idempotencyKey, onSuccess, onCancel }) => {
   const [stripeKey, setStripeKey] = useState(null);
   const [loading, setLoading] = useState(true);
 
@@ -229,6 +229,7 @@ const PaymentForm = ({ amount, items, subtotal, tax, tip, onSuccess, onCancel })
         subtotal={subtotal}
         tax={tax}
         tip={tip}
+        idempotencyKey={idempotencyKey}
         onSuccess={onSuccess}
         onCancel={onCancel}
       />
@@ -2,7 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Search, Filter, Eye, ShoppingBag, RefreshCcw } from 'lucide-react';
 import Header from '../../components/Admin/Header';
 import Sidebar from '../../components/Admin/Sidebar';
-import { getOrders, updateOrder } from '../../services/api';
+import { getOrders, updateOrder, versionEtag } from '../../services/api';
 import { useToast } from '../../components/Toast';
 import { useNavigate } from 'react-router-dom';
 
@@ -44,10 +44,18 @@ const AdminOrders = () => {
   const handleStatusChange = async (orderId, status) => {
     try {
       setUpdatingId(orderId);
-      await updateOrder(orderId, { status });
+      const order = orders.find((o) => o.order_id === orderId);
+      await updateOrder(orderId, { status }, versionEtag(order));
       showToast('Order updated', 'success');
       loadOrders();
     } catch (error) {
+      const current = error.response?.data?.order;
+      if (error.response?.status === 412 && current) {
+        // Someone else changed it first: show their version instead of overwriting it
+        setOrders((prev) => prev.map((o) => (o.order_id === current.order_id ? current : o)));
+        showToast(error.response.data.error || 'Order was changed by someone else', 'warning');
+        return;
+      }
       showToast(error.response?.data?.error || 'Failed to update order', 'error');
     } finally {
       setUpdatingId('');
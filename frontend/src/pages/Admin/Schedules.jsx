@@ -12,7 +12,7 @@ import {
 } from 'lucide-react';
 import Header from '../../components/Admin/Header';
 import Sidebar from '../../components/Admin/Sidebar';
-import { getSchedules, updateAppointment } from '../../services/api';
+import { getSchedules, updateAppointment, versionEtag } from '../../services/api';
 import { useToast } from '../../components/Toast';
 
 const priorityLabels = {
@@ -39,6 +39,8 @@ const AdminSchedules = () => {
   const [locationFilter, setLocationFilter] = useState('');
   const [updatingId, setUpdatingId] = useState('');
   const [editingId, setEditingId] = useState('');
+  // Version of the row when the edit form was opened, sent back as If-Match
+  const [editingEtag, setEditingEtag] = useState();
   const [editForm, setEditForm] = useState({
     date: '',
     time_slot: '',
@@ -103,14 +105,26 @@ const AdminSchedules = () => {
     return matchesStatus && matchesShift && matchesLocation && matchesSearch;
   });
 
+  // Someone else saved first: show their version of the row instead of overwriting it
+  const handleConflict = (error) => {
+    const current = error.response?.data?.schedule;
+    if (error.response?.status !== 412 || !current) return null;
+    setSchedules((prev) => prev.map((s) => (s.appointment_id === current.appointment_id ? current : s)));
+    showToast(error.response.data.error || 'Schedule was changed by someone else', 'warning');
+    return current;
+  };
+
+  const findSchedule = (appointmentId) => schedules.find((s) => s.appointment_id === appointmentId);
+
   const handleStatusChange = async (appointmentId, status) => {
     if (!status) return;
     try {
       setUpdatingId(appointmentId);
-      await updateAppointment(appointmentId, { status });
+      await updateAppointment(appointmentId, { status }, versionEtag(findSchedule(appointmentId)));
       showToast('Schedule updated', 'success');
       loadSchedules();
     } catch (error) {
+      if (handleConflict(error)) return;
       showToast(error.response?.data?.error || 'Failed to update schedule', 'error');
     } finally {
       setUpdatingId('');
@@ -119,6 +133,7 @@ const AdminSchedules = () => {
 
   const openEdit = (schedule) => {
     setEditingId(schedule.appointment_id);
+    setEditingEtag(versionEtag(schedule));
     setEditForm({
       date: schedule.date || '',
       time_slot: schedule.time_slot || '',
@@ -133,6 +148,7 @@ const AdminSchedules = () => {
 
   const closeEdit = () => {
     setEditingId('');
+    setEditingEtag(undefined);
     setEditForm({
       date: '',
       time_slot: '',
@@ -163,11 +179,17 @@ const AdminSchedules = () => {
         priority: editForm.priority,
         notes: editForm.notes,
       };
-      await updateAppointment(appointmentId, payload);
+      await updateAppointment(appointmentId, payload, editingEtag);
       showToast('Schedule updated', 'success');
       closeEdit();
       loadSchedules();
     } catch (error) {
+      const current = handleConflict(error);
+      if (current) {
+        // Reload the form with the saved values so the edit can be redone on top of them
+        openEdit(current);
+        return;
+      }
       showToast(error.response?.data?.error || 'Failed to update schedule', 'error');
     } finally {
       setUpdatingId('');
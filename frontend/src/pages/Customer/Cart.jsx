@@ -3,7 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import { Trash2, Plus, Minus, ShoppingBag, ArrowLeft, CreditCard, X } from 'lucide-react';
 import Header from '../../components/Customer/Header';
 import Sidebar from '../../components/Customer/Sidebar';
-import { createOrder } from '../../services/api';
+import { createOrder, newIdempotencyKey } from '../../services/api';
 import { useToast } from '../../components/Toast';
 import PaymentForm from '../../components/PaymentForm';
 
@@ -12,6 +12,8 @@ const CustomerCart = () => {
   const [tip, setTip] = useState(0);
   const [loading, setLoading] = useState(false);
   const [showPayment, setShowPayment] = useState(false);
+  // Shared by the payment intent and the order of one checkout attempt
+  const [checkoutKey, setCheckoutKey] = useState(null);
   const navigate = useNavigate();
   const { showToast } = useToast();
 
@@ -26,6 +28,8 @@ const CustomerCart = () => {
 
   const updateCart = (newCart) => {
     setCart(newCart);
+    // A different cart is a different checkout attempt
+    setCheckoutKey(null);
     localStorage.setItem('cart', JSON.stringify(newCart));
   };
 
@@ -55,6 +59,7 @@ const CustomerCart = () => {
       showToast('Your cart is empty', 'warning');
       return;
     }
+    setCheckoutKey(key => key || newIdempotencyKey());
     setShowPayment(true);
   };
 
@@ -68,8 +73,9 @@ const CustomerCart = () => {
         tip: tip.toFixed(2),
         total: total.toFixed(2),
         ...paymentData,
-      });
+      }, checkoutKey);
       localStorage.removeItem('cart');
+      setCheckoutKey(null);
       showToast('Order placed successfully!', 'success');
       setShowPayment(false);
       navigate('/customer/orders');
@@ -170,7 +176,10 @@ const CustomerCart = () => {
                       {[0, 10, 15, 20].map((amount) => (
                         <button
                           key={amount}
-                          onClick={() => setTip(amount)}
+                          onClick={() => {
+                            setTip(amount);
+                            setCheckoutKey(null);
+                          }}
                           className={`px-4 py-2 rounded-lg font-semibold transition-colors ${
                             tip === amount
                               ? 'bg-primary-gradient text-white shadow-md'
@@ -218,6 +227,7 @@ const CustomerCart = () => {
                       subtotal={subtotal.toFixed(2)}
                       tax={tax.toFixed(2)}
                       tip={tip.toFixed(2)}
+                      idempotencyKey={checkoutKey}
                       onSuccess={handlePaymentSuccess}
                       onCancel={handlePaymentCancel}
                     />
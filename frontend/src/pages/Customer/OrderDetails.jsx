@@ -3,7 +3,7 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { ArrowLeft, Calendar, Package, DollarSign } from 'lucide-react';
 import Header from '../../components/Customer/Header';
 import Sidebar from '../../components/Customer/Sidebar';
-import { getOrders } from '../../services/api';
+import { getOrder } from '../../services/api';
 import { useToast } from '../../components/Toast';
 
 const CustomerOrderDetails = () => {
@@ -19,15 +19,14 @@ const CustomerOrderDetails = () => {
 
   const loadOrder = async () => {
     try {
-      const orders = await getOrders();
-      const foundOrder = orders.find(o => o.order_id === orderId);
-      if (foundOrder) {
-        setOrder(foundOrder);
-      } else {
+      const foundOrder = await getOrder(orderId);
+      setOrder(foundOrder);
+    } catch (error) {
+      if (error.response?.status === 404) {
         showToast('Order not found', 'error');
         navigate('/customer/orders');
+        return;
       }
-    } catch (error) {
       console.error('Error loading order:', error);
       showToast('Failed to load order details', 'error');
     } finally {
@@ -2,7 +2,7 @@ import React, { useState, useEffect, useContext, useMemo } from 'react';
 import { Calendar, Clock, CheckCircle, XCircle, ClipboardCheck, AlertCircle, MapPin, Briefcase, Send } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import { AuthContext } from '../../context/AuthContext';
-import { getSchedules, updateAppointment, getTimeSlots, requestShift } from '../../services/api';
+import { getSchedules, updateAppointment, getTimeSlots, requestShift, versionEtag } from '../../services/api';
 import { useToast } from '../../components/Toast';
 import StaffHeader from '../../components/Staff/Header';
 
@@ -168,10 +168,18 @@ const StaffSchedule = () => {
   const handleStatusChange = async (appointmentId, status) => {
     try {
       setUpdatingId(appointmentId);
-      await updateAppointment(appointmentId, { status });
+      const schedule = schedules.find((s) => s.appointment_id === appointmentId);
+      await updateAppointment(appointmentId, { status }, versionEtag(schedule));
       showToast('Schedule updated', 'success');
       loadSchedules();
     } catch (error) {
+      const current = error.response?.data?.schedule;
+      if (error.response?.status === 412 && current) {
+        // A manager changed the shift first: show the saved version instead of overwriting it
+        setSchedules((prev) => prev.map((s) => (s.appointment_id === current.appointment_id ? current : s)));
+        showToast(error.response.data.error || 'Shift was changed by a manager', 'warning');
+        return;
+      }
       showToast(error.response?.data?.error || 'Failed to update schedule', 'error');
     } finally {
       setUpdatingId('');
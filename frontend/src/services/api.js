@@ -48,18 +48,51 @@ export const getMenu = async () => {
 };
 
 // Orders
-export const getOrders = async () => {
-  const response = await api.get('/orders');
+export const getOrders = async ({ includeArchived = false } = {}) => {
+  const params = includeArchived ? { include_archived: true } : undefined;
+  const response = await api.get('/orders', { params });
   return response.data;
 };
 
-export const createOrder = async (orderData) => {
-  const response = await api.post('/orders', orderData);
+export const getOrderChanges = async (since) => {
+  const response = await api.get('/orders', { params: { since } });
   return response.data;
 };
 
-export const updateOrder = async (orderId, updates) => {
-  const response = await api.put(`/orders/${orderId}`, updates);
+export const getOrder = async (orderId) => {
+  const response = await api.get(`/orders/${orderId}`);
+  return response.data;
+};
+
+// One key per checkout attempt, reused on retries so the server and Stripe only act once
+export const newIdempotencyKey = () =>
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+
+export const createOrder = async (orderData, idempotencyKey) => {
+  const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined;
+  const response = await api.post('/orders', orderData, { headers });
+  return response.data;
+};
+
+// If-Match value for a row as loaded from a list or detail endpoint
+export const versionEtag = (row) => (row?.version != null ? `"${row.version}"` : undefined);
+
+export const updateOrder = async (orderId, updates, etag) => {
+  const headers = etag ? { 'If-Match': etag } : undefined;
+  const response = await api.put(`/orders/${orderId}`, updates, { headers });
+  return response.data;
+};
+
+export const bulkUpdateOrders = async (orderIds, status) => {
+  const response = await api.put('/orders/bulk', { order_ids: orderIds, status });
+  return response.data;
+};
+
+// Kitchen
+export const getKitchenQueue = async () => {
+  const response = await api.get('/kitchen/queue');
   return response.data;
 };
 
@@ -69,13 +102,39 @@ export const getSchedules = async () => {
   return response.data;
 };
 
+export const getScheduleChanges = async (since) => {
+  const response = await api.get('/schedules', { params: { since } });
+  return response.data;
+};
+
+export const getAppointment = async (appointmentId) => {
+  const response = await api.get(`/schedules/${appointmentId}`);
+  return response.data;
+};
+
 export const createAppointment = async (appointmentData) => {
   const response = await api.post('/schedules', appointmentData);
   return response.data;
 };
 
-export const updateAppointment = async (appointmentId, updates) => {
-  const response = await api.put(`/schedules/${appointmentId}`, updates);
+export const createAppointmentsBulk = async (bulkData) => {
+  const response = await api.post('/schedules/bulk', bulkData);
+  return response.data;
+};
+
+export const proposeShiftAssignments = async (coverageData) => {
+  const response = await api.post('/schedules/auto-assign', coverageData);
+  return response.data;
+};
+
+export const applyShiftAssignments = async (assignments) => {
+  const response = await api.post('/schedules/auto-assign/apply', { assignments });
+  return response.data;
+};
+
+export const updateAppointment = async (appointmentId, updates, etag) => {
+  const headers = etag ? { 'If-Match': etag } : undefined;
+  const response = await api.put(`/schedules/${appointmentId}`, updates, { headers });
   return response.data;
 };
 
@@ -85,8 +144,9 @@ export const requestShift = async (requestData) => {
 };
 
 // Admin
-export const getAdminDashboard = async () => {
-  const response = await api.get('/admin/dashboard');
+export const getAdminDashboard = async ({ includeArchived = false } = {}) => {
+  const params = includeArchived ? { include_archived: true } : undefined;
+  const response = await api.get('/admin/dashboard', { params });
   return response.data;
 };
 
@@ -96,6 +156,11 @@ export const getStaffList = async () => {
   return response.data;
 };
 
+export const getStaffChanges = async (since) => {
+  const response = await api.get('/staff', { params: { since } });
+  return response.data;
+};
+
 export const createStaff = async (staffData) => {
   const response = await api.post('/staff', staffData);
   return response.data;
@@ -127,14 +192,20 @@ export const checkScheduleConflicts = async (params) => {
   return response.data;
 };
 
+export const getScheduleCoverage = async (from, to) => {
+  const response = await api.get('/schedules/coverage', { params: { from, to } });
+  return response.data;
+};
+
 // Payments
 export const getStripeConfig = async () => {
   const response = await api.get('/payments/config');
   return response.data;
 };
 
-export const createPaymentIntent = async (paymentData) => {
-  const response = await api.post('/payments/create-intent', paymentData);
+export const createPaymentIntent = async (paymentData, idempotencyKey) => {
+  const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined;
+  const response = await api.post('/payments/create-intent', paymentData, { headers });
   return response.data;
 };
 